@@ -0,0 +1,147 @@
+"""Поиск ссылок в сообщениях чата: старые четыре регулярки против одного матчера с префильтром.
+
+Раньше каждое текстовое сообщение группы проходило регулярку фильтра PTB, а потом
+ещё три регулярки платформ в extract_download_request. Корпус собран из типичных
+сообщений: короткая болтовня, длинные простыни без ссылок, чужие ссылки и ролики.
+Запуск из корня репозитория:
+
+    python -m benchmarks.url_matcher --rounds 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import statistics
+import time
+from collections.abc import Callable
+
+from panimau_bot.models import DownloadRequest
+from panimau_bot.services.social_urls import extract_download_request
+
+_LEGACY_FILTER = re.compile(
+    r"(youtube\.com/shorts/|youtu\.be/|instagram\.com/(?:[^/\s]+/)?reels?/|"
+    r"(?:vm|vt)\.tiktok\.com/|tiktok\.com/@[^/\s]+/video/)"
+)
+_LEGACY_PATTERNS = (
+    ("youtube", re.compile(r"(?:(?:https?://)?(?:www\.)?(?:youtube\.com/shorts/[^\s]+|youtu\.be/[^\s]+))", re.I)),
+    (
+        "instagram",
+        re.compile(r"(?:(?:https?://)?(?:www\.)?instagram\.com/(?:[^/\s?#]+/)?reels?/(?!audio/)[^\s]+)", re.I),
+    ),
+    (
+        "tiktok",
+        re.compile(
+            r"(?:(?:https?://)?(?:www\.)?(?:tiktok\.com/@[^/\s?#]+/video/[^\s]+|"
+            r"vm\.tiktok\.com/[^\s]+|vt\.tiktok\.com/[^\s]+))",
+            re.I,
+        ),
+    ),
+)
+
+_CHATTER = (
+    "ахахах",
+    "ну да",
+    "кто сегодня на созвоне?",
+    "я опять проспал",
+    "скиньте домашку плз",
+    "го вечером в доту",
+    "мем дня 👇",
+    "это база",
+    "не, ну это уже слишком",
+    "кстати, кто брал мою зарядку",
+)
+_WORDS = (
+    "короче вчера было такое что я до сих пор не могу отойти и вообще мне кажется что "
+    "всё это надо обсудить отдельно потому что иначе мы опять ничего не решим а потом "
+    "будем сидеть и думать почему так вышло"
+).split()
+_FOREIGN_LINKS = (
+    "https://example.com/video/123",
+    "https://github.com/cry1s/panimauback/pull/42",
+    "https://www.instagram.com/p/Cop84x6u7CP/",
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "https://t.me/some_channel/1234",
+)
+_VIDEO_LINKS = (
+    "https://youtube.com/shorts/dQw4w9WgXcQ?si=abcdef",
+    "https://youtu.be/dQw4w9WgXcQ",
+    "https://www.instagram.com/reel/DZ-ec0ixTgg/?igsh=MXNvaWdoYXU1dzduNQ==",
+    "https://vm.tiktok.com/ZTR45GpSF/",
+    "https://www.tiktok.com/@scout2015/video/6718335390845095173?_r=1",
+)
+
+
+def _legacy_extract(text: str) -> DownloadRequest | None:
+    if _LEGACY_FILTER.search(text) is None:
+        return None
+    earliest: tuple[int, DownloadRequest] | None = None
+    for platform, pattern in _LEGACY_PATTERNS:
+        match = pattern.search(text)
+        if match is not None and (earliest is None or match.start() < earliest[0]):
+            earliest = (match.start(), DownloadRequest(url=match.group(0), platform=platform))
+    return earliest[1] if earliest else None
+
+
+def build_corpus(size: int, seed: int = 7) -> list[str]:
+    """Примерно как в живом чате: ролики - в каждом двадцатом сообщении."""
+    rng = random.Random(seed)
+    corpus: list[str] = []
+    for _ in range(size):
+        roll = rng.random()
+        if roll < 0.55:
+            corpus.append(rng.choice(_CHATTER))
+        elif roll < 0.75:
+            corpus.append(" ".join(rng.choices(_WORDS, k=rng.randint(20, 60))))
+        elif roll < 0.85:
+            # Длинная простыня без ссылок: худший случай для регулярок.
+            corpus.append(" ".join(rng.choices(_WORDS, k=rng.randint(400, 900))))
+        elif roll < 0.95:
+            corpus.append(f"{rng.choice(_CHATTER)} {rng.choice(_FOREIGN_LINKS)}")
+        else:
+            corpus.append(f"{rng.choice(_CHATTER)} {rng.choice(_VIDEO_LINKS)} {rng.choice(_CHATTER)}")
+    return corpus
+
+
+def _measure(extract: Callable[[str], object], corpus: list[str], rounds: int) -> list[float]:
+    samples: list[float] = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for text in corpus:
+            extract(text)
+        samples.append((time.perf_counter() - started) / len(corpus))
+    return samples
+
+
+def _report(label: str, samples: list[float]) -> None:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{label:>7}: median {statistics.median(ordered) * 1e6:7.2f} us/msg, "
+        f"p95 {p95 * 1e6:7.2f} us/msg, min {ordered[0] * 1e6:7.2f} us/msg"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.messages)
+    legacy = [(request.platform, request.url) if request else None for request in map(_legacy_extract, corpus)]
+    unified = [(request.platform, request.url) if request else None for request in map(extract_download_request, corpus)]
+    # Старый вариант не срезал хвостовую пунктуацию и схему: сравниваем только платформы.
+    assert [item and item[0] for item in legacy] == [item and item[0] for item in unified]
+    print(f"{len(corpus)} messages, {sum(item is not None for item in unified)} with videos")
+
+    legacy_samples = _measure(_legacy_extract, corpus, args.rounds)
+    unified_samples = _measure(extract_download_request, corpus, args.rounds)
+    _report("legacy", legacy_samples)
+    _report("unified", unified_samples)
+    print(f"speedup x{statistics.median(legacy_samples) / statistics.median(unified_samples):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Время до первого байта: свежий YoutubeDL на каждую загрузку против экземпляра из пула.
+
+Качает маленький файл с локального HTTP-сервера, так что сеть и платформы не мешают
+и видна только цена подготовки yt-dlp. Запуск из корня репозитория:
+
+    python -m benchmarks.ydl_pool_ttfb --runs 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.server
+import socketserver
+import statistics
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import yt_dlp
+
+from panimau_bot.services.downloader import SocialVideoDownloader
+from panimau_bot.services.ydl_pool import YoutubeDLPool
+
+
+class _FixtureHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    body = b"\0" * 256 * 1024
+
+    def do_HEAD(self) -> None:
+        self._send_headers()
+
+    def do_GET(self) -> None:
+        self._send_headers()
+        self.wfile.write(self.body)
+
+    def _send_headers(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+def _first_byte_hook(started: float, marks: list[float]) -> Callable[[dict[str, Any]], None]:
+    def hook(status: dict[str, Any]) -> None:
+        if not marks and status.get("downloaded_bytes"):
+            marks.append(time.perf_counter() - started)
+
+    return hook
+
+
+def _cold(options: dict[str, object], url: str, output_dir: Path, run: int) -> float:
+    marks: list[float] = []
+    started = time.perf_counter()
+    cold_options = {
+        **options,
+        "outtmpl": str(output_dir / f"cold{run}.%(ext)s"),
+        "progress_hooks": [_first_byte_hook(started, marks)],
+    }
+    with yt_dlp.YoutubeDL(cold_options) as downloader:
+        downloader.extract_info(url, download=True)
+    return marks[0]
+
+
+def _pooled(pool: YoutubeDLPool, url: str, output_dir: Path, run: int) -> float:
+    marks: list[float] = []
+    started = time.perf_counter()
+    template = str(output_dir / f"pooled{run}.%(ext)s")
+    with pool.lease("fixture", template, _first_byte_hook(started, marks)) as downloader:
+        downloader.extract_info(url, download=True)
+    return marks[0]
+
+
+def _report(label: str, samples: list[float]) -> None:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{label:>7}: median {statistics.median(ordered) * 1000:7.2f} ms, "
+        f"p95 {p95 * 1000:7.2f} ms, min {ordered[0] * 1000:7.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _FixtureHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/clip.mp4"
+
+    options = SocialVideoDownloader(ffmpeg_available=True)._build_options("unused.%(ext)s")
+    pool = YoutubeDLPool(options, max_uses=args.runs + 1)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            output_dir = Path(tmp)
+            # Первый прогон обоих вариантов прогревает импорты и кеши самого Python.
+            _cold(options, url, output_dir, -1)
+            _pooled(pool, url, output_dir, -1)
+            cold = [_cold(options, url, output_dir, run) for run in range(args.runs)]
+            pooled = [_pooled(pool, url, output_dir, run) for run in range(args.runs)]
+    finally:
+        pool.close()
+        server.shutdown()
+        server.server_close()
+
+    _report("cold", cold)
+    _report("pooled", pooled)
+    print(f"speedup x{statistics.median(cold) / statistics.median(pooled):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,17 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import signal
+import tempfile
+import time
+from pathlib import Path
 
 from telegram import Update
+from telegram.error import TelegramError
 from telegram.ext import (
     Application,
+    CallbackContext,
     CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
@@ -13,13 +20,33 @@ from telegram.ext import (
 )
 
 from panimau_bot.config import Settings
-from panimau_bot.constants import SOCIAL_URL_FILTER_PATTERN
-from panimau_bot.handlers.attachments import ATTACHMENT_FILTER, handle_attachment
+from panimau_bot.handlers.attachments import ATTACHMENT_FILTER, handle_attachment, publish_post
 from panimau_bot.handlers.callbacks import handle_cancel
-from panimau_bot.handlers.commands import admin_broadcast, health_check, show_stats, start, tell_joke
-from panimau_bot.handlers.social import handle_social_link
-from panimau_bot.models import AppServices, PendingStore
+from panimau_bot.handlers.commands import (
+    admin_broadcast,
+    admin_cookies,
+    health_check,
+    show_stats,
+    start,
+    tell_joke,
+)
+from panimau_bot.handlers.social import SOCIAL_URL_FILTER, handle_social_link, publish_social_video
+from panimau_bot.models import AppServices, PendingAttachmentPost, PendingStore, release_pending_post
+from panimau_bot.services.delay_queue import DelayQueue
+from panimau_bot.services.canonicalizer import UrlCanonicalizer
+from panimau_bot.services.circuit_breaker import PlatformGuard
+from panimau_bot.services.cookies import CookieStore
+from panimau_bot.services.download_scheduler import DownloadScheduler
 from panimau_bot.services.downloader import SocialVideoDownloader
+from panimau_bot.services.media_cache import MediaCache
+from panimau_bot.services.message_cleanup import MessageCleaner
+from panimau_bot.services.outbound import OutboundRateLimiter
+from panimau_bot.services.pending_backend import SqlitePendingBackend
+from panimau_bot.services.singleflight import SingleFlight
+from panimau_bot.services.spool import MediaSpool
+from panimau_bot.services.transcoder import VideoTranscoder
+from panimau_bot.services.update_processor import OrderedUpdateProcessor
+from panimau_bot.services.webhook import WebhookServer
 from panimau_bot.stats import BotStats
 from panimau_bot import voice
 
@@ -29,17 +56,115 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+PENDING_SWEEP_INTERVAL_SECONDS = 60
+SPOOL_SWEEP_INTERVAL_SECONDS = 10 * 60
+
+# Обработчики читают только update.message и callback_query: правки и посты каналов им не нужны.
+HANDLER_UPDATE_TYPES = {
+    CommandHandler: (Update.MESSAGE,),
+    MessageHandler: (Update.MESSAGE,),
+    CallbackQueryHandler: (Update.CALLBACK_QUERY,),
+}
+
 
 def build_application(settings: Settings | None = None) -> Application:
     """Создаёт и настраивает приложение бота."""
     app_settings = settings or Settings.from_env()
-    application = Application.builder().token(app_settings.bot_token).build()
+    outbound = OutboundRateLimiter(
+        global_per_second=app_settings.outbound_global_per_second,
+        group_per_minute=app_settings.outbound_group_per_minute,
+        chat_burst=app_settings.outbound_chat_burst,
+        max_retries=app_settings.outbound_max_retries,
+        group_edits_per_minute=app_settings.outbound_group_edits_per_minute,
+    )
+    application = (
+        Application.builder()
+        .token(app_settings.bot_token)
+        .rate_limiter(outbound)
+        .concurrent_updates(OrderedUpdateProcessor(app_settings.concurrent_updates))
+        .post_init(_post_init)
+        .post_stop(_post_stop)
+        .post_shutdown(_post_shutdown)
+        .build()
+    )
 
+    data_dir = Path(app_settings.data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    spool = MediaSpool(
+        Path(app_settings.spool_dir) if app_settings.spool_dir else data_dir / "spool",
+        max_bytes=app_settings.spool_max_bytes,
+        min_free_bytes=app_settings.spool_min_free_bytes,
+        admission_wait_seconds=app_settings.spool_admission_wait_seconds,
+        legacy_dirs=(Path(tempfile.gettempdir()),),
+    )
+    # В своём спуле живых задач ещё нет, и всё в нём - хвосты прошлого запуска.
+    # Общий temp делим с чужими процессами, там трогаем только давно брошенное.
+    spool.sweep(0, legacy_max_age_seconds=app_settings.spool_stale_seconds)
+    downloader = SocialVideoDownloader(
+        execution_mode=app_settings.download_execution_mode,
+        timeouts=app_settings.download_timeouts,
+        max_upload_bytes=app_settings.max_upload_bytes,
+        transcode_source_max_bytes=(
+            app_settings.transcode_max_source_bytes if app_settings.transcode_enabled else None
+        ),
+        spool=spool,
+        pool_max_uses=app_settings.ytdl_pool_max_uses,
+        pool_sizes=app_settings.download_platform_limits,
+        cookies=CookieStore(data_dir / "cookies"),
+    )
+    delay_queue = DelayQueue()
+    download_scheduler = DownloadScheduler(
+        workers=app_settings.download_workers,
+        platform_limits=app_settings.download_platform_limits,
+    )
+    pending_store = PendingStore(
+        SqlitePendingBackend(data_dir / "pending.sqlite3")
+        if app_settings.pending_store_backend == "sqlite"
+        else None
+    )
+    restored = pending_store.restore()
+    if restored:
+        logger.info("Поднято %s отложенных постов с прошлого запуска", restored)
     application.bot_data["services"] = AppServices(
         settings=app_settings,
         stats=BotStats(),
-        pending_store=PendingStore(),
-        downloader=SocialVideoDownloader(),
+        pending_store=pending_store,
+        downloader=downloader,
+        media_cache=MediaCache(
+            data_dir / "media_cache.sqlite3",
+            max_entries=app_settings.media_cache_max_entries,
+            ttl_seconds=app_settings.media_cache_ttl_seconds,
+        ),
+        inflight_downloads=SingleFlight(on_release=downloader.cleanup),
+        download_scheduler=download_scheduler,
+        transcoder=VideoTranscoder(
+            max_bytes=app_settings.max_upload_bytes,
+            workers=app_settings.transcode_workers or None,
+        ),
+        outbound=outbound,
+        delay_queue=delay_queue,
+        message_cleaner=MessageCleaner(
+            application.bot,
+            delay_queue,
+            max_linger_seconds=app_settings.cleanup_max_linger_seconds,
+            batch_size=app_settings.cleanup_batch_size,
+        ),
+        platform_guard=PlatformGuard(
+            delay_queue,
+            # Проба идёт через общий планировщик и не обходит лимиты платформы.
+            probe=lambda platform, url: download_scheduler.run(platform, downloader.probe, platform, url),
+            failure_threshold=app_settings.breaker_failure_threshold,
+            recovery_seconds=app_settings.breaker_recovery_seconds,
+            max_recovery_seconds=app_settings.breaker_max_recovery_seconds,
+            retry_attempts=app_settings.download_retry_attempts,
+            retry_max_seconds=app_settings.download_retry_max_seconds,
+        ),
+        canonicalizer=UrlCanonicalizer(
+            cache_entries=app_settings.short_link_cache_entries,
+            cache_ttl_seconds=app_settings.short_link_cache_ttl_seconds,
+            timeout_seconds=app_settings.short_link_timeout_seconds,
+        ),
     )
 
     application.add_handler(CommandHandler("start", start))
@@ -48,9 +173,10 @@ def build_application(settings: Settings | None = None) -> Application:
     application.add_handler(CommandHandler("stats", show_stats))
     application.add_handler(CommandHandler("joke", tell_joke))
     application.add_handler(CommandHandler("broadcast", admin_broadcast))
+    application.add_handler(CommandHandler("cookies", admin_cookies))
     application.add_handler(
         MessageHandler(
-            filters.ChatType.GROUPS & filters.TEXT & filters.Regex(SOCIAL_URL_FILTER_PATTERN),
+            filters.ChatType.GROUPS & filters.TEXT & SOCIAL_URL_FILTER,
             handle_social_link,
         )
     )
@@ -66,6 +192,121 @@ def build_application(settings: Settings | None = None) -> Application:
     return application
 
 
+def allowed_updates_for(application: Application) -> list[str]:
+    """Типы апдейтов, которые реально разбирают зарегистрированные обработчики."""
+    update_types: set[str] = set()
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler_types = HANDLER_UPDATE_TYPES.get(type(handler))
+            if handler_types is None:
+                # Незнакомый обработчик: лучше получить лишнее, чем потерять нужное.
+                return list(Update.ALL_TYPES)
+            update_types.update(handler_types)
+    return sorted(update_types)
+
+
+async def _sweep_pending(services: AppServices) -> None:
+    try:
+        stale_posts = services.pending_store.sweep(services.settings.pending_ttl_seconds)
+        if stale_posts:
+            logger.warning("Выкинуто %s зависших отложенных постов", len(stale_posts))
+    finally:
+        services.delay_queue.schedule(PENDING_SWEEP_INTERVAL_SECONDS, _sweep_pending, services)
+
+
+async def _sweep_spool(services: AppServices) -> None:
+    try:
+        await asyncio.to_thread(services.downloader.spool.sweep, services.settings.spool_stale_seconds)
+    finally:
+        services.delay_queue.schedule(SPOOL_SWEEP_INTERVAL_SECONDS, _sweep_spool, services)
+
+
+async def _post_init(application: Application) -> None:
+    services = application.bot_data.get("services")
+    if isinstance(services, AppServices):
+        _rearm_pending_posts(application, services)
+        services.delay_queue.schedule(PENDING_SWEEP_INTERVAL_SECONDS, _sweep_pending, services)
+        services.delay_queue.schedule(SPOOL_SWEEP_INTERVAL_SECONDS, _sweep_spool, services)
+        warmed = await asyncio.to_thread(services.downloader.prewarm)
+        if warmed:
+            logger.info("Заранее собрано %s экземпляров yt-dlp", warmed)
+
+
+def _rearm_pending_posts(application: Application, services: AppServices) -> None:
+    """Заводит таймеры для постов, переживших рестарт; просроченные публикуются сразу."""
+    context = CallbackContext(application)
+    now = time.time()
+    for post_id, post in services.pending_store.items():
+        if post.publish_job is not None:
+            continue
+        publisher = publish_post if isinstance(post, PendingAttachmentPost) else publish_social_video
+        post.publish_job = services.delay_queue.schedule(
+            max(0.0, post.publish_at - now),
+            publisher,
+            context,
+            post_id,
+        )
+
+
+async def _drain(application: Application, services: AppServices) -> None:
+    """Мягкая остановка: даём начатому доехать, ждущее окна отмены сохраняем или публикуем сразу."""
+    started = time.monotonic()
+    deferred = expedited = 0
+    for _, post in services.pending_store.items():
+        job = post.publish_job
+        if job is None or job.fired or job.cancelled:
+            continue
+        if services.pending_store.durable:
+            # Пост уже лежит на диске: после рестарта его поднимет _rearm_pending_posts.
+            release_pending_post(post)
+            deferred += 1
+            try:
+                await application.bot.edit_message_text(
+                    voice.render_post_deferred_by_restart(),
+                    chat_id=post.chat_id,
+                    message_id=post.status_message_id,
+                )
+            except TelegramError as exc:
+                logger.debug("Не удалось обновить статус отложенного поста: %s", exc)
+        else:
+            post.publish_job = services.delay_queue.expedite(job)
+            expedited += 1
+
+    in_flight = services.delay_queue.snapshot().running
+    interrupted = await services.delay_queue.drain(services.settings.shutdown_grace_seconds)
+    # Бот ещё жив: то, что уже пора удалить, уходит последней пачкой.
+    await services.message_cleaner.flush_all()
+    logger.info(
+        "Дренаж за %.1fс: доделано %s из %s публикаций, прервано %s, сохранено до рестарта %s, "
+        "опубликовано досрочно %s",
+        time.monotonic() - started,
+        in_flight - interrupted,
+        in_flight,
+        interrupted,
+        deferred,
+        expedited,
+    )
+
+
+async def _post_stop(application: Application) -> None:
+    services = application.bot_data.get("services")
+    if isinstance(services, AppServices):
+        await _drain(application, services)
+
+
+async def _post_shutdown(application: Application) -> None:
+    services = application.bot_data.get("services")
+    if isinstance(services, AppServices):
+        await services.delay_queue.stop()
+        services.media_cache.close()
+        services.pending_store.close()
+        # Отменённые загрузки дочищают свои файлы в потоках: дожидаемся их, а не бросаем.
+        await asyncio.to_thread(services.download_scheduler.shutdown, True)
+        await asyncio.to_thread(services.transcoder.shutdown, True)
+        services.downloader.close()
+        await services.canonicalizer.aclose()
+
+
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Глобальный обработчик ошибок."""
     logger.error("Ошибка у бота:", exc_info=context.error)
@@ -82,8 +323,51 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
         )
 
 
+async def run_webhook(application: Application, settings: Settings, allowed_updates: list[str]) -> None:
+    """Запуск на вебхуке: вместо run_polling апдейты принимает встроенный aiohttp-сервер."""
+    server = WebhookServer(
+        application,
+        path=settings.webhook_path,
+        secret_token=settings.webhook_secret_token,
+        listen=settings.webhook_listen,
+        port=settings.webhook_port,
+    )
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop_event.set)
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.bot.set_webhook(
+            url=settings.webhook_url.rstrip("/") + server.path,
+            allowed_updates=allowed_updates,
+            secret_token=settings.webhook_secret_token or None,
+            max_connections=settings.webhook_max_connections,
+        )
+        await application.start()
+        await server.start()
+        await stop_event.wait()
+    finally:
+        await server.stop()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
 def main() -> None:
     """Главная функция запуска бота."""
-    application = build_application()
-    logger.info("🚀 Бот запущен!")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    settings = Settings.from_env()
+    application = build_application(settings)
+    allowed_updates = allowed_updates_for(application)
+    logger.info("🚀 Бот запущен! Принимаем апдейты: %s", ", ".join(allowed_updates))
+    if settings.webhook_url:
+        asyncio.run(run_webhook(application, settings, allowed_updates))
+    else:
+        application.run_polling(allowed_updates=allowed_updates)
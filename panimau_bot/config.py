@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+DEFAULT_DOWNLOAD_PLATFORM_LIMITS = "youtube:2,instagram:2,tiktok:2"
+DEFAULT_DOWNLOAD_TIMEOUTS = "youtube:180,instagram:120,tiktok:120"
 
 
 def _required_env(name: str) -> str:
@@ -17,6 +20,20 @@ def _parse_admin_ids(raw_value: str) -> tuple[int, ...]:
     return tuple(int(item.strip()) for item in raw_value.split(",") if item.strip())
 
 
+def _parse_bool(raw_value: str) -> bool:
+    return raw_value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _parse_platform_values(raw_value: str) -> dict[str, int]:
+    limits: dict[str, int] = {}
+    for item in raw_value.split(","):
+        if not item.strip():
+            continue
+        platform, _, limit = item.partition(":")
+        limits[platform.strip().lower()] = int(limit.strip())
+    return limits
+
+
 @dataclass(slots=True, frozen=True)
 class Settings:
     bot_token: str
@@ -24,6 +41,54 @@ class Settings:
     channel_id: str
     admin_ids: tuple[int, ...]
     download_delay_seconds: int = 5
+    data_dir: str = "data"
+    media_cache_max_entries: int = 5000
+    media_cache_ttl_seconds: int = 30 * 24 * 3600
+    download_workers: int = 4
+    download_platform_limits: dict[str, int] = field(
+        default_factory=lambda: _parse_platform_values(DEFAULT_DOWNLOAD_PLATFORM_LIMITS)
+    )
+    download_execution_mode: str = "thread"
+    download_timeouts: dict[str, int] = field(
+        default_factory=lambda: _parse_platform_values(DEFAULT_DOWNLOAD_TIMEOUTS)
+    )
+    speculative_downloads: bool = False
+    max_upload_bytes: int = 50 * 1024 * 1024
+    transcode_enabled: bool = True
+    transcode_workers: int = 0
+    transcode_max_source_bytes: int = 200 * 1024 * 1024
+    attachment_publish_mode: str = "copy"
+    outbound_global_per_second: int = 30
+    outbound_group_per_minute: int = 20
+    outbound_chat_burst: int = 3
+    outbound_group_edits_per_minute: int = 60
+    outbound_max_retries: int = 3
+    concurrent_updates: int = 32
+    pending_ttl_seconds: int = 3600
+    pending_store_backend: str = "sqlite"
+    shutdown_grace_seconds: int = 25
+    cleanup_max_linger_seconds: int = 3
+    cleanup_batch_size: int = 100
+    webhook_url: str = ""
+    webhook_listen: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_path: str = "telegram"
+    webhook_secret_token: str = ""
+    webhook_max_connections: int = 40
+    spool_dir: str = ""
+    spool_max_bytes: int = 2 * 1024 * 1024 * 1024
+    spool_min_free_bytes: int = 512 * 1024 * 1024
+    spool_admission_wait_seconds: int = 30
+    spool_stale_seconds: int = 3600
+    ytdl_pool_max_uses: int = 50
+    download_retry_attempts: int = 2
+    download_retry_max_seconds: int = 10
+    breaker_failure_threshold: int = 5
+    breaker_recovery_seconds: int = 60
+    breaker_max_recovery_seconds: int = 900
+    short_link_cache_entries: int = 4096
+    short_link_cache_ttl_seconds: int = 86400
+    short_link_timeout_seconds: int = 5
 
     @classmethod
     def from_env(cls) -> "Settings":
@@ -33,4 +98,54 @@ class Settings:
             channel_id=_required_env("CHANNEL_ID"),
             admin_ids=_parse_admin_ids(os.getenv("ADMIN_IDS", "")),
             download_delay_seconds=int(os.getenv("DOWNLOAD_DELAY_SECONDS", "5")),
+            data_dir=os.getenv("DATA_DIR", "data"),
+            media_cache_max_entries=int(os.getenv("MEDIA_CACHE_MAX_ENTRIES", "5000")),
+            media_cache_ttl_seconds=int(os.getenv("MEDIA_CACHE_TTL_SECONDS", str(30 * 24 * 3600))),
+            download_workers=int(os.getenv("DOWNLOAD_WORKERS", "4")),
+            download_platform_limits=_parse_platform_values(
+                os.getenv("DOWNLOAD_PLATFORM_LIMITS", DEFAULT_DOWNLOAD_PLATFORM_LIMITS)
+            ),
+            download_execution_mode=os.getenv("DOWNLOAD_EXECUTION_MODE", "thread").strip().lower(),
+            download_timeouts=_parse_platform_values(
+                os.getenv("DOWNLOAD_TIMEOUTS", DEFAULT_DOWNLOAD_TIMEOUTS)
+            ),
+            speculative_downloads=_parse_bool(os.getenv("SPECULATIVE_DOWNLOADS", "")),
+            max_upload_bytes=int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024))),
+            transcode_enabled=_parse_bool(os.getenv("TRANSCODE_ENABLED", "true")),
+            transcode_workers=int(os.getenv("TRANSCODE_WORKERS", "0")),
+            transcode_max_source_bytes=int(
+                os.getenv("TRANSCODE_MAX_SOURCE_BYTES", str(200 * 1024 * 1024))
+            ),
+            attachment_publish_mode=os.getenv("ATTACHMENT_PUBLISH_MODE", "copy").strip().lower(),
+            outbound_global_per_second=int(os.getenv("OUTBOUND_GLOBAL_PER_SECOND", "30")),
+            outbound_group_per_minute=int(os.getenv("OUTBOUND_GROUP_PER_MINUTE", "20")),
+            outbound_chat_burst=int(os.getenv("OUTBOUND_CHAT_BURST", "3")),
+            outbound_group_edits_per_minute=int(os.getenv("OUTBOUND_GROUP_EDITS_PER_MINUTE", "60")),
+            outbound_max_retries=int(os.getenv("OUTBOUND_MAX_RETRIES", "3")),
+            concurrent_updates=int(os.getenv("CONCURRENT_UPDATES", "32")),
+            pending_ttl_seconds=int(os.getenv("PENDING_TTL_SECONDS", "3600")),
+            pending_store_backend=os.getenv("PENDING_STORE_BACKEND", "sqlite").strip().lower(),
+            shutdown_grace_seconds=int(os.getenv("SHUTDOWN_GRACE_SECONDS", "25")),
+            cleanup_max_linger_seconds=int(os.getenv("CLEANUP_MAX_LINGER_SECONDS", "3")),
+            cleanup_batch_size=int(os.getenv("CLEANUP_BATCH_SIZE", "100")),
+            webhook_url=os.getenv("WEBHOOK_URL", "").strip(),
+            webhook_listen=os.getenv("WEBHOOK_LISTEN", "0.0.0.0"),
+            webhook_port=int(os.getenv("WEBHOOK_PORT", "8080")),
+            webhook_path=os.getenv("WEBHOOK_PATH", "telegram"),
+            webhook_secret_token=os.getenv("WEBHOOK_SECRET_TOKEN", ""),
+            webhook_max_connections=int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40")),
+            spool_dir=os.getenv("SPOOL_DIR", ""),
+            spool_max_bytes=int(os.getenv("SPOOL_MAX_BYTES", str(2 * 1024 * 1024 * 1024))),
+            spool_min_free_bytes=int(os.getenv("SPOOL_MIN_FREE_BYTES", str(512 * 1024 * 1024))),
+            spool_admission_wait_seconds=int(os.getenv("SPOOL_ADMISSION_WAIT_SECONDS", "30")),
+            spool_stale_seconds=int(os.getenv("SPOOL_STALE_SECONDS", "3600")),
+            ytdl_pool_max_uses=int(os.getenv("YTDL_POOL_MAX_USES", "50")),
+            download_retry_attempts=int(os.getenv("DOWNLOAD_RETRY_ATTEMPTS", "2")),
+            download_retry_max_seconds=int(os.getenv("DOWNLOAD_RETRY_MAX_SECONDS", "10")),
+            breaker_failure_threshold=int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5")),
+            breaker_recovery_seconds=int(os.getenv("BREAKER_RECOVERY_SECONDS", "60")),
+            breaker_max_recovery_seconds=int(os.getenv("BREAKER_MAX_RECOVERY_SECONDS", "900")),
+            short_link_cache_entries=int(os.getenv("SHORT_LINK_CACHE_ENTRIES", "4096")),
+            short_link_cache_ttl_seconds=int(os.getenv("SHORT_LINK_CACHE_TTL_SECONDS", "86400")),
+            short_link_timeout_seconds=int(os.getenv("SHORT_LINK_TIMEOUT_SECONDS", "5")),
         )
@@ -17,9 +17,4 @@ SOCIAL_PLATFORM_LABELS = {
     "tiktok": "тикток",
 }
 
-SOCIAL_URL_FILTER_PATTERN = (
-    r"(youtube\.com/shorts/|youtu\.be/|instagram\.com/(?:[^/\s]+/)?reels?/|"
-    r"(?:vm|vt)\.tiktok\.com/|tiktok\.com/@[^/\s]+/video/)"
-)
-
 REACTION_CHOICES = ["🔥", "😎", "👍", "👎", "🤡"]
@@ -2,9 +2,22 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 from typing import cast
 
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Message, Update
+from telegram import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InputMediaAudio,
+    InputMediaDocument,
+    InputMediaPhoto,
+    InputMediaVideo,
+    Message,
+    ReplyParameters,
+    Update,
+)
+from telegram.constants import BulkRequestLimit, MediaGroupLimit
+from telegram.error import TelegramError
 from telegram.ext import ContextTypes, filters
 
 from panimau_bot.models import AppServices, AttachmentItem, PendingAttachmentPost
@@ -31,6 +44,14 @@ ATTACHMENT_SENDERS = {
     "sticker": "send_sticker",
 }
 
+# Типы, которые Telegram пускает в альбом; остальное уходит отдельными сообщениями.
+ALBUM_MEDIA_TYPES = {
+    "photo": InputMediaPhoto,
+    "video": InputMediaVideo,
+    "audio": InputMediaAudio,
+    "document": InputMediaDocument,
+}
+
 
 def _get_services(context: ContextTypes.DEFAULT_TYPE) -> AppServices:
     return cast(AppServices, context.application.bot_data["services"])
@@ -63,6 +84,85 @@ def _collect_attachment_items(message: Message) -> list[AttachmentItem]:
     return items
 
 
+async def _send_one_by_one(
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int | str,
+    items: list[AttachmentItem],
+) -> None:
+    for file_type, file_id in items:
+        sender_name = ATTACHMENT_SENDERS[file_type]
+        sender = getattr(context.bot, sender_name)
+        await sender(chat_id, file_id)
+
+
+async def _send_album(
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int | str,
+    items: list[AttachmentItem],
+) -> None:
+    album_items = [item for item in items if item[0] in ALBUM_MEDIA_TYPES]
+    other_items = [item for item in items if item[0] not in ALBUM_MEDIA_TYPES]
+    limit = MediaGroupLimit.MAX_MEDIA_LENGTH
+
+    for start in range(0, len(album_items), limit):
+        chunk = album_items[start : start + limit]
+        if len(chunk) < MediaGroupLimit.MIN_MEDIA_LENGTH:
+            await _send_one_by_one(context, chat_id, chunk)
+            continue
+        await context.bot.send_media_group(
+            chat_id,
+            [ALBUM_MEDIA_TYPES[file_type](file_id) for file_type, file_id in chunk],
+        )
+
+    await _send_one_by_one(context, chat_id, other_items)
+
+
+def _copy_chunks(message_ids: list[int]) -> list[list[int]]:
+    ordered_ids = sorted(message_ids)
+    limit = BulkRequestLimit.MAX_LIMIT
+    return [ordered_ids[start : start + limit] for start in range(0, len(ordered_ids), limit)]
+
+
+async def _copy_messages(
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int | str,
+    from_chat_id: int,
+    message_ids: list[int],
+) -> None:
+    if len(message_ids) == 1:
+        await context.bot.copy_message(chat_id, from_chat_id, message_ids[0])
+        return
+    # copy_messages сохраняет подписи и склеивает части альбома обратно в альбом.
+    await context.bot.copy_messages(chat_id, from_chat_id, message_ids)
+
+
+async def _publish_items(
+    context: ContextTypes.DEFAULT_TYPE,
+    services: AppServices,
+    post_info: PendingAttachmentPost,
+) -> None:
+    """Копирует пост в канал; к поштучной отправке по file_id откатывается, только если копия не вышла."""
+    channel_id = services.settings.channel_id
+
+    if services.settings.attachment_publish_mode == "copy" and post_info.message_ids:
+        copied = False
+        try:
+            for chunk in _copy_chunks(post_info.message_ids):
+                await _copy_messages(context, channel_id, post_info.chat_id, chunk)
+                copied = True
+            return
+        except TelegramError as exc:
+            # Часть поста уже в канале: повторная отправка дала бы дубли.
+            if copied:
+                raise
+            logger.warning("Копирование не удалось, отправляем вложения заново: %s", exc)
+
+    if post_info.media_group_id:
+        await _send_album(context, channel_id, post_info.file_types)
+    else:
+        await _send_one_by_one(context, channel_id, post_info.file_types)
+
+
 async def handle_attachment(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработка всех вложений из группы."""
     message = update.message
@@ -77,56 +177,77 @@ async def handle_attachment(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if not file_types:
         return
 
-    cancel_msg = await message.reply_text(
+    if message.media_group_id:
+        album = services.pending_store.get_media_group(message.media_group_id)
+        if album is not None:
+            # Остальные части альбома едут в уже созданный пост: одна кнопка, одна публикация.
+            album.file_types.extend(file_types)
+            album.message_ids.append(message.message_id)
+            services.pending_store.update(str(album.source_message_id))
+            return
+
+    status_msg = await message.reply_text(
         voice.render_attachment_queue(services.settings.download_delay_seconds),
         reply_markup=_build_cancel_markup(message.message_id),
         disable_notification=True,
     )
 
-    services.pending_store.set(
-        str(message.message_id),
-        PendingAttachmentPost(
-            source_msg=message,
-            cancel_msg=cancel_msg,
-            file_types=file_types,
-        ),
+    post_id = str(message.message_id)
+    post_info = PendingAttachmentPost(
+        chat_id=message.chat_id,
+        source_message_id=message.message_id,
+        status_message_id=status_msg.message_id,
+        file_types=file_types,
+        media_group_id=message.media_group_id,
+        message_ids=[message.message_id],
+        publish_at=time.time() + services.settings.download_delay_seconds,
     )
-
-    context.job_queue.run_once(
-        publish_post,
+    post_info.publish_job = services.delay_queue.schedule(
         services.settings.download_delay_seconds,
-        data={"post_id": str(message.message_id)},
+        publish_post,
+        context,
+        post_id,
     )
+    services.pending_store.set(post_id, post_info)
 
 
-async def publish_post(context: ContextTypes.DEFAULT_TYPE) -> None:
+async def publish_post(context: ContextTypes.DEFAULT_TYPE, post_id: str) -> None:
     """Публикация вложений после таймаута."""
     services = _get_services(context)
-    post_id = str(context.job.data["post_id"])
-    post_info = services.pending_store.get(post_id)
+    post_info = services.pending_store.claim_publish(post_id)
 
     if not isinstance(post_info, PendingAttachmentPost):
         return
 
     try:
-        for file_type, file_id in post_info.file_types:
-            sender_name = ATTACHMENT_SENDERS[file_type]
-            sender = getattr(context.bot, sender_name)
-            await sender(
-                services.settings.channel_id,
-                file_id,
-            )
+        await _publish_items(context, services, post_info)
 
-        await post_info.cancel_msg.edit_text(voice.render_attachment_success())
-        await asyncio.sleep(2)
-        await post_info.cancel_msg.delete()
+        await context.bot.edit_message_text(
+            voice.render_attachment_success(),
+            chat_id=post_info.chat_id,
+            message_id=post_info.status_message_id,
+        )
+        services.message_cleaner.delete_later(post_info.chat_id, post_info.status_message_id, 2)
 
         for file_type, _ in post_info.file_types:
             services.stats.add_forward(file_type)
+    except asyncio.CancelledError:
+        # Остановка не дождалась публикации: статус не должен зависнуть в очереди.
+        try:
+            await context.bot.edit_message_text(
+                voice.render_post_interrupted_by_restart(),
+                chat_id=post_info.chat_id,
+                message_id=post_info.status_message_id,
+            )
+        except TelegramError as exc:
+            logger.debug("Не удалось обновить статус прерванного поста: %s", exc)
+        raise
     except Exception as exc:
         logger.error("Ошибка при публикации вложения", exc_info=exc)
-        await post_info.source_msg.reply_text(
+        await context.bot.send_message(
+            post_info.chat_id,
             voice.render_attachment_publish_error(exc),
+            reply_parameters=ReplyParameters(post_info.source_message_id, allow_sending_without_reply=True),
             disable_notification=True,
         )
     finally:
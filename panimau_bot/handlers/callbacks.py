@@ -1,12 +1,11 @@
 from __future__ import annotations
 
-import asyncio
 from typing import cast
 
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from panimau_bot.models import AppServices
+from panimau_bot.models import AppServices, PendingAttachmentPost, release_pending_post
 from panimau_bot import voice
 
 
@@ -20,19 +19,24 @@ async def handle_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     if query is None:
         return
 
-    await query.answer()
-
     if not query.data or not query.data.startswith("cancel_"):
+        await query.answer()
         return
 
     source_msg_id = query.data.removeprefix("cancel_")
     services = _get_services(context)
-    post = services.pending_store.pop(source_msg_id, None)
+    # Пост либо снимается целиком, либо уже ушёл в публикацию: третьего не дано.
+    post = services.pending_store.claim_cancel(source_msg_id)
+    await query.answer(voice.render_cancel_too_late() if post is None else None)
+
+    if post is None:
+        return
 
-    if post is None or query.message is None:
+    # Таймер, загрузка и спекулятивная аренда больше никому не нужны: гасим сразу.
+    release_pending_post(post)
+    if query.message is None:
         return
 
     await query.message.edit_text(voice.render_post_cancelled())
-    services.stats.add_cancel()
-    await asyncio.sleep(3)
-    await query.message.delete()
+    services.stats.add_cancel(len(post.file_types) if isinstance(post, PendingAttachmentPost) else 1)
+    services.message_cleaner.delete_later(query.message.chat_id, query.message.message_id, 3)
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
+import asyncio
 import random
 from typing import cast
 
 from telegram import Update
-from telegram.constants import ParseMode
+from telegram.constants import ChatType, ParseMode
+from telegram.error import TelegramError
 from telegram.ext import ContextTypes
 
 from panimau_bot.models import AppServices
+from panimau_bot.services.cookies import MAX_COOKIE_FILE_BYTES
+from panimau_bot.services.social_urls import SUPPORTED_PLATFORMS
 from panimau_bot import voice
 
 
@@ -43,6 +47,19 @@ async def health_check(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         total_forwarded=services.stats.total_forwarded,
         cancelled=services.stats.cancelled,
         joke=joke,
+        details=[
+            voice.render_download_queue_health(services.download_scheduler.snapshot()),
+            voice.render_breakers_health(services.platform_guard.snapshot()),
+            voice.render_transcode_health(services.transcoder.snapshot()),
+            voice.render_delay_queue_health(services.delay_queue.snapshot()),
+            voice.render_cleanup_health(services.message_cleaner.snapshot()),
+            voice.render_pending_store_health(
+                len(services.pending_store),
+                services.pending_store.memory_bytes(),
+            ),
+            voice.render_spool_health(services.downloader.spool.snapshot()),
+            voice.render_ytdl_pool_health(services.downloader.pool.snapshot()),
+        ],
     )
 
     if update.message:
@@ -67,7 +84,7 @@ async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
 
     if update.message:
         await update.message.reply_text(
-            voice.render_stats(stats),
+            voice.render_stats(stats, outbound=services.outbound.snapshot()),
             parse_mode=ParseMode.MARKDOWN,
             disable_notification=_silent_in_group(update, context),
         )
@@ -120,3 +137,53 @@ async def admin_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             voice.render_admin_error(exc),
             disable_notification=_silent_in_group(update, context),
         )
+
+
+async def admin_cookies(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Админская замена кук платформы: /cookies <платформа> ответом на cookies.txt."""
+    services = _get_services(context)
+    message = update.message
+    cookies = services.downloader.cookies
+
+    if not message or cookies is None:
+        return
+
+    if update.effective_user is None or update.effective_user.id not in services.settings.admin_ids:
+        await message.reply_text(
+            voice.render_admin_no_rights(),
+            disable_notification=_silent_in_group(update, context),
+        )
+        return
+
+    if message.chat.type != ChatType.PRIVATE:
+        await message.reply_text(
+            voice.render_admin_private_only(),
+            disable_notification=_silent_in_group(update, context),
+        )
+        return
+
+    if not context.args:
+        counts = await asyncio.to_thread(
+            lambda: {platform: cookies.count(platform) for platform in SUPPORTED_PLATFORMS}
+        )
+        await message.reply_text(voice.render_cookies_status(counts))
+        return
+
+    platform = context.args[0].lower()
+    reply = message.reply_to_message
+    document = reply.document if reply else None
+    if platform not in SUPPORTED_PLATFORMS or document is None:
+        await message.reply_text(voice.render_cookies_usage(SUPPORTED_PLATFORMS))
+        return
+
+    try:
+        if document.file_size and document.file_size > MAX_COOKIE_FILE_BYTES:
+            raise ValueError("Файл кук слишком большой")
+        telegram_file = await context.bot.get_file(document.file_id)
+        data = await telegram_file.download_as_bytearray()
+        count = await asyncio.to_thread(cookies.replace, platform, bytes(data))
+    except (TelegramError, ValueError) as exc:
+        await message.reply_text(voice.render_cookies_error(exc))
+        return
+
+    await message.reply_text(voice.render_cookies_saved(platform, count))
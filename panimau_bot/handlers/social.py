@@ -3,18 +3,66 @@ from __future__ import annotations
 import asyncio
 import logging
 import random
+import re
+import threading
+import time
 from typing import cast
 
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReactionTypeEmoji, Update
-from telegram.ext import ContextTypes
+from telegram import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    Message,
+    ReactionTypeEmoji,
+    ReplyParameters,
+    Update,
+)
+from telegram.error import BadRequest, TelegramError
+from telegram.ext import ContextTypes, filters
 
 from panimau_bot.constants import REACTION_CHOICES, SOCIAL_PLATFORM_LABELS
-from panimau_bot.models import AppServices, PendingDownloadPost
-from panimau_bot.services.downloader import extract_download_request
+from panimau_bot.models import (
+    AppServices,
+    DownloadProgress,
+    DownloadRequest,
+    DownloadResult,
+    MediaInfo,
+    PendingDownloadPost,
+)
+from panimau_bot.services.circuit_breaker import PlatformUnavailable
+from panimau_bot.services.media_cache import CachedMedia
+from panimau_bot.services.media_probe import prepare_for_upload
+from panimau_bot.services.outbound import BEST_EFFORT
+from panimau_bot.services.social_urls import (
+    SOCIAL_URLS,
+    download_request_from_match,
+    extract_download_request,
+)
+from panimau_bot.stats import StageTimer
 from panimau_bot import voice
 
 logger = logging.getLogger(__name__)
 
+PROGRESS_STEP_PERCENT = 25
+
+
+class _SocialUrlFilter(filters.MessageFilter):
+    """Пропускает сообщения со ссылкой на ролик и отдаёт находку в context.matches.
+
+    Обработчику не нужно искать ссылку заново: текст сканируется один раз, здесь.
+    """
+
+    __slots__ = ()
+
+    def __init__(self) -> None:
+        super().__init__(name="SocialUrlFilter", data_filter=True)
+
+    def filter(self, message: Message) -> dict[str, list[re.Match[str]]] | None:
+        match = SOCIAL_URLS.search(message.text or "")
+        return {"matches": [match]} if match is not None else {}
+
+
+SOCIAL_URL_FILTER = _SocialUrlFilter()
+
 
 def _get_services(context: ContextTypes.DEFAULT_TYPE) -> AppServices:
     return cast(AppServices, context.application.bot_data["services"])
@@ -30,6 +78,162 @@ def _platform_label(platform: str) -> str:
     return SOCIAL_PLATFORM_LABELS.get(platform, "видос")
 
 
+def _sent_video_file_id(message: Message | None) -> str | None:
+    """Достаёт file_id загруженного ролика, чтобы не заливать те же байты повторно."""
+    if message is None:
+        return None
+    if message.video:
+        return message.video.file_id
+    if message.animation:
+        return message.animation.file_id
+    if message.document:
+        return message.document.file_id
+    return None
+
+
+def _video_attributes(media: MediaInfo | None, with_thumbnail: bool = False) -> dict[str, object]:
+    """Параметры send_video, с которыми Telegram не пробует файл сам и сразу стримит его.
+
+    Превью имеет смысл только при заливке нового файла: к file_id Telegram его не цепляет.
+    """
+    attributes: dict[str, object] = {"supports_streaming": True}
+    if media is None:
+        return attributes
+    if media.width and media.height:
+        attributes["width"] = media.width
+        attributes["height"] = media.height
+    if media.duration:
+        attributes["duration"] = round(media.duration)
+    if with_thumbnail and media.thumbnail_path is not None and media.thumbnail_path.exists():
+        attributes["thumbnail"] = media.thumbnail_path.read_bytes()
+    return attributes
+
+
+async def _send_cached_video(
+    context: ContextTypes.DEFAULT_TYPE,
+    services: AppServices,
+    cached: CachedMedia,
+) -> Message | None:
+    """Пересылает ролик в канал по file_id из кэша; None, если Telegram его больше не знает."""
+    try:
+        return await context.bot.send_video(
+            services.settings.channel_id,
+            video=cached.file_id,
+            **_video_attributes(cached.media),
+        )
+    except BadRequest as exc:
+        logger.warning("file_id из кэша для %s отклонён: %s", cached.url, exc)
+        services.media_cache.discard(cached.file_id)
+        return None
+
+
+def _reply_to(post_info: PendingDownloadPost) -> ReplyParameters:
+    return ReplyParameters(post_info.source_message_id, allow_sending_without_reply=True)
+
+
+async def _edit_status(
+    context: ContextTypes.DEFAULT_TYPE,
+    post_info: PendingDownloadPost,
+    text: str,
+    best_effort: bool = False,
+) -> None:
+    """Обновляет статус; best_effort-правку планировщик выкинет, если чат сейчас занят."""
+    try:
+        await context.bot.edit_message_text(
+            text,
+            chat_id=post_info.chat_id,
+            message_id=post_info.status_message_id,
+            rate_limit_args=BEST_EFFORT if best_effort else None,
+        )
+    except TelegramError as exc:
+        logger.debug("Не удалось обновить статус загрузки: %s", exc)
+
+
+async def _download_video(
+    context: ContextTypes.DEFAULT_TYPE,
+    services: AppServices,
+    request: DownloadRequest,
+    status_post: PendingDownloadPost | None,
+    label: str,
+) -> DownloadResult:
+    """Качает ролик через планировщик; без status_post статус не трогаем (спекулятивная загрузка)."""
+    loop = asyncio.get_running_loop()
+    cancel_event = threading.Event()
+    reported_step = -1
+
+    def report_position(position: int) -> None:
+        if status_post is None:
+            return
+        text = (
+            voice.render_social_waiting(label, position)
+            if position
+            else voice.render_social_progress(label)
+        )
+        context.application.create_task(_edit_status(context, status_post, text, best_effort=True))
+
+    def show_progress(percent: int) -> None:
+        nonlocal reported_step
+        step = percent // PROGRESS_STEP_PERCENT
+        if status_post is None or step <= reported_step or percent >= 100:
+            return
+        reported_step = step
+        context.application.create_task(
+            _edit_status(
+                context,
+                status_post,
+                voice.render_social_download_progress(label, step * PROGRESS_STEP_PERCENT),
+                best_effort=True,
+            )
+        )
+
+    def report_progress(progress: DownloadProgress) -> None:
+        # Вызывается из потока загрузки, в event loop передаём только процент.
+        if progress.percent is not None:
+            loop.call_soon_threadsafe(show_progress, progress.percent)
+
+    try:
+        # Временные сбои повторяются, а лежащая платформа отказывает сразу, не занимая слот.
+        result = await services.platform_guard.call(
+            request.platform,
+            request.url,
+            lambda: services.download_scheduler.run(
+                request.platform,
+                services.downloader.download,
+                request,
+                cancel_event,
+                report_progress,
+                on_position=report_position,
+                on_abandoned=services.downloader.cleanup,
+            ),
+        )
+        if result.download_seconds is not None:
+            services.stats.add_download_time(request.platform, result.download_seconds)
+        try:
+            if services.transcoder.needs_transcode(result):
+                # Перекодирование идёт в своём пуле и не держит слот загрузки.
+                if status_post is not None:
+                    context.application.create_task(
+                        _edit_status(context, status_post, voice.render_social_transcoding(label))
+                    )
+                result = await services.transcoder.run(result, cancel_event)
+            return await asyncio.to_thread(prepare_for_upload, result)
+        except BaseException:
+            services.downloader.cleanup(result)
+            raise
+    except asyncio.CancelledError:
+        # Никому не нужная загрузка останавливается по-настоящему, а не докачивается в фоне.
+        cancel_event.set()
+        raise
+
+
+async def _react_to_reply(context: ContextTypes.DEFAULT_TYPE, sent_msg: Message) -> None:
+    await context.bot.set_message_reaction(
+        chat_id=sent_msg.chat_id,
+        message_id=sent_msg.message_id,
+        reaction=[ReactionTypeEmoji(random.choice(REACTION_CHOICES))],
+    )
+
+
 async def handle_social_link(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Ловим ссылки на короткие видео и скачиваем их."""
     message = update.message
@@ -40,87 +244,251 @@ async def handle_social_link(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if message.chat_id != services.settings.group_id:
         return
 
-    request = extract_download_request(message.text.strip())
+    match = context.match
+    request = (
+        download_request_from_match(match)
+        if match is not None and match.lastgroup is not None
+        else extract_download_request(message.text)
+    )
     if request is None:
         return
+    if not context.application.running:
+        # Приложение уже останавливается: новую загрузку никто не дождётся.
+        await message.reply_text(voice.render_social_restarting(), disable_notification=True)
+        return
 
+    # Один ролик - один ключ: без трекинга. Короткую ссылку здесь раскрывает только
+    # кэш, по сети - уже публикация: статус не должен ждать чужих редиректов.
+    request = services.canonicalizer.normalize(request)
     label = _platform_label(request.platform)
-    cancel_msg = await message.reply_text(
-        voice.render_social_queue(label, services.settings.download_delay_seconds),
-        reply_markup=_build_cancel_markup(message.message_id),
-        disable_notification=True,
-    )
 
-    services.pending_store.set(
-        str(message.message_id),
-        PendingDownloadPost(
-            source_msg=message,
-            cancel_msg=cancel_msg,
-            request=request,
-        ),
-    )
+    retry_in = services.platform_guard.retry_in(request.platform)
+    speculative = services.settings.speculative_downloads
+    cached = services.media_cache.get_by_url(request.url) if retry_in is not None or speculative else None
+    if retry_in is not None and cached is None:
+        # Платформа лежит: отвечаем сразу, без окна отмены и заведомо упавшей загрузки.
+        await message.reply_text(
+            voice.render_social_platform_down(label, retry_in),
+            disable_notification=True,
+        )
+        return
 
-    context.job_queue.run_once(
-        publish_social_video,
+    prefetch = None
+    if speculative and cached is None:
+        # Качаем, пока идёт окно отмены; в канал ролик уйдёт только после него.
+        prefetch = services.inflight_downloads.acquire(
+            request.url,
+            lambda: _resolve_and_download(context, services, request, label),
+        )
+
+    try:
+        status_msg = await message.reply_text(
+            voice.render_social_queue(label, services.settings.download_delay_seconds),
+            reply_markup=_build_cancel_markup(message.message_id),
+            disable_notification=True,
+        )
+    except BaseException:
+        # Поста не будет: спекулятивная загрузка никому не нужна, её папка в спуле тоже.
+        if prefetch is not None:
+            prefetch.release()
+        raise
+
+    post_id = str(message.message_id)
+    post_info = PendingDownloadPost(
+        chat_id=message.chat_id,
+        source_message_id=message.message_id,
+        status_message_id=status_msg.message_id,
+        request=request,
+        prefetch=prefetch,
+        publish_at=time.time() + services.settings.download_delay_seconds,
+    )
+    post_info.publish_job = services.delay_queue.schedule(
         services.settings.download_delay_seconds,
-        data={"post_id": str(message.message_id)},
+        publish_social_video,
+        context,
+        post_id,
     )
+    services.pending_store.set(post_id, post_info)
+
 
+async def _resolve_and_download(
+    context: ContextTypes.DEFAULT_TYPE,
+    services: AppServices,
+    request: DownloadRequest,
+    label: str,
+) -> DownloadResult:
+    """Спекулятивная загрузка: сначала раскрывает короткую ссылку, потом качает."""
+    request = await services.canonicalizer.canonicalize(request)
+    return await _download_video(context, services, request, None, label)
 
-async def publish_social_video(context: ContextTypes.DEFAULT_TYPE) -> None:
+
+async def publish_social_video(context: ContextTypes.DEFAULT_TYPE, post_id: str) -> None:
     """Качаем и постим social video."""
     services = _get_services(context)
-    post_id = str(context.job.data["post_id"])
     post_info = services.pending_store.get(post_id)
 
     if not isinstance(post_info, PendingDownloadPost):
         return
 
-    label = _platform_label(post_info.request.platform)
+    request = post_info.request
+    label = _platform_label(request.platform)
     result = None
+    lease = post_info.prefetch
+    interrupted = False
 
     try:
-        await post_info.cancel_msg.edit_text(voice.render_social_progress(label))
-        loop = asyncio.get_running_loop()
-        result = await loop.run_in_executor(None, lambda: services.downloader.download(post_info.request))
+        await _edit_status(context, post_info, voice.render_social_progress(label))
+        timer = StageTimer()
+        resolved = await services.canonicalizer.canonicalize(request)
+        if resolved is not request:
+            request = post_info.request = resolved
+            services.pending_store.update(post_id)
+        cached = services.media_cache.get_by_url(request.url)
+        video_id = cached.video_id if cached else None
+        media = cached.media if cached else None
+        channel_msg = None
+        upload_seconds = 0.0
+        claimed = False
+        if cached is not None:
+            if services.pending_store.claim_publish(post_id) is None:
+                return
+            claimed = True
+            channel_msg = await _send_cached_video(context, services, cached)
 
-        if services.pending_store.get(post_id) is None:
-            return
+        if channel_msg is None:
+            if lease is None:
+                lease = services.inflight_downloads.acquire(
+                    request.url,
+                    lambda: _download_video(context, services, request, post_info, label),
+                )
+            post_info.download_task = asyncio.ensure_future(lease.result())
+            try:
+                result = await post_info.download_task
+            except asyncio.CancelledError:
+                if post_info.download_task.cancelled() and services.pending_store.get(post_id) is None:
+                    logger.info("Загрузка %s отменена вместе с постом", request.url)
+                    return
+                raise
+            timer.mark("download")
+            video_id = result.video_id
+            media = result.media
+
+            # Дальше видео уходит в канал: с этого момента кнопка отмены опаздывает.
+            if not claimed and services.pending_store.claim_publish(post_id) is None:
+                return
+
+            # Участники одной загрузки заливают файл по очереди: первый кладёт
+            # file_id в кэш, остальные пересылают уже его.
+            async with lease.lock:
+                cached = services.media_cache.get_by_video(result.platform, result.video_id)
+                channel_msg = await _send_cached_video(context, services, cached) if cached else None
+                if channel_msg is None:
+                    with result.file_path.open("rb") as video_file:
+                        channel_msg = await context.bot.send_video(
+                            services.settings.channel_id,
+                            video=video_file,
+                            **_video_attributes(media, with_thumbnail=True),
+                        )
+                    upload_seconds = timer.mark("upload")
+                    uploaded_file_id = _sent_video_file_id(channel_msg)
+                    if uploaded_file_id is not None:
+                        services.media_cache.put(
+                            request.url,
+                            request.platform,
+                            video_id,
+                            uploaded_file_id,
+                            media,
+                        )
+
+        if upload_seconds:
+            services.stats.add_cache_miss()
+        else:
+            timer.mark("resend")
+            services.stats.add_cache_hit()
 
-        with result.file_path.open("rb") as video_file:
-            channel_msg = await context.bot.send_video(
-                services.settings.channel_id,
-                video=video_file,
+        file_id = _sent_video_file_id(channel_msg)
+        if file_id is not None and not upload_seconds:
+            services.media_cache.put(
+                request.url,
+                request.platform,
+                video_id,
+                file_id,
+                media,
             )
 
-        with result.file_path.open("rb") as video_file:
-            sent_msg = await post_info.source_msg.reply_video(
-                video=video_file,
-                caption=voice.render_social_reply_caption(
-                    label=label,
-                    url=result.url,
-                    link=channel_msg.link if channel_msg and channel_msg.link else "",
-                ),
+        caption = voice.render_social_reply_caption(
+            label=label,
+            url=request.url,
+            link=channel_msg.link if channel_msg and channel_msg.link else "",
+        )
+        if file_id is None and result is not None:
+            with result.file_path.open("rb") as video_file:
+                sent_msg = await context.bot.send_video(
+                    post_info.chat_id,
+                    video=video_file,
+                    reply_parameters=_reply_to(post_info),
+                    caption=caption,
+                    disable_notification=True,
+                    **_video_attributes(media, with_thumbnail=True),
+                )
+        else:
+            sent_msg = await context.bot.send_video(
+                post_info.chat_id,
+                video=file_id,
+                reply_parameters=_reply_to(post_info),
+                caption=caption,
                 disable_notification=True,
+                **_video_attributes(media),
             )
+        timer.mark("reply")
+        if result is None:
+            reuse_note = "взят из кэша без скачивания и заливки"
+        elif upload_seconds == 0.0:
+            reuse_note = "заливка пропущена по кэшу id видео"
+        elif file_id is not None:
+            reuse_note = f"повторная заливка пропущена, сэкономлено ~{upload_seconds:.2f}s"
+        else:
+            reuse_note = "повторная заливка понадобилась"
+        logger.info("Social video %s опубликован: %s; %s", request.url, timer.render(), reuse_note)
 
-        await post_info.cancel_msg.edit_text(voice.render_social_success(label))
-        await asyncio.sleep(3)
-        await context.bot.set_message_reaction(
-            chat_id=sent_msg.chat_id,
-            message_id=sent_msg.message_id,
-            reaction=[ReactionTypeEmoji(random.choice(REACTION_CHOICES))],
+        await context.bot.edit_message_text(
+            voice.render_social_success(label),
+            chat_id=post_info.chat_id,
+            message_id=post_info.status_message_id,
         )
-        await post_info.cancel_msg.delete()
+        services.delay_queue.schedule(3, _react_to_reply, context, sent_msg)
+        services.message_cleaner.delete_later(post_info.chat_id, post_info.status_message_id, 3)
 
         services.stats.add_forward(post_info.request.platform)
+    except asyncio.CancelledError:
+        # Остановка не дождалась загрузки или заливки. Пока пост не ушёл в канал, запись
+        # на диске остаётся и после рестарта публикация начнётся заново.
+        interrupted = True
+        resumable = services.pending_store.forget(post_id)
+        await _edit_status(
+            context,
+            post_info,
+            voice.render_post_deferred_by_restart() if resumable else voice.render_post_interrupted_by_restart(),
+        )
+        raise
+    except PlatformUnavailable as exc:
+        logger.info("Social video %s не качаем: %s", request.url, exc)
+        await context.bot.send_message(
+            post_info.chat_id,
+            voice.render_social_platform_down(label, exc.retry_in),
+            reply_parameters=_reply_to(post_info),
+            disable_notification=True,
+        )
     except Exception as exc:
         logger.error("Ошибка при скачивании social video", exc_info=exc)
-        await post_info.source_msg.reply_text(
+        await context.bot.send_message(
+            post_info.chat_id,
             voice.render_social_error(label, exc),
+            reply_parameters=_reply_to(post_info),
             disable_notification=True,
         )
     finally:
-        services.pending_store.pop(post_id, None)
-        if result is not None and result.file_path.exists():
-            result.file_path.unlink(missing_ok=True)
+        if not interrupted:
+            services.pending_store.pop(post_id, None)
+        if lease is not None:
+            lease.release()
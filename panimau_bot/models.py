@@ -1,14 +1,25 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import asyncio
+import sys
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import TYPE_CHECKING
 
-from telegram import Message
-
 if TYPE_CHECKING:
     from panimau_bot.config import Settings
+    from panimau_bot.services.canonicalizer import UrlCanonicalizer
+    from panimau_bot.services.circuit_breaker import PlatformGuard
+    from panimau_bot.services.delay_queue import DelayHandle, DelayQueue
+    from panimau_bot.services.download_scheduler import DownloadScheduler
     from panimau_bot.services.downloader import SocialVideoDownloader
+    from panimau_bot.services.media_cache import MediaCache
+    from panimau_bot.services.message_cleanup import MessageCleaner
+    from panimau_bot.services.outbound import OutboundRateLimiter
+    from panimau_bot.services.pending_backend import PendingBackend
+    from panimau_bot.services.singleflight import FlightLease, SingleFlight
+    from panimau_bot.services.transcoder import VideoTranscoder
     from panimau_bot.stats import BotStats
 
 AttachmentItem = tuple[str, str]
@@ -20,42 +31,200 @@ class DownloadRequest:
     platform: str
 
 
+@dataclass(slots=True, frozen=True)
+class MediaInfo:
+    width: int | None = None
+    height: int | None = None
+    duration: float | None = None
+    thumbnail_path: Path | None = None
+
+
 @dataclass(slots=True)
 class DownloadResult:
     file_path: Path
     url: str
     platform: str
+    video_id: str | None = None
+    duration: float | None = None
+    media: MediaInfo | None = None
+    # Чистое время загрузки без ожидания в очереди: из него считается латентность платформ.
+    download_seconds: float | None = None
+
+
+@dataclass(slots=True, frozen=True)
+class DownloadProgress:
+    downloaded_bytes: int
+    total_bytes: int | None = None
+
+    @property
+    def percent(self) -> int | None:
+        if not self.total_bytes:
+            return None
+        return min(100, self.downloaded_bytes * 100 // self.total_bytes)
 
 
 @dataclass(slots=True)
 class PendingAttachmentPost:
-    source_msg: Message
-    cancel_msg: Message
+    chat_id: int
+    source_message_id: int
+    status_message_id: int
     file_types: list[AttachmentItem]
+    media_group_id: str | None = None
+    message_ids: list[int] = field(default_factory=list)
+    publish_job: "DelayHandle | None" = None
+    publish_at: float = 0.0
+    created_at: float = field(default_factory=time.monotonic)
 
 
 @dataclass(slots=True)
 class PendingDownloadPost:
-    source_msg: Message
-    cancel_msg: Message
+    chat_id: int
+    source_message_id: int
+    status_message_id: int
     request: DownloadRequest
+    download_task: asyncio.Future[DownloadResult] | None = None
+    prefetch: "FlightLease[DownloadResult] | None" = None
+    publish_job: "DelayHandle | None" = None
+    publish_at: float = 0.0
+    created_at: float = field(default_factory=time.monotonic)
 
 
 PendingPost = PendingAttachmentPost | PendingDownloadPost
 
 
+def release_pending_post(post: PendingPost) -> None:
+    """Гасит всё, что висит на снятом посте: таймер публикации, загрузку, спекулятивную аренду."""
+    if post.publish_job is not None:
+        post.publish_job.cancel()
+    if isinstance(post, PendingDownloadPost):
+        if post.download_task is not None:
+            post.download_task.cancel()
+        if post.prefetch is not None:
+            post.prefetch.release()
+
+
 class PendingStore:
-    def __init__(self) -> None:
+    """Отложенные посты. Переходы claim_* без await внутри, поэтому атомарны для event loop."""
+
+    def __init__(self, backend: "PendingBackend | None" = None) -> None:
         self._posts: dict[str, PendingPost] = {}
+        self._media_groups: dict[str, str] = {}
+        self._claimed: set[str] = set()
+        self._backend = backend
+
+    def restore(self) -> int:
+        """Поднимает посты, переживающие рестарт; таймеры к ним заводит вызывающий."""
+        if self._backend is None:
+            return 0
+        for post_id, post in self._backend.load().items():
+            self._index(post_id, post)
+        return len(self._posts)
+
+    @property
+    def durable(self) -> bool:
+        return self._backend is not None
+
+    def items(self) -> list[tuple[str, PendingPost]]:
+        return list(self._posts.items())
 
     def get(self, post_id: str) -> PendingPost | None:
         return self._posts.get(post_id)
 
-    def set(self, post_id: str, post: PendingPost) -> None:
+    def get_media_group(self, media_group_id: str) -> PendingAttachmentPost | None:
+        post_id = self._media_groups.get(media_group_id)
+        if post_id is None or post_id in self._claimed:
+            return None
+        post = self._posts.get(post_id)
+        return post if isinstance(post, PendingAttachmentPost) else None
+
+    def _index(self, post_id: str, post: PendingPost) -> None:
         self._posts[post_id] = post
+        if isinstance(post, PendingAttachmentPost) and post.media_group_id:
+            self._media_groups[post.media_group_id] = post_id
+
+    def set(self, post_id: str, post: PendingPost) -> None:
+        self._index(post_id, post)
+        if self._backend is not None:
+            self._backend.save(post_id, post)
+
+    def update(self, post_id: str) -> None:
+        """Сохраняет изменившийся пост (например, альбом с новой частью)."""
+        post = self._posts.get(post_id)
+        if post is not None and post_id not in self._claimed and self._backend is not None:
+            self._backend.save(post_id, post)
+
+    def _drop(self, post_id: str) -> PendingPost | None:
+        self._claimed.discard(post_id)
+        post = self._posts.pop(post_id, None)
+        if isinstance(post, PendingAttachmentPost) and post.media_group_id:
+            if self._media_groups.get(post.media_group_id) == post_id:
+                del self._media_groups[post.media_group_id]
+        return post
 
     def pop(self, post_id: str, default: PendingPost | None = None) -> PendingPost | None:
-        return self._posts.pop(post_id, default)
+        post = self._drop(post_id)
+        if post is None:
+            return default
+        if self._backend is not None:
+            self._backend.delete(post_id)
+        return post
+
+    def forget(self, post_id: str) -> bool:
+        """Убирает пост только из памяти: публикацию прервала остановка, а не пользователь.
+
+        Возвращает True, если запись осталась на диске и после рестарта пост поднимется.
+        """
+        persisted = self._backend is not None and post_id not in self._claimed
+        return self._drop(post_id) is not None and persisted
+
+    def claim_publish(self, post_id: str) -> PendingPost | None:
+        """Забирает пост под публикацию; после этого отменить его уже нельзя."""
+        if post_id in self._claimed:
+            return None
+        post = self._posts.get(post_id)
+        if post is not None:
+            self._claimed.add(post_id)
+            # После рестарта такой пост не переиграть: лучше потерять, чем задвоить в канале.
+            if self._backend is not None:
+                self._backend.delete(post_id)
+        return post
+
+    def claim_cancel(self, post_id: str) -> PendingPost | None:
+        """Снимает пост, если публикация ещё не началась; иначе None."""
+        if post_id in self._claimed:
+            return None
+        return self.pop(post_id)
+
+    def sweep(self, max_age_seconds: float, now: float | None = None) -> list[PendingPost]:
+        """Выкидывает посты старше max_age: их джоба упала или колбэк потерялся."""
+        deadline = (time.monotonic() if now is None else now) - max_age_seconds
+        stale_ids = [post_id for post_id, post in self._posts.items() if post.created_at < deadline]
+        stale_posts: list[PendingPost] = []
+        for post_id in stale_ids:
+            post = self.pop(post_id)
+            if post is not None:
+                release_pending_post(post)
+                stale_posts.append(post)
+        return stale_posts
+
+    def memory_bytes(self) -> int:
+        """Грубая оценка памяти под записи: сами записи, их списки и индексы."""
+        total = sys.getsizeof(self._posts) + sys.getsizeof(self._media_groups) + sys.getsizeof(self._claimed)
+        for post_id, post in self._posts.items():
+            total += sys.getsizeof(post_id) + sys.getsizeof(post)
+            if isinstance(post, PendingAttachmentPost):
+                total += sys.getsizeof(post.file_types) + sys.getsizeof(post.message_ids)
+                total += sum(sys.getsizeof(file_id) for _, file_id in post.file_types)
+            else:
+                total += sys.getsizeof(post.request) + sys.getsizeof(post.request.url)
+        return total
+
+    def close(self) -> None:
+        if self._backend is not None:
+            self._backend.close()
+
+    def __len__(self) -> int:
+        return len(self._posts)
 
 
 @dataclass(slots=True)
@@ -64,3 +233,12 @@ class AppServices:
     stats: "BotStats"
     pending_store: PendingStore
     downloader: "SocialVideoDownloader"
+    media_cache: "MediaCache"
+    inflight_downloads: "SingleFlight[DownloadResult]"
+    download_scheduler: "DownloadScheduler"
+    transcoder: "VideoTranscoder"
+    outbound: "OutboundRateLimiter"
+    delay_queue: "DelayQueue"
+    message_cleaner: "MessageCleaner"
+    platform_guard: "PlatformGuard"
+    canonicalizer: "UrlCanonicalizer"
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from dataclasses import replace
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import httpx
+
+from panimau_bot.models import DownloadRequest
+from panimau_bot.services.social_urls import detect_platform
+from panimau_bot.services.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+SHORT_LINK_HOSTS = frozenset({"vm.tiktok.com", "vt.tiktok.com"})
+TRACKING_PARAMS = frozenset(
+    {
+        "si",
+        "feature",
+        "pp",
+        "igsh",
+        "igshid",
+        "img_index",
+        "_r",
+        "_t",
+        "is_from_webapp",
+        "sender_device",
+        "sender_web_id",
+        "share_app_id",
+        "share_item_id",
+        "share_link_id",
+        "social_sharing",
+        "source",
+        "tt_from",
+        "u_code",
+        "user_id",
+        "web_id",
+        "fbclid",
+        "gclid",
+    }
+)
+TRACKING_PREFIXES = ("utm_",)
+
+DEFAULT_CACHE_ENTRIES = 4096
+DEFAULT_CACHE_TTL_SECONDS = 24 * 3600
+DEFAULT_TIMEOUT_SECONDS = 5.0
+MAX_REDIRECTS = 5
+
+_YOUTUBE_ID = re.compile(r"[A-Za-z0-9_-]{11}")
+_YOUTUBE_SHORTS_PATH = re.compile(r"/shorts/([A-Za-z0-9_-]{11})(?:/|$)")
+_INSTAGRAM_REEL_PATH = re.compile(r"/(?:[^/]+/)?reels?/([A-Za-z0-9_-]+)")
+_TIKTOK_VIDEO_PATH = re.compile(r"/(@[^/]+)/video/(\d+)")
+
+
+def _strip_tracking(query: str) -> str:
+    kept = [
+        (key, value)
+        for key, value in parse_qsl(query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+    return urlencode(kept)
+
+
+def canonicalize_url(url: str) -> str:
+    """Приводит ссылку на ролик к одному виду без сети: один ролик - одна строка.
+
+    youtu.be и shorts сводятся к https://www.youtube.com/shorts/<id>, рилсы - к
+    https://www.instagram.com/reel/<code>/, тикток - к /@автор/video/<id>. У остальных
+    ссылок, включая короткие vm.tiktok.com, вырезаются только трекинговые параметры.
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    bare_host = host.removeprefix("www.").removeprefix("m.")
+
+    if bare_host == "youtu.be":
+        video_id = parts.path.strip("/").split("/", 1)[0]
+        if _YOUTUBE_ID.fullmatch(video_id):
+            return f"https://www.youtube.com/shorts/{video_id}"
+    elif bare_host == "youtube.com":
+        match = _YOUTUBE_SHORTS_PATH.match(parts.path)
+        if match:
+            return f"https://www.youtube.com/shorts/{match.group(1)}"
+    elif bare_host == "instagram.com":
+        match = _INSTAGRAM_REEL_PATH.match(parts.path)
+        if match:
+            return f"https://www.instagram.com/reel/{match.group(1)}/"
+    elif bare_host == "tiktok.com":
+        match = _TIKTOK_VIDEO_PATH.match(parts.path)
+        if match:
+            return f"https://www.tiktok.com/{match.group(1)}/video/{match.group(2)}"
+
+    return urlunsplit((parts.scheme or "https", parts.netloc.lower(), parts.path, _strip_tracking(parts.query), ""))
+
+
+class UrlCanonicalizer:
+    """Канонизация ссылок для кэша и склейки дублей; короткие ссылки раскрываются по сети.
+
+    Раскрытие идёт через один общий httpx.AsyncClient с пулом соединений, результаты
+    живут в LRU-кэше с TTL, а одновременные запросы одной короткой ссылки сливаются
+    в один. Если раскрыть не вышло, остаётся короткая ссылка: yt-dlp справится и с ней.
+    timeout_seconds ограничивает раскрытие целиком, со всеми редиректами.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient | None = None,
+        cache_entries: int = DEFAULT_CACHE_ENTRIES,
+        cache_ttl_seconds: float = DEFAULT_CACHE_TTL_SECONDS,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        short_link_hosts: frozenset[str] = SHORT_LINK_HOSTS,
+    ) -> None:
+        self.client = client or httpx.AsyncClient(
+            timeout=timeout_seconds,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            headers={"User-Agent": "Mozilla/5.0 (compatible; panimau-bot)"},
+        )
+        self.short_link_hosts = short_link_hosts
+        self.timeout_seconds = timeout_seconds
+        self.resolutions: TTLCache[str, str] = TTLCache(cache_entries, cache_ttl_seconds)
+        self._inflight: dict[str, asyncio.Future[str | None]] = {}
+
+    def is_short_link(self, url: str) -> bool:
+        return (urlsplit(url).hostname or "").lower() in self.short_link_hosts
+
+    def normalize(self, request: DownloadRequest) -> DownloadRequest:
+        """Канонизация без сети: короткая ссылка раскрывается, только если уже есть в кэше."""
+        url = canonicalize_url(request.url)
+        if self.is_short_link(url):
+            url = self.resolutions.get(url) or url
+        return request if url == request.url else replace(request, url=url)
+
+    async def canonicalize(self, request: DownloadRequest) -> DownloadRequest:
+        url = canonicalize_url(request.url)
+        if self.is_short_link(url):
+            resolved = await self.resolve(url)
+            if resolved is not None:
+                url = resolved
+        return request if url == request.url else replace(request, url=url)
+
+    async def resolve(self, url: str) -> str | None:
+        """Раскрывает короткую ссылку в каноническую; None, если не получилось."""
+        cached = self.resolutions.get(url)
+        if cached is not None:
+            return cached
+
+        pending = self._inflight.get(url)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future: asyncio.Future[str | None] = asyncio.get_running_loop().create_future()
+        self._inflight[url] = future
+        try:
+            resolved = await self._follow(url)
+        except BaseException:
+            future.set_result(None)
+            raise
+        else:
+            future.set_result(resolved)
+        finally:
+            del self._inflight[url]
+
+        if resolved is not None:
+            self.resolutions.set(url, resolved)
+        return resolved
+
+    async def _follow(self, url: str) -> str | None:
+        current = url
+        try:
+            async with asyncio.timeout(self.timeout_seconds):
+                for _ in range(MAX_REDIRECTS):
+                    # Тело не нужно: читаем только заголовки и сразу отдаём соединение в пул.
+                    response = await self.client.send(
+                        self.client.build_request("GET", current),
+                        follow_redirects=False,
+                        stream=True,
+                    )
+                    await response.aclose()
+                    location = response.headers.get("location")
+                    if not response.is_redirect or not location:
+                        break
+                    current = urljoin(current, location)
+                    if not self.is_short_link(current):
+                        break
+        except TimeoutError:
+            logger.info("Короткая ссылка %s не раскрылась за %ss", url, self.timeout_seconds)
+            return None
+        except (httpx.HTTPError, httpx.InvalidURL) as exc:
+            logger.info("Не раскрылась короткая ссылка %s: %s", url, exc)
+            return None
+
+        canonical = canonicalize_url(current)
+        if canonical == url or detect_platform(canonical) is None:
+            logger.info("Короткая ссылка %s ведёт не на ролик: %s", url, current)
+            return None
+        return canonical
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
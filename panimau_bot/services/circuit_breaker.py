@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import TypeVar
+
+from panimau_bot.services.delay_queue import DelayQueue
+from panimau_bot.services.download_errors import (
+    RATE_LIMITED,
+    TIMED_OUT,
+    TRANSIENT,
+    UNAVAILABLE,
+    UNSUPPORTED,
+    classify_download_error,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+ProbeCallback = Callable[[str, str], Awaitable[object]]
+
+CLOSED = "closed"
+OPEN = "open"
+PROBING = "probing"
+
+# Что говорит о здоровье платформы, а не о конкретной ссылке или о самом боте.
+# Повторяется из них только TRANSIENT: таймаут и так уже съел всё отведённое время.
+# UNKNOWN сюда не входит: неопознанная ошибка чаще оказывается багом самого бота.
+PLATFORM_FAILURES = frozenset({TRANSIENT, TIMED_OUT, RATE_LIMITED, UNSUPPORTED})
+
+
+class PlatformUnavailable(Exception):
+    """Предохранитель платформы разомкнут: загрузку даже не начинаем."""
+
+    def __init__(self, platform: str, retry_in: float) -> None:
+        super().__init__(f"{platform} сейчас лежит, проверим снова через {retry_in:.0f}с")
+        self.platform = platform
+        self.retry_in = retry_in
+
+
+@dataclass(slots=True, frozen=True)
+class BreakerSnapshot:
+    platform: str
+    state: str
+    failures: int
+    retry_in: float
+    last_error: str | None
+
+
+class _Breaker:
+    __slots__ = ("state", "failures", "opened_until", "recovery", "probe_url", "last_error")
+
+    def __init__(self, recovery: float) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_until = 0.0
+        self.recovery = recovery
+        self.probe_url: str | None = None
+        self.last_error: str | None = None
+
+
+class PlatformGuard:
+    """Повторы с джиттером и предохранитель на каждую платформу.
+
+    Временные ошибки повторяются с экспоненциальной паузой со случайным разбросом.
+    После failure_threshold подряд ошибок платформы (429 - сразу) предохранитель
+    размыкается: новые загрузки падают мгновенно, а через recovery секунд в фоне
+    идёт пробный запрос по последней упавшей ссылке. Проба прошла - замыкаемся,
+    нет - ждём вдвое дольше, но не больше max_recovery.
+    """
+
+    def __init__(
+        self,
+        delay_queue: DelayQueue,
+        probe: ProbeCallback,
+        failure_threshold: int = 5,
+        recovery_seconds: float = 60,
+        max_recovery_seconds: float = 900,
+        retry_attempts: int = 2,
+        retry_base_seconds: float = 1,
+        retry_max_seconds: float = 10,
+    ) -> None:
+        self.delay_queue = delay_queue
+        self.probe = probe
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_seconds = recovery_seconds
+        self.max_recovery_seconds = max(recovery_seconds, max_recovery_seconds)
+        self.retry_attempts = max(0, retry_attempts)
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._breakers: dict[str, _Breaker] = {}
+
+    def _breaker(self, platform: str) -> _Breaker:
+        breaker = self._breakers.get(platform)
+        if breaker is None:
+            breaker = self._breakers[platform] = _Breaker(self.recovery_seconds)
+        return breaker
+
+    def backoff(self, attempt: int) -> float:
+        """Пауза перед повтором номер attempt (с нуля): full jitter до потолка."""
+        ceiling = min(self.retry_max_seconds, self.retry_base_seconds * 2**attempt)
+        return random.uniform(0, ceiling)
+
+    def retry_in(self, platform: str) -> float | None:
+        """Сколько ещё разомкнута платформа; None, если загрузки разрешены."""
+        breaker = self._breakers.get(platform)
+        if breaker is None or breaker.state == CLOSED:
+            return None
+        return max(0.0, breaker.opened_until - time.monotonic())
+
+    def check(self, platform: str) -> None:
+        retry_in = self.retry_in(platform)
+        if retry_in is not None:
+            raise PlatformUnavailable(platform, retry_in)
+
+    async def call(self, platform: str, url: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Выполняет загрузку с повторами временных ошибок и учётом в предохранителе."""
+        retries = 0
+        while True:
+            self.check(platform)
+            try:
+                result = await attempt()
+            except Exception as exc:
+                kind = classify_download_error(exc)
+                self.record_failure(platform, url, kind, exc)
+                if kind != TRANSIENT or retries >= self.retry_attempts:
+                    raise
+                delay = self.backoff(retries)
+                retries += 1
+                logger.info("Повтор загрузки %s через %.1fс после ошибки: %s", url, delay, exc)
+                await asyncio.sleep(delay)
+                continue
+            self.record_success(platform)
+            return result
+
+    def record_success(self, platform: str) -> None:
+        breaker = self._breakers.get(platform)
+        if breaker is not None and breaker.state == CLOSED:
+            breaker.failures = 0
+
+    def record_failure(self, platform: str, url: str, kind: str, error: BaseException) -> None:
+        if kind not in PLATFORM_FAILURES:
+            return
+        breaker = self._breaker(platform)
+        breaker.failures += 1
+        breaker.last_error = f"{kind}: {error}"[:200]
+        breaker.probe_url = url
+        if breaker.state != CLOSED:
+            return
+        if kind == RATE_LIMITED or breaker.failures >= self.failure_threshold:
+            self._open(platform, breaker)
+
+    def _open(self, platform: str, breaker: _Breaker) -> None:
+        breaker.state = OPEN
+        breaker.opened_until = time.monotonic() + breaker.recovery
+        self.delay_queue.schedule(breaker.recovery, self._probe, platform)
+        logger.warning(
+            "Предохранитель %s разомкнут на %.0fс после %s ошибок: %s",
+            platform,
+            breaker.recovery,
+            breaker.failures,
+            breaker.last_error,
+        )
+
+    def _close(self, platform: str, breaker: _Breaker) -> None:
+        breaker.state = CLOSED
+        breaker.failures = 0
+        breaker.recovery = self.recovery_seconds
+        logger.info("Предохранитель %s замкнут: платформа ожила", platform)
+
+    async def _probe(self, platform: str) -> None:
+        breaker = self._breaker(platform)
+        if breaker.state != OPEN or breaker.probe_url is None:
+            return
+        breaker.state = PROBING
+        try:
+            await self.probe(platform, breaker.probe_url)
+        except Exception as exc:
+            kind = classify_download_error(exc)
+            if kind == UNAVAILABLE:
+                # Ссылка умерла сама по себе, но платформа ответила: этого достаточно.
+                self._close(platform, breaker)
+                return
+            if kind in PLATFORM_FAILURES:
+                breaker.last_error = f"{kind}: {exc}"[:200]
+                breaker.recovery = min(self.max_recovery_seconds, breaker.recovery * 2)
+            # Платформа ещё болеет или проба упёрлась в лимиты самого бота: пробуем позже.
+            self._open(platform, breaker)
+            return
+        except BaseException:
+            breaker.state = OPEN
+            raise
+        self._close(platform, breaker)
+
+    def snapshot(self) -> list[BreakerSnapshot]:
+        return [
+            BreakerSnapshot(
+                platform=platform,
+                state=breaker.state,
+                failures=breaker.failures,
+                retry_in=self.retry_in(platform) or 0.0,
+                last_error=breaker.last_error,
+            )
+            for platform, breaker in sorted(self._breakers.items())
+        ]
+
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import copy
+import http.cookiejar
+import io
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from yt_dlp.cookies import YoutubeDLCookieJar
+
+logger = logging.getLogger(__name__)
+
+CookieKey = tuple[str, str, str]
+CookieState = dict[CookieKey, tuple[str | None, int | None]]
+
+MAX_COOKIE_FILE_BYTES = 1024 * 1024
+
+
+def cookie_state(jar: http.cookiejar.CookieJar) -> CookieState:
+    """Отпечаток банки: по нему видно, что поменяла конкретная загрузка."""
+    return {(cookie.domain, cookie.path, cookie.name): (cookie.value, cookie.expires) for cookie in jar}
+
+
+class CookieStore:
+    """Куки платформ на диске, по файлу в формате Netscape на платформу.
+
+    Загрузки работают со своими копиями банки и возвращают сюда только то, что
+    поменяли сами, поэтому параллельные загрузки одной платформы не затирают
+    обновления друг друга. Файл переписывается атомарно.
+    """
+
+    def __init__(self, directory: Path | str) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._jars: dict[str, YoutubeDLCookieJar] = {}
+        self._versions: dict[str, int] = {}
+
+    def path(self, platform: str) -> Path:
+        return self.directory / f"{platform}.txt"
+
+    def _jar(self, platform: str) -> YoutubeDLCookieJar:
+        jar = self._jars.get(platform)
+        if jar is not None:
+            return jar
+        jar = YoutubeDLCookieJar()
+        path = self.path(platform)
+        if path.exists():
+            try:
+                jar.load(str(path))
+            except (OSError, http.cookiejar.LoadError) as exc:
+                logger.warning("Куки %s не читаются, начинаем с пустых: %s", platform, exc)
+                jar = YoutubeDLCookieJar()
+        self._jars[platform] = jar
+        return jar
+
+    def _save(self, platform: str, jar: YoutubeDLCookieJar) -> None:
+        path = self.path(platform)
+        handle, temp_name = tempfile.mkstemp(prefix=f".{platform}.", dir=self.directory)
+        try:
+            os.fchmod(handle, 0o600)
+            with os.fdopen(handle, "w", encoding="utf-8") as temp_file:
+                jar.save(temp_file)
+            os.replace(temp_name, path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+
+    def version(self, platform: str) -> int:
+        with self._lock:
+            return self._versions.get(platform, 0)
+
+    def count(self, platform: str) -> int:
+        with self._lock:
+            return len(self._jar(platform))
+
+    def sync(self, platform: str, jar: http.cookiejar.CookieJar, known_version: int) -> tuple[int, CookieState]:
+        """Подтягивает в jar свежие куки, если у него версия старше; возвращает версию и отпечаток."""
+        with self._lock:
+            version = self._versions.get(platform, 0)
+            if version != known_version:
+                jar.clear()
+                for cookie in self._jar(platform):
+                    jar.set_cookie(copy.copy(cookie))
+            return version, cookie_state(jar)
+
+    def absorb(
+        self,
+        platform: str,
+        jar: http.cookiejar.CookieJar,
+        baseline: CookieState,
+        known_version: int,
+    ) -> int | None:
+        """Переносит в хранилище то, что загрузка поменяла относительно baseline.
+
+        Возвращает версию, с которой jar теперь совпадает, или None, если пока
+        шла загрузка, куки успел обновить кто-то ещё и jar надо пересинхронизировать.
+        """
+        current = cookie_state(jar)
+        changed = [
+            cookie
+            for cookie in jar
+            if baseline.get((cookie.domain, cookie.path, cookie.name)) != (cookie.value, cookie.expires)
+        ]
+        removed = [key for key in baseline if key not in current]
+        with self._lock:
+            version = self._versions.get(platform, 0)
+            if not changed and not removed:
+                return version if version == known_version else None
+            master = self._jar(platform)
+            for cookie in changed:
+                master.set_cookie(copy.copy(cookie))
+            for domain, path, name in removed:
+                try:
+                    master.clear(domain, path, name)
+                except KeyError:
+                    pass
+            try:
+                self._save(platform, master)
+            except OSError as exc:
+                logger.warning("Не удалось сохранить куки %s: %s", platform, exc)
+            self._versions[platform] = version + 1
+            return version + 1 if version == known_version else None
+
+    def replace(self, platform: str, data: bytes) -> int:
+        """Ставит куки из загруженного админом файла; бросает ValueError на мусор."""
+        if len(data) > MAX_COOKIE_FILE_BYTES:
+            raise ValueError("Файл кук слишком большой")
+        jar = YoutubeDLCookieJar()
+        try:
+            jar.load(io.StringIO(data.decode("utf-8")))
+        except (UnicodeDecodeError, http.cookiejar.LoadError) as exc:
+            raise ValueError(f"Это не cookies.txt в формате Netscape: {exc}") from exc
+        if not len(jar):
+            raise ValueError("В файле нет ни одной куки")
+        with self._lock:
+            self._save(platform, jar)
+            self._jars[platform] = jar
+            self._versions[platform] = self._versions.get(platform, 0) + 1
+        logger.info("Загружены новые куки %s: %s шт.", platform, len(jar))
+        return len(jar)
+
+    def export(self, platform: str, path: Path) -> CookieState:
+        """Пишет копию кук для дочернего процесса и возвращает её отпечаток."""
+        with self._lock:
+            jar = self._jar(platform)
+            jar.save(str(path))
+            return cookie_state(jar)
+
+    def absorb_file(self, platform: str, path: Path, baseline: CookieState) -> None:
+        if not path.exists():
+            return
+        jar = YoutubeDLCookieJar()
+        try:
+            jar.load(str(path))
+        except (OSError, http.cookiejar.LoadError) as exc:
+            logger.warning("Куки после загрузки %s не читаются: %s", platform, exc)
+            return
+        self.absorb(platform, jar, baseline, known_version=-1)
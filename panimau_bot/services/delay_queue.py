@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+DelayedAction = Callable[..., Awaitable[Any]]
+
+
+class DelayHandle:
+    """Запись в куче. Отмена только помечает её: снимется, когда дойдёт до вершины."""
+
+    __slots__ = ("deadline", "seq", "action", "args", "cancelled", "fired", "_queue")
+
+    def __init__(
+        self,
+        deadline: float,
+        seq: int,
+        action: DelayedAction,
+        args: tuple[Any, ...],
+        queue: DelayQueue,
+    ) -> None:
+        self.deadline = deadline
+        self.seq = seq
+        self.action = action
+        self.args = args
+        self.cancelled = False
+        self.fired = False
+        self._queue = queue
+
+    def __lt__(self, other: DelayHandle) -> bool:
+        return (self.deadline, self.seq) < (other.deadline, other.seq)
+
+    def cancel(self) -> bool:
+        """Снимает действие, если оно ещё не сработало."""
+        if self.cancelled or self.fired:
+            return False
+        self.cancelled = True
+        self._queue._forget()
+        return True
+
+
+@dataclass(slots=True, frozen=True)
+class DelayQueueSnapshot:
+    pending: int
+    running: int
+    fired: int
+    cancelled: int
+
+
+class DelayQueue:
+    """Одна задача asyncio над min-кучей дедлайнов вместо таймера на каждый пост."""
+
+    def __init__(self) -> None:
+        self._heap: list[DelayHandle] = []
+        self._pending = 0
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._runner: asyncio.Task[None] | None = None
+        self._running: set[asyncio.Task[Any]] = set()
+        self._fired = 0
+        self._cancelled = 0
+
+    def __len__(self) -> int:
+        return self._pending
+
+    def schedule(self, delay: float, action: DelayedAction, *args: Any) -> DelayHandle:
+        """Ставит action(*args) на выполнение через delay секунд."""
+        handle = DelayHandle(time.monotonic() + delay, next(self._counter), action, args, self)
+        heapq.heappush(self._heap, handle)
+        self._pending += 1
+        if self._heap[0] is handle:
+            self._wakeup.set()
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.get_running_loop().create_task(self._run(), name="delay-queue")
+        return handle
+
+    def _forget(self) -> None:
+        self._pending -= 1
+        self._cancelled += 1
+        # Мёртвых записей больше половины: дешевле пересобрать кучу, чем таскать их.
+        if len(self._heap) > 64 and self._pending < len(self._heap) // 2:
+            self._heap = [entry for entry in self._heap if not entry.cancelled]
+            heapq.heapify(self._heap)
+
+    async def _run(self) -> None:
+        while True:
+            while self._heap and self._heap[0].cancelled:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0].deadline - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            handle = heapq.heappop(self._heap)
+            self._pending -= 1
+            self._start(handle)
+
+    def _start(self, handle: DelayHandle) -> None:
+        handle.fired = True
+        self._fired += 1
+        task = asyncio.get_running_loop().create_task(self._fire(handle))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    def expedite(self, handle: DelayHandle) -> DelayHandle | None:
+        """Запускает ещё не сработавшее действие прямо сейчас, не дожидаясь дедлайна."""
+        if handle.cancelled or handle.fired:
+            return None
+        # Старая запись остаётся в куче мёртвой и снимется, когда всплывёт.
+        handle.cancelled = True
+        self._pending -= 1
+        started = DelayHandle(time.monotonic(), next(self._counter), handle.action, handle.args, self)
+        self._start(started)
+        return started
+
+    async def drain(self, timeout: float) -> int:
+        """Ждёт уже запущенные действия до timeout; не успевшие отменяет и возвращает их число."""
+        tasks = set(self._running)
+        if not tasks:
+            return 0
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return len(pending)
+
+    async def _fire(self, handle: DelayHandle) -> None:
+        try:
+            await handle.action(*handle.args)
+        except Exception as exc:
+            name = getattr(handle.action, "__qualname__", handle.action)
+            logger.warning("Отложенное действие %s упало: %s", name, exc)
+
+    def snapshot(self) -> DelayQueueSnapshot:
+        return DelayQueueSnapshot(
+            pending=self._pending,
+            running=len(self._running),
+            fired=self._fired,
+            cancelled=self._cancelled,
+        )
+
+    async def stop(self) -> None:
+        """Гасит цикл и ещё бегущие действия; несработавшие таймеры просто выбрасываются."""
+        tasks = list(self._running)
+        if self._runner is not None:
+            tasks.append(self._runner)
+            self._runner = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import re
+import socket
+
+from yt_dlp.networking.exceptions import TransportError
+from yt_dlp.utils import PostProcessingError, UnsupportedError
+
+from panimau_bot.services.downloader import DownloadCancelled, DownloadTimeout
+from panimau_bot.services.formats import MediaTooLarge
+from panimau_bot.services.spool import SpoolFull
+
+# Сеть моргнула или платформа ответила 5xx: есть смысл повторить.
+TRANSIENT = "transient"
+# Загрузка выбрала весь свой таймаут: платформа тормозит, но повтор утроил бы ожидание.
+TIMED_OUT = "timed_out"
+# Платформа попросила притормозить (429 и родственники).
+RATE_LIMITED = "rate_limited"
+# Ролик удалён, приватный или закрыт логином: повтор не поможет, платформа ни при чём.
+UNAVAILABLE = "unavailable"
+# Ссылку или страницу экстрактор не понимает; массово - значит, платформа что-то поменяла.
+UNSUPPORTED = "unsupported"
+# Ошибка не про платформу: лимиты самого бота, отмена, нехватка места, сбой ffmpeg.
+LOCAL = "local"
+# Не опознали: предохранитель такие не считает, чтобы баг бота не «ронял» платформу.
+UNKNOWN = "unknown"
+
+# Порядок важен: «HTTP Error 503: Service Unavailable» - сбой сети, а не удалённый ролик.
+_PATTERNS: tuple[tuple[str, re.Pattern[str]], ...] = (
+    (
+        # Склейка и перепаковка после скачивания и ошибки диска: платформа уже всё отдала,
+        # а в тексте ffmpeg бывает что угодно, включая «not available» и «timed out».
+        LOCAL,
+        re.compile(
+            r"Postprocessing|PostProcessingError|No space left|Permission denied|Read-only file system",
+            re.IGNORECASE,
+        ),
+    ),
+    (
+        # Так Instagram отвечает на любой приватный или удалённый рилс. Слово rate-limit
+        # в тексте есть, но предохранитель из-за одной мёртвой ссылки размыкать нельзя.
+        UNAVAILABLE,
+        re.compile(r"content is not available, rate-limit reached or login required", re.IGNORECASE),
+    ),
+    (
+        RATE_LIMITED,
+        re.compile(
+            r"HTTP Error 429|Too Many Requests|rate[- ]limit|try again later|not a bot",
+            re.IGNORECASE,
+        ),
+    ),
+    (
+        TRANSIENT,
+        re.compile(
+            r"timed? ?out|Connection (?:reset|refused|aborted)|Temporary failure|Name or service|"
+            r"Remote end closed|IncompleteRead|HTTP Error 5\d\d|TransportError|SSL|EOF occurred|"
+            r"Network is unreachable",
+            re.IGNORECASE,
+        ),
+    ),
+    (
+        UNAVAILABLE,
+        re.compile(
+            r"private|login required|log in|sign in|not available|unavailable|removed|deleted|"
+            r"does not exist|HTTP Error (?:401|403|404|410)|age[- ]restricted|copyright",
+            re.IGNORECASE,
+        ),
+    ),
+    (
+        UNSUPPORTED,
+        re.compile(
+            r"Unsupported URL|Unable to extract|no video formats|unable to download JSON",
+            re.IGNORECASE,
+        ),
+    ),
+)
+
+
+def classify_download_error(error: BaseException) -> str:
+    """Относит ошибку загрузки к одному из классов выше.
+
+    В режиме process исключение приходит строкой «Тип: текст» внутри DownloadError,
+    поэтому класс определяется в первую очередь по тексту, а типы только дополняют его.
+    """
+    if isinstance(error, (MediaTooLarge, SpoolFull, DownloadCancelled)):
+        return LOCAL
+    if isinstance(error, DownloadTimeout):
+        return TIMED_OUT
+
+    message = str(error)
+    for kind, pattern in _PATTERNS:
+        if pattern.search(message):
+            return kind
+
+    cause = getattr(error, "exc_info", None)
+    original = cause[1] if isinstance(cause, tuple) and len(cause) > 1 else error.__cause__
+    for candidate in (original, error):
+        if isinstance(candidate, (TimeoutError, ConnectionError, socket.gaierror, TransportError)):
+            return TRANSIENT
+        if isinstance(candidate, UnsupportedError):
+            return UNSUPPORTED
+        # Сетевые OSError разобраны строкой выше; остальные - это диск и процессы самого бота.
+        if isinstance(candidate, (PostProcessingError, OSError)):
+            return LOCAL
+    return UNKNOWN
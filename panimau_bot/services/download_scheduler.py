@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from collections.abc import Callable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PositionCallback = Callable[[int], None]
+
+WAIT_SAMPLES = 100
+
+
+@dataclass(slots=True, frozen=True)
+class DownloadQueueSnapshot:
+    workers: int
+    active: int
+    queued: int
+    queued_by_platform: dict[str, int]
+    active_by_platform: dict[str, int]
+    completed: int
+    avg_wait_seconds: float
+    max_wait_seconds: float
+
+
+class _Ticket:
+    __slots__ = ("platform", "granted", "enqueued_at", "on_position", "position")
+
+    def __init__(self, platform: str, on_position: PositionCallback | None) -> None:
+        self.platform = platform
+        self.granted: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+        self.on_position = on_position
+        self.position = 0
+
+
+class DownloadScheduler:
+    """Ограниченный пул потоков для загрузок с лимитами по платформам и FIFO-очередью."""
+
+    def __init__(self, workers: int = 4, platform_limits: Mapping[str, int] | None = None) -> None:
+        self.workers = max(1, workers)
+        self.platform_limits = dict(platform_limits or {})
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="download")
+        self._queue: deque[_Ticket] = deque()
+        self._active: Counter[str] = Counter()
+        self._completed = 0
+        self._waits: deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+    @property
+    def active(self) -> int:
+        return sum(self._active.values())
+
+    def _has_capacity(self, platform: str) -> bool:
+        if self.active >= self.workers:
+            return False
+        limit = self.platform_limits.get(platform)
+        return limit is None or self._active[platform] < limit
+
+    def _dispatch(self) -> None:
+        # Берём первый в очереди тикет, чья платформа не упёрлась в свой лимит:
+        # пачка тиктоков не держит шортсы за спиной.
+        for ticket in list(self._queue):
+            if ticket.granted.done():
+                # Ожидающего отменили, но его except ещё не успел убрать тикет:
+                # слот такому не выдаём, иначе он потеряется навсегда.
+                self._queue.remove(ticket)
+                continue
+            if not self._has_capacity(ticket.platform):
+                continue
+            self._queue.remove(ticket)
+            self._active[ticket.platform] += 1
+            ticket.granted.set_result(None)
+        self._notify_positions()
+
+    def _notify_positions(self) -> None:
+        for index, ticket in enumerate(self._queue, start=1):
+            if ticket.position == index:
+                continue
+            ticket.position = index
+            if ticket.on_position is not None:
+                ticket.on_position(index)
+
+    def _release(self, platform: str) -> None:
+        self._active[platform] -= 1
+        if self._active[platform] <= 0:
+            del self._active[platform]
+        self._completed += 1
+        self._dispatch()
+
+    async def _acquire(self, platform: str, on_position: PositionCallback | None) -> None:
+        ticket = _Ticket(platform, on_position)
+        self._queue.append(ticket)
+        self._dispatch()
+        try:
+            await ticket.granted
+        except asyncio.CancelledError:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                self._notify_positions()
+            elif ticket.granted.done() and not ticket.granted.cancelled():
+                self._release(platform)
+            raise
+
+        self._waits.append(time.monotonic() - ticket.enqueued_at)
+        if ticket.position and on_position is not None:
+            on_position(0)
+
+    async def run(
+        self,
+        platform: str,
+        func: Callable[..., T],
+        *args: object,
+        on_position: PositionCallback | None = None,
+        on_abandoned: Callable[[T], None] | None = None,
+    ) -> T:
+        """Ждёт слот и выполняет блокирующую функцию в пуле загрузок.
+
+        on_position получает место в очереди (1, 2, ...) при каждом сдвиге и 0 на старте,
+        если задача вообще стояла в очереди. Если ожидающего отменили, а поток уже
+        работает, готовый результат уходит в on_abandoned.
+        """
+        loop = asyncio.get_running_loop()
+        await self._acquire(platform, on_position)
+
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._release(platform)
+            raise
+        # Слот освобождается только когда поток реально закончил, а не когда сдался ожидающий.
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release, platform))
+
+        try:
+            return await asyncio.shield(asyncio.wrap_future(future))
+        except asyncio.CancelledError:
+            if not future.cancel() and on_abandoned is not None:
+                future.add_done_callback(
+                    lambda done: on_abandoned(done.result()) if done.exception() is None else None
+                )
+            raise
+
+    def snapshot(self) -> DownloadQueueSnapshot:
+        waits = list(self._waits)
+        return DownloadQueueSnapshot(
+            workers=self.workers,
+            active=self.active,
+            queued=len(self._queue),
+            queued_by_platform=dict(Counter(ticket.platform for ticket in self._queue)),
+            active_by_platform=dict(self._active),
+            completed=self._completed,
+            avg_wait_seconds=sum(waits) / len(waits) if waits else 0.0,
+            max_wait_seconds=max(waits, default=0.0),
+        )
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -1,86 +1,258 @@
 from __future__ import annotations
 
-import re
+import logging
+import multiprocessing
+import queue
 import shutil
-import tempfile
+import threading
+import time
+from collections.abc import Callable, Mapping
 from pathlib import Path
-from uuid import uuid4
+from typing import Any
 
 import yt_dlp
 
-from panimau_bot.models import DownloadRequest, DownloadResult
-
-TRAILING_URL_PUNCTUATION = ".,!?;:)]}"
-
-SUPPORTED_URL_PATTERNS: tuple[tuple[str, re.Pattern[str]], ...] = (
-    (
-        "youtube",
-        re.compile(
-            r"(?:(?:https?://)?(?:www\.)?(?:youtube\.com/shorts/[^\s]+|youtu\.be/[^\s]+))",
-            re.IGNORECASE,
-        ),
-    ),
-    (
-        "instagram",
-        re.compile(
-            r"(?:(?:https?://)?(?:www\.)?instagram\.com/(?:[^/\s?#]+/)?reels?/(?!audio/)[^\s]+)",
-            re.IGNORECASE,
-        ),
-    ),
-    (
-        "tiktok",
-        re.compile(
-            r"(?:(?:https?://)?(?:www\.)?(?:tiktok\.com/@[^/\s?#]+/video/[^\s]+|vm\.tiktok\.com/[^\s]+|vt\.tiktok\.com/[^\s]+))",
-            re.IGNORECASE,
-        ),
-    ),
-)
-
-
-def _normalize_url(raw_url: str) -> str:
-    cleaned = raw_url.rstrip(TRAILING_URL_PUNCTUATION)
-    if cleaned.startswith(("http://", "https://")):
-        return cleaned
-    return f"https://{cleaned}"
-
-
-def detect_platform(url: str) -> str | None:
-    normalized_url = _normalize_url(url)
-    for platform, pattern in SUPPORTED_URL_PATTERNS:
-        if pattern.fullmatch(normalized_url):
-            return platform
-    return None
-
-
-def extract_download_request(text: str) -> DownloadRequest | None:
-    earliest_match: tuple[int, DownloadRequest] | None = None
-
-    for platform, pattern in SUPPORTED_URL_PATTERNS:
-        match = pattern.search(text)
-        if match is None:
-            continue
-
-        request = DownloadRequest(
-            url=_normalize_url(match.group(0)),
-            platform=platform,
+from panimau_bot.models import DownloadProgress, DownloadRequest, DownloadResult, MediaInfo
+from panimau_bot.services.cookies import CookieStore
+from panimau_bot.services.formats import MediaTooLarge, select_format
+from panimau_bot.services.spool import MediaSpool, default_spool_root
+from panimau_bot.services.ttl_cache import TTLCache
+from panimau_bot.services.ydl_pool import YoutubeDLPool, set_format
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_MODES = ("thread", "process")
+DEFAULT_DOWNLOAD_TIMEOUT_SECONDS = 180
+WORKER_POLL_SECONDS = 0.2
+WORKER_TERMINATE_GRACE_SECONDS = 5
+DEFAULT_MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+MAX_PREFLIGHT_REDIRECTS = 3
+PREFLIGHT_CACHE_ENTRIES = 256
+PREFLIGHT_CACHE_TTL_SECONDS = 15 * 60
+DEFAULT_SPOOL_MAX_BYTES = 2 * 1024 * 1024 * 1024
+OUTPUT_STEM = "video"
+DEFAULT_POOL_MAX_USES = 50
+COOKIE_FILE_NAME = ".cookies.txt"
+
+ProgressCallback = Callable[[DownloadProgress], None]
+
+
+class DownloadCancelled(Exception):
+    """Загрузку остановили снаружи: пост отменён или все ожидающие ушли."""
+
+
+class DownloadTimeout(Exception):
+    """Загрузка не уложилась в отведённое платформе время."""
+
+
+def _progress_from_status(status: Mapping[str, Any]) -> DownloadProgress:
+    return DownloadProgress(
+        downloaded_bytes=int(status.get("downloaded_bytes") or 0),
+        total_bytes=int(status.get("total_bytes") or status.get("total_bytes_estimate") or 0) or None,
+    )
+
+
+def _extract_preflight(downloader: yt_dlp.YoutubeDL, url: str) -> dict[str, Any]:
+    """Достаёт метаданные без скачивания, проходя редиректы коротких ссылок.
+
+    Результат сырой, как его отдал экстрактор: в нём бывают функции вроде
+    __post_extractor и ленивые списки фрагментов. Через границу процесса он
+    передаётся только в виде _portable_info.
+    """
+    info = downloader.extract_info(url, download=False, process=False)
+    for _ in range(MAX_PREFLIGHT_REDIRECTS):
+        if info.get("_type") not in ("url", "url_transparent"):
+            break
+        info = downloader.extract_info(
+            info["url"],
+            download=False,
+            process=False,
+            ie_key=info.get("ie_key"),
         )
+    return info
+
+
+def _portable_info(info: dict[str, Any]) -> dict[str, Any]:
+    """JSON-безопасная копия метаданных для передачи между процессами.
 
-        if earliest_match is None or match.start() < earliest_match[0]:
-            earliest_match = (match.start(), request)
+    Годится для выбора формата, но не для process_ie_result: всё непримитивное
+    sanitize_info превращает в repr.
+    """
+    return yt_dlp.YoutubeDL.sanitize_info(info, remove_private_keys=False)
 
-    if earliest_match is None:
-        return None
 
-    return earliest_match[1]
+def _copy_info(value: Any) -> Any:
+    """Копирует словари и списки метаданных, остальное оставляет как есть.
+
+    process_ie_result дописывает поля прямо в переданный словарь, а deepcopy
+    спотыкается о генераторы и методы, которые экстракторы кладут в info.
+    """
+    if isinstance(value, dict):
+        return {key: _copy_info(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_info(item) for item in value]
+    return value
+
+
+def _fetch_video(
+    downloader: yt_dlp.YoutubeDL,
+    url: str,
+    preflight: dict[str, Any] | None,
+    max_bytes: int,
+    source_max_bytes: int | None,
+    ffmpeg_available: bool,
+    emit: Callable[[str, object], None],
+    preflight_is_raw: bool = True,
+) -> dict[str, Any]:
+    """Префлайт, выбор формата под лимит и скачивание; общий код для потока и процесса.
+
+    Если в max_bytes не влезает ничего, а source_max_bytes задан, берётся лучший
+    формат в его пределах: такой файл потом пережимается под лимит.
+    Прогресс downloader сообщает сам: хук ставит тот, кто его создал или выдал.
+    preflight_is_raw=False значит, что префлайт пришёл из другого процесса в виде
+    _portable_info: по нему только выбирается формат, а ролик извлекается заново.
+    """
+    raw_info = preflight if preflight_is_raw else None
+    if preflight is None:
+        raw_info = preflight = _extract_preflight(downloader, url)
+        emit("preflight", preflight)
+
+    try:
+        choice = select_format(preflight, max_bytes, ffmpeg_available)
+    except MediaTooLarge:
+        if source_max_bytes is None:
+            raise
+        choice = select_format(preflight, source_max_bytes, ffmpeg_available)
+    emit("format", choice)
+
+    if choice is not None:
+        set_format(downloader, choice.format_spec)
+
+    if raw_info is not None:
+        # Повторно экстрактор не дёргаем: скачиваем по метаданным префлайта.
+        info = downloader.process_ie_result(_copy_info(raw_info), download=True)
+    else:
+        info = downloader.extract_info(url, download=True)
+    return {
+        "prepared_path": downloader.prepare_filename(info),
+        "id": info.get("id"),
+        "duration": info.get("duration"),
+        "width": info.get("width"),
+        "height": info.get("height"),
+    }
+
+
+def _progress_hook(emit: Callable[[str, object], None]) -> Callable[[dict[str, Any]], None]:
+    def report(status: dict[str, Any]) -> None:
+        if status.get("status") == "downloading":
+            emit("progress", _progress_from_status(status))
+
+    return report
+
+
+def _process_worker(
+    options: dict[str, object],
+    url: str,
+    preflight: dict[str, Any] | None,
+    max_bytes: int,
+    source_max_bytes: int | None,
+    ffmpeg_available: bool,
+    events: Any,
+) -> None:
+    """Точка входа дочернего процесса: качает ролик и шлёт события родителю."""
+
+    def emit(kind: str, payload: object) -> None:
+        if kind == "preflight":
+            payload = _portable_info(payload)  # type: ignore[arg-type]
+        events.put((kind, payload))
+
+    try:
+        # Процесс одноразовый, так что и YoutubeDL в нём свой, без пула.
+        with yt_dlp.YoutubeDL({**options, "progress_hooks": [_progress_hook(emit)]}) as downloader:
+            fetched = _fetch_video(
+                downloader,
+                url,
+                preflight,
+                max_bytes,
+                source_max_bytes,
+                ffmpeg_available,
+                emit,
+                preflight_is_raw=False,
+            )
+        emit("done", fetched)
+    except MediaTooLarge as exc:
+        emit("too_large", (exc.estimated_bytes, exc.max_bytes))
+    except Exception as exc:
+        emit("error", f"{type(exc).__name__}: {exc}")
+
+
+def _worker_context() -> Any:
+    # forkserver с предзагруженным yt-dlp: дочерние процессы стартуют без импорта
+    # экстракторов и без копирования потоков родителя, как было бы при fork.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
 
 
 class SocialVideoDownloader:
-    def __init__(self, ffmpeg_available: bool | None = None) -> None:
+    def __init__(
+        self,
+        ffmpeg_available: bool | None = None,
+        execution_mode: str = "thread",
+        timeouts: Mapping[str, int] | None = None,
+        default_timeout: int = DEFAULT_DOWNLOAD_TIMEOUT_SECONDS,
+        max_upload_bytes: int = DEFAULT_MAX_UPLOAD_BYTES,
+        transcode_source_max_bytes: int | None = None,
+        spool: MediaSpool | None = None,
+        pool_max_uses: int = DEFAULT_POOL_MAX_USES,
+        pool_sizes: Mapping[str, int] | None = None,
+        cookies: CookieStore | None = None,
+    ) -> None:
+        if execution_mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown download execution mode: {execution_mode}")
         self.ffmpeg_available = (
             ffmpeg_available
             if ffmpeg_available is not None
             else shutil.which("ffmpeg") is not None
         )
+        self.execution_mode = execution_mode
+        self.timeouts = dict(timeouts or {})
+        self.default_timeout = default_timeout
+        self.max_upload_bytes = max_upload_bytes
+        # Сколько можно скачать сверх лимита в расчёте на перекодирование; None - не качать.
+        self.transcode_source_max_bytes = (
+            transcode_source_max_bytes if self.ffmpeg_available else None
+        )
+        # Метаданные префлайта живут недолго: ссылки на CDN в форматах протухают.
+        # В режиме thread здесь сырой info, в режиме process - его _portable_info.
+        self.preflight_cache: TTLCache[str, dict[str, Any]] = TTLCache(
+            PREFLIGHT_CACHE_ENTRIES,
+            PREFLIGHT_CACHE_TTL_SECONDS,
+        )
+        self._worker_context = _worker_context() if execution_mode == "process" else None
+        self.spool = spool or MediaSpool(default_spool_root(), DEFAULT_SPOOL_MAX_BYTES)
+        self.cookies = cookies
+        # Пул нужен только режиму thread: в режиме process каждый запуск и так в свежем процессе.
+        self.pool = YoutubeDLPool(
+            self._build_options(str(self.spool.root / f"{OUTPUT_STEM}.%(ext)s")),
+            max_uses=pool_max_uses,
+            max_idle=pool_sizes,
+            cookies=cookies,
+        )
+
+    def prewarm(self) -> int:
+        """Собирает экземпляры YoutubeDL заранее; блокирует, звать из потока."""
+        if self.execution_mode != "thread":
+            return 0
+        return self.pool.prewarm()
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def timeout_for(self, platform: str) -> int:
+        return self.timeouts.get(platform, self.default_timeout)
 
     def _build_options(self, output_template: str) -> dict[str, object]:
         format_selector = (
@@ -97,6 +269,7 @@ class SocialVideoDownloader:
             "format": format_selector,
             "outtmpl": output_template,
             "quiet": True,
+            "noprogress": True,
             "noplaylist": True,
         }
 
@@ -105,34 +278,219 @@ class SocialVideoDownloader:
 
         return options
 
-    def _resolve_downloaded_file(self, output_prefix: Path, prepared_path: Path) -> Path:
-        candidates = [
-            prepared_path,
-            prepared_path.with_suffix(".mp4"),
-            output_prefix.with_suffix(".mp4"),
-        ]
-
-        for candidate in candidates:
-            if candidate.exists():
+    def _resolve_downloaded_file(self, job_dir: Path, prepared_path: Path) -> Path:
+        # В папке задачи только её файлы: готовый файл либо тот, что назвал yt-dlp,
+        # либо его mp4 после склейки, либо единственный оставшийся без .part.
+        for candidate in (prepared_path, prepared_path.with_suffix(".mp4")):
+            if candidate.parent == job_dir and candidate.is_file():
                 return candidate
 
-        wildcard_candidates = sorted(output_prefix.parent.glob(f"{output_prefix.name}.*"))
-        for candidate in wildcard_candidates:
-            if candidate.is_file():
-                return candidate
+        finished = [
+            entry
+            for entry in job_dir.iterdir()
+            if entry.is_file() and entry.suffix not in {".part", ".ytdl"} and not entry.name.startswith(".")
+        ]
+        if len(finished) == 1:
+            return finished[0]
+
+        raise FileNotFoundError(f"Downloaded file was not found in {job_dir.name}")
 
-        raise FileNotFoundError(f"Downloaded file was not found for {output_prefix.name}")
+    def download(
+        self,
+        request: DownloadRequest,
+        cancel_event: threading.Event | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> DownloadResult:
+        """Качает ролик; блокирует поток до готовности файла.
 
-    def download(self, request: DownloadRequest) -> DownloadResult:
-        output_prefix = Path(tempfile.gettempdir()) / f"panimau_{request.platform}_{uuid4().hex}"
-        output_template = f"{output_prefix}.%(ext)s"
+        Сначала префлайт без скачивания выбирает формат, который влезает в лимит
+        загрузки; если такого нет, MediaTooLarge вылетает до первого скачанного байта.
+        С разрешённым перекодированием вместо отказа качается лучший формат в
+        пределах transcode_source_max_bytes, и файл может оказаться больше лимита.
+        cancel_event и таймаут платформы прерывают загрузку: в режиме process
+        дочерний процесс убивается, в режиме thread загрузка обрывается на
+        ближайшем progress hook. Недокачанные файлы удаляются.
+        Качает в отдельную папку спула; если места нет, ждёт его в пределах
+        ожидания спула и бросает SpoolFull, не начиная загрузку.
+        """
+        deadline = time.monotonic() + self.timeout_for(request.platform)
+        self.spool.wait_for_room(lambda: self._check_interrupt(request, deadline, cancel_event))
+        job_dir = self.spool.job_dir(request.platform)
+        output_template = str(job_dir / f"{OUTPUT_STEM}.%(ext)s")
+        preflight = self.preflight_cache.get(request.url)
+        started = time.monotonic()
 
-        with yt_dlp.YoutubeDL(self._build_options(output_template)) as downloader:
-            info = downloader.extract_info(request.url, download=True)
-            prepared_path = Path(downloader.prepare_filename(info))
+        try:
+            if self.execution_mode == "process":
+                options = self._build_options(output_template)
+                cookie_file = job_dir / COOKIE_FILE_NAME
+                baseline = None
+                if self.cookies is not None:
+                    # Дочерний процесс пишет куки в копию внутри папки задачи, а не в общий файл.
+                    baseline = self.cookies.export(request.platform, cookie_file)
+                    options["cookiefile"] = str(cookie_file)
+                fetched = self._download_in_process(
+                    request, options, preflight, deadline, cancel_event, progress
+                )
+                if self.cookies is not None and baseline is not None:
+                    self.cookies.absorb_file(request.platform, cookie_file, baseline)
+            else:
+                fetched = self._download_in_thread(
+                    request, output_template, preflight, deadline, cancel_event, progress
+                )
+            file_path = self._resolve_downloaded_file(job_dir, Path(fetched["prepared_path"]))
+            file_size = file_path.stat().st_size
+            size_limit = self.transcode_source_max_bytes or self.max_upload_bytes
+            if file_size > size_limit:
+                raise MediaTooLarge(file_size, self.max_upload_bytes)
+        except BaseException:
+            self.spool.release(job_dir)
+            raise
 
+        duration = float(fetched["duration"]) if fetched["duration"] else None
         return DownloadResult(
-            file_path=self._resolve_downloaded_file(output_prefix, prepared_path).resolve(),
+            file_path=file_path,
             url=request.url,
             platform=request.platform,
+            video_id=str(fetched["id"]) if fetched["id"] else None,
+            duration=duration,
+            media=MediaInfo(width=fetched["width"], height=fetched["height"], duration=duration),
+            download_seconds=time.monotonic() - started,
         )
+
+    def probe(self, platform: str, url: str) -> None:
+        """Пробный запрос метаданных без скачивания: жива ли платформа. Блокирует поток."""
+        template = str(self.spool.root / f"{OUTPUT_STEM}.%(ext)s")
+        with self.pool.lease(platform, template) as downloader:
+            info = _extract_preflight(downloader, url)
+        if self.execution_mode == "process":
+            info = _portable_info(info)
+        self.preflight_cache.set(url, info)
+
+    def _check_interrupt(
+        self,
+        request: DownloadRequest,
+        deadline: float,
+        cancel_event: threading.Event | None,
+    ) -> None:
+        if cancel_event is not None and cancel_event.is_set():
+            raise DownloadCancelled(f"Download of {request.url} was cancelled")
+        if time.monotonic() > deadline:
+            raise DownloadTimeout(
+                f"Download of {request.url} exceeded {self.timeout_for(request.platform)}s"
+            )
+
+    def _handle_event(
+        self,
+        request: DownloadRequest,
+        kind: str,
+        payload: Any,
+        progress: ProgressCallback | None,
+    ) -> None:
+        if kind == "preflight":
+            self.preflight_cache.set(request.url, payload)
+        elif kind == "format":
+            if payload is not None:
+                logger.info(
+                    "Формат для %s: %s (~%s байт, %sp)",
+                    request.url,
+                    payload.format_spec,
+                    payload.estimated_bytes,
+                    payload.height,
+                )
+        elif kind == "progress" and progress is not None:
+            progress(payload)
+
+    def _download_in_thread(
+        self,
+        request: DownloadRequest,
+        output_template: str,
+        preflight: dict[str, Any] | None,
+        deadline: float,
+        cancel_event: threading.Event | None,
+        progress: ProgressCallback | None,
+    ) -> dict[str, Any]:
+        def emit(kind: str, payload: object) -> None:
+            self._check_interrupt(request, deadline, cancel_event)
+            self._handle_event(request, kind, payload, progress)
+
+        with self.pool.lease(request.platform, output_template, _progress_hook(emit)) as downloader:
+            return _fetch_video(
+                downloader,
+                request.url,
+                preflight,
+                self.max_upload_bytes,
+                self.transcode_source_max_bytes,
+                self.ffmpeg_available,
+                emit,
+            )
+
+    def _download_in_process(
+        self,
+        request: DownloadRequest,
+        options: dict[str, object],
+        preflight: dict[str, Any] | None,
+        deadline: float,
+        cancel_event: threading.Event | None,
+        progress: ProgressCallback | None,
+    ) -> dict[str, Any]:
+        context = self._worker_context
+        events = context.Queue()
+        worker = context.Process(
+            target=_process_worker,
+            args=(
+                options,
+                request.url,
+                preflight,
+                self.max_upload_bytes,
+                self.transcode_source_max_bytes,
+                self.ffmpeg_available,
+                events,
+            ),
+            name=f"download-{request.platform}",
+            daemon=True,
+        )
+        worker.start()
+
+        try:
+            while True:
+                self._check_interrupt(request, deadline, cancel_event)
+                try:
+                    kind, payload = events.get(timeout=WORKER_POLL_SECONDS)
+                except queue.Empty:
+                    if not worker.is_alive() and events.empty():
+                        raise RuntimeError(
+                            f"Download worker for {request.url} died with exit code {worker.exitcode}"
+                        ) from None
+                    continue
+
+                if kind == "done":
+                    return payload
+                if kind == "too_large":
+                    raise MediaTooLarge(*payload)
+                if kind == "error":
+                    raise yt_dlp.utils.DownloadError(payload)
+                self._handle_event(request, kind, payload, progress)
+        finally:
+            self._stop_worker(worker)
+            events.close()
+
+    def _stop_worker(self, worker: Any) -> None:
+        worker.join(timeout=WORKER_POLL_SECONDS)
+        if worker.is_alive():
+            logger.info("Останавливаю процесс загрузки %s", worker.name)
+            worker.terminate()
+            worker.join(timeout=WORKER_TERMINATE_GRACE_SECONDS)
+        if worker.is_alive():
+            worker.kill()
+            worker.join()
+
+    def cleanup(self, result: DownloadResult) -> None:
+        job_dir = result.file_path.parent
+        if job_dir.parent == self.spool.root:
+            # Вместе с папкой уходят перекодированные копии, faststart и превью.
+            self.spool.release(job_dir)
+            return
+        result.file_path.unlink(missing_ok=True)
+        if result.media is not None and result.media.thumbnail_path is not None:
+            result.media.thumbnail_path.unlink(missing_ok=True)
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any
+
+PREFERRED_MAX_HEIGHT = 720
+
+Format = Mapping[str, Any]
+
+
+class MediaTooLarge(Exception):
+    """Ни один формат ролика не влезает в лимит загрузки Telegram."""
+
+    def __init__(self, estimated_bytes: int | None, max_bytes: int) -> None:
+        self.estimated_bytes = estimated_bytes
+        self.max_bytes = max_bytes
+        estimate = f"~{estimated_bytes / 1024 / 1024:.0f} MB" if estimated_bytes else "size unknown"
+        super().__init__(f"Video is {estimate}, upload limit is {max_bytes / 1024 / 1024:.0f} MB")
+
+
+@dataclass(slots=True, frozen=True)
+class FormatChoice:
+    format_spec: str
+    estimated_bytes: int | None
+    height: int | None
+
+
+def _has_video(fmt: Format) -> bool:
+    return fmt.get("vcodec") != "none"
+
+
+def _has_audio(fmt: Format) -> bool:
+    return fmt.get("acodec") != "none"
+
+
+def estimate_size(fmt: Format, duration: float | None) -> int | None:
+    """Размер формата в байтах: точный, приблизительный или из битрейта и длительности."""
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if size:
+        return int(size)
+    tbr = fmt.get("tbr")
+    if tbr and duration:
+        return int(float(tbr) * 1000 / 8 * float(duration))
+    return None
+
+
+def _rank(height: int | None, tbr: float, ext: str | None, size_known: bool) -> tuple[object, ...]:
+    return (
+        size_known,
+        height is not None and height <= PREFERRED_MAX_HEIGHT,
+        -(height or 0) if height and height > PREFERRED_MAX_HEIGHT else height or 0,
+        ext == "mp4",
+        tbr,
+    )
+
+
+def select_format(info: Mapping[str, Any], max_bytes: int, ffmpeg_available: bool) -> FormatChoice | None:
+    """Выбирает лучший формат, который влезает в max_bytes.
+
+    Возвращает None, если у ролика нет списка форматов и выбирать не из чего.
+    Бросает MediaTooLarge, если все форматы с известным размером больше лимита,
+    а форматов с неизвестным размером нет.
+    """
+    formats = [fmt for fmt in info.get("formats") or () if fmt.get("format_id")]
+    if not formats:
+        return None
+
+    duration = info.get("duration")
+    candidates: list[tuple[tuple[object, ...], FormatChoice]] = []
+    smallest_rejected: int | None = None
+
+    def consider(spec: str, size: int | None, height: int | None, tbr: float, ext: str | None) -> None:
+        nonlocal smallest_rejected
+        if size is not None and size > max_bytes:
+            if smallest_rejected is None or size < smallest_rejected:
+                smallest_rejected = size
+            return
+        candidates.append(
+            (
+                _rank(height, tbr, ext, size is not None),
+                FormatChoice(format_spec=spec, estimated_bytes=size, height=height),
+            )
+        )
+
+    audio_only = [fmt for fmt in formats if _has_audio(fmt) and not _has_video(fmt)]
+    best_audio = max(
+        audio_only,
+        key=lambda fmt: (fmt.get("ext") == "m4a", fmt.get("abr") or fmt.get("tbr") or 0),
+        default=None,
+    )
+
+    for fmt in formats:
+        if not _has_video(fmt):
+            continue
+        height = fmt.get("height")
+        size = estimate_size(fmt, duration)
+        tbr = float(fmt.get("tbr") or 0)
+
+        if _has_audio(fmt):
+            consider(str(fmt["format_id"]), size, height, tbr, fmt.get("ext"))
+        elif ffmpeg_available and best_audio is not None:
+            audio_size = estimate_size(best_audio, duration)
+            total = size + audio_size if size is not None and audio_size is not None else None
+            # После склейки получится mp4, поэтому расширение видеодорожки не важно.
+            consider(f"{fmt['format_id']}+{best_audio['format_id']}", total, height, tbr, "mp4")
+
+    if not candidates:
+        raise MediaTooLarge(smallest_rejected, max_bytes)
+
+    return max(candidates, key=lambda item: item[0])[1]
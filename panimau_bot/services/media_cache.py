@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from panimau_bot.models import MediaInfo
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media_cache (
+    url TEXT PRIMARY KEY,
+    platform TEXT NOT NULL,
+    video_id TEXT,
+    file_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS media_cache_video ON media_cache (platform, video_id);
+CREATE INDEX IF NOT EXISTS media_cache_last_used ON media_cache (last_used_at);
+"""
+
+# Колонки, добавленные после первой версии схемы: старые базы догоняются ALTER TABLE.
+MEDIA_COLUMNS = {"width": "INTEGER", "height": "INTEGER", "duration": "REAL"}
+
+
+@dataclass(slots=True, frozen=True)
+class CachedMedia:
+    url: str
+    platform: str
+    video_id: str | None
+    file_id: str
+    media: MediaInfo | None = None
+
+
+class MediaCache:
+    """Постоянный кэш уже залитых в канал роликов: URL и id видео -> Telegram file_id.
+
+    Чтение ничего не пишет: отметки «использован» копятся в памяти и уходят на диск
+    вместе со следующей записью или при закрытии, а не отдельным коммитом на каждый поиск.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        max_entries: int = 5000,
+        ttl_seconds: float = 30 * 24 * 3600,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+        self._migrate()
+        self._touched: dict[str, float] = {}
+
+    def _migrate(self) -> None:
+        existing = {row[1] for row in self._connection.execute("PRAGMA table_info(media_cache)")}
+        for column, column_type in MEDIA_COLUMNS.items():
+            if column not in existing:
+                self._connection.execute(f"ALTER TABLE media_cache ADD COLUMN {column} {column_type}")
+        self._connection.commit()
+
+    def _flush_touches(self) -> None:
+        """Переносит накопленные отметки использования в базу; коммитит вызывающий."""
+        if not self._touched:
+            return
+        self._connection.executemany(
+            "UPDATE media_cache SET last_used_at = ? WHERE url = ?",
+            [(used_at, url) for url, used_at in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def _lookup(self, where: str, params: tuple[object, ...]) -> CachedMedia | None:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT url, platform, video_id, file_id, width, height, duration FROM media_cache "
+                f"WHERE {where} AND created_at >= ? ORDER BY last_used_at DESC LIMIT 1",
+                (*params, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                return None
+            self._touched[row[0]] = now
+        media = MediaInfo(width=row[4], height=row[5], duration=row[6]) if any(row[4:]) else None
+        return CachedMedia(url=row[0], platform=row[1], video_id=row[2], file_id=row[3], media=media)
+
+    def get_by_url(self, url: str) -> CachedMedia | None:
+        return self._lookup("url = ?", (url,))
+
+    def get_by_video(self, platform: str, video_id: str | None) -> CachedMedia | None:
+        if not video_id:
+            return None
+        return self._lookup("platform = ? AND video_id = ?", (platform, video_id))
+
+    def put(
+        self,
+        url: str,
+        platform: str,
+        video_id: str | None,
+        file_id: str,
+        media: MediaInfo | None = None,
+    ) -> None:
+        now = time.time()
+        width = media.width if media else None
+        height = media.height if media else None
+        duration = media.duration if media else None
+        with self._lock:
+            self._flush_touches()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO media_cache "
+                "(url, platform, video_id, file_id, created_at, last_used_at, width, height, duration) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, platform, video_id, file_id, now, now, width, height, duration),
+            )
+            if video_id:
+                self._connection.execute(
+                    "UPDATE media_cache SET file_id = ?, created_at = ?, "
+                    "width = COALESCE(?, width), height = COALESCE(?, height), "
+                    "duration = COALESCE(?, duration) "
+                    "WHERE platform = ? AND video_id = ?",
+                    (file_id, now, width, height, duration, platform, video_id),
+                )
+            self._evict(now)
+            self._connection.commit()
+
+    def discard(self, file_id: str) -> None:
+        """Забывает file_id, который Telegram больше не принимает."""
+        with self._lock:
+            self._flush_touches()
+            self._connection.execute("DELETE FROM media_cache WHERE file_id = ?", (file_id,))
+            self._connection.commit()
+
+    def _evict(self, now: float) -> None:
+        self._connection.execute(
+            "DELETE FROM media_cache WHERE created_at < ?",
+            (now - self.ttl_seconds,),
+        )
+        self._connection.execute(
+            "DELETE FROM media_cache WHERE url IN ("
+            "SELECT url FROM media_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?"
+            ")",
+            (self.max_entries,),
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM media_cache").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touches()
+            self._connection.commit()
+            self._connection.close()
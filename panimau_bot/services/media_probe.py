@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import json
+import logging
+import shutil
+import struct
+import subprocess
+from dataclasses import replace
+from pathlib import Path
+
+from panimau_bot.models import DownloadResult, MediaInfo
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_MAX_SIDE = 320
+THUMBNAIL_OFFSET_SECONDS = 1.0
+PROBE_TIMEOUT_SECONDS = 30
+REMUX_TIMEOUT_SECONDS = 120
+THUMBNAIL_TIMEOUT_SECONDS = 30
+
+
+def _ffmpeg_tool(name: str) -> str | None:
+    return shutil.which(name)
+
+
+def _run_tool(args: list[str], timeout: float) -> subprocess.CompletedProcess[str] | None:
+    """Запускает ffmpeg/ffprobe; зависший процесс убивается по таймауту, а не держит поток."""
+    try:
+        return subprocess.run(args, capture_output=True, text=True, check=False, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        logger.warning("%s не уложился в %sс и был остановлен", Path(args[0]).name, timeout)
+        return None
+
+
+def _rotation(stream: dict[str, object]) -> int:
+    """Поворот кадра из displaymatrix (side data) или старого тега rotate, в градусах."""
+    for side_data in stream.get("side_data_list") or []:
+        if isinstance(side_data, dict) and side_data.get("rotation") is not None:
+            return int(float(side_data["rotation"]))
+    tags = stream.get("tags")
+    if isinstance(tags, dict) and tags.get("rotate"):
+        return int(float(tags["rotate"]))
+    return 0
+
+
+def probe_media(path: Path) -> MediaInfo | None:
+    """Читает размеры и длительность первой видеодорожки через ffprobe."""
+    ffprobe = _ffmpeg_tool("ffprobe")
+    if ffprobe is None:
+        return None
+
+    completed = _run_tool(
+        [
+            ffprobe,
+            "-v",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-show_entries",
+            "stream=width,height,duration:stream_tags=rotate:stream_side_data=rotation:format=duration",
+            "-of",
+            "json",
+            str(path),
+        ],
+        PROBE_TIMEOUT_SECONDS,
+    )
+    if completed is None:
+        return None
+    if completed.returncode != 0:
+        logger.warning("ffprobe не прочитал %s: %s", path.name, completed.stderr.strip())
+        return None
+
+    data = json.loads(completed.stdout or "{}")
+    stream = (data.get("streams") or [{}])[0]
+    duration = stream.get("duration") or data.get("format", {}).get("duration")
+    width = int(stream["width"]) if stream.get("width") else None
+    height = int(stream["height"]) if stream.get("height") else None
+    if _rotation(stream) % 180 == 90:
+        # Телефон пишет портрет как повёрнутый пейзаж: Telegram нужны размеры на экране.
+        width, height = height, width
+    return MediaInfo(
+        width=width,
+        height=height,
+        duration=float(duration) if duration else None,
+    )
+
+
+def is_faststart(path: Path) -> bool | None:
+    """True, если moov-атом MP4 стоит перед mdat; None, если это не MP4."""
+    with path.open("rb") as media_file:
+        while True:
+            header = media_file.read(8)
+            if len(header) < 8:
+                return None
+            size, kind = struct.unpack(">I4s", header)
+            header_size = 8
+            if size == 1:
+                size = struct.unpack(">Q", media_file.read(8))[0]
+                header_size = 16
+            if kind == b"moov":
+                return True
+            if kind == b"mdat":
+                return False
+            if size == 0 or size < header_size:
+                return None
+            media_file.seek(size - header_size, 1)
+
+
+def remux_faststart(path: Path) -> Path:
+    """Переупаковывает MP4 без перекодирования так, чтобы moov шёл первым."""
+    ffmpeg = _ffmpeg_tool("ffmpeg")
+    if ffmpeg is None:
+        return path
+
+    target = path.with_name(f"{path.stem}.faststart.mp4")
+    completed = _run_tool(
+        [
+            ffmpeg,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-y",
+            "-i",
+            str(path),
+            "-map",
+            "0",
+            "-c",
+            "copy",
+            "-movflags",
+            "+faststart",
+            str(target),
+        ],
+        REMUX_TIMEOUT_SECONDS,
+    )
+    if completed is None or completed.returncode != 0:
+        if completed is not None:
+            logger.warning("Не удалось переупаковать %s: %s", path.name, completed.stderr.strip())
+        target.unlink(missing_ok=True)
+        return path
+
+    path.unlink(missing_ok=True)
+    return target
+
+
+def extract_thumbnail(path: Path, duration: float | None) -> Path | None:
+    ffmpeg = _ffmpeg_tool("ffmpeg")
+    if ffmpeg is None:
+        return None
+
+    offset = min(THUMBNAIL_OFFSET_SECONDS, duration / 2) if duration else 0.0
+    target = path.with_name(f"{path.stem}.thumb.jpg")
+    completed = _run_tool(
+        [
+            ffmpeg,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-y",
+            "-ss",
+            f"{offset:.2f}",
+            "-i",
+            str(path),
+            "-frames:v",
+            "1",
+            "-vf",
+            f"scale='min({THUMBNAIL_MAX_SIDE},iw)':'min({THUMBNAIL_MAX_SIDE},ih)':"
+            "force_original_aspect_ratio=decrease",
+            "-q:v",
+            "5",
+            str(target),
+        ],
+        THUMBNAIL_TIMEOUT_SECONDS,
+    )
+    if completed is None or completed.returncode != 0 or not target.exists():
+        target.unlink(missing_ok=True)
+        return None
+    return target
+
+
+def prepare_for_upload(result: DownloadResult) -> DownloadResult:
+    """Доводит файл до вида, который Telegram не пережёвывает на своей стороне.
+
+    MP4 переупаковывается с moov в начале, размеры и длительность берутся из
+    ffprobe (или из метаданных yt-dlp, если ffprobe нет), рядом кладётся превью.
+    """
+    file_path = result.file_path
+    if is_faststart(file_path) is False:
+        file_path = remux_faststart(file_path)
+
+    probed = probe_media(file_path)
+    known = result.media or MediaInfo()
+    media = MediaInfo(
+        width=(probed.width if probed else None) or known.width,
+        height=(probed.height if probed else None) or known.height,
+        duration=(probed.duration if probed else None) or known.duration or result.duration,
+    )
+    media = replace(media, thumbnail_path=extract_thumbnail(file_path, media.duration))
+    return replace(result, file_path=file_path, media=media)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+
+from telegram import Bot
+from telegram.constants import BulkRequestLimit
+from telegram.error import TelegramError
+
+from panimau_bot.services.delay_queue import DelayHandle, DelayQueue
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True, frozen=True)
+class CleanupSnapshot:
+    waiting: int
+    deleted: int
+    requests: int
+
+
+class MessageCleaner:
+    """Отложенное удаление служебных сообщений пачками через delete_messages."""
+
+    def __init__(
+        self,
+        bot: Bot,
+        delay_queue: DelayQueue,
+        max_linger_seconds: float = 3,
+        batch_size: int = BulkRequestLimit.MAX_LIMIT,
+    ) -> None:
+        self.bot = bot
+        self.delay_queue = delay_queue
+        self.max_linger_seconds = max_linger_seconds
+        self.batch_size = max(1, min(batch_size, BulkRequestLimit.MAX_LIMIT))
+        self._batches: dict[int, list[int]] = {}
+        self._flush_jobs: dict[int, DelayHandle] = {}
+        self._deleted = 0
+        self._requests = 0
+
+    def delete_later(self, chat_id: int, message_id: int, delay: float) -> None:
+        """Удалит сообщение не раньше чем через delay и не позже чем через delay + max_linger."""
+        self.delay_queue.schedule(delay, self._mark_due, chat_id, message_id)
+
+    async def _mark_due(self, chat_id: int, message_id: int) -> None:
+        batch = self._batches.setdefault(chat_id, [])
+        batch.append(message_id)
+        if len(batch) >= self.batch_size:
+            await self.flush(chat_id)
+        elif chat_id not in self._flush_jobs:
+            # Сообщение подождёт попутчиков, но не дольше max_linger.
+            self._flush_jobs[chat_id] = self.delay_queue.schedule(
+                self.max_linger_seconds, self.flush, chat_id
+            )
+
+    async def flush(self, chat_id: int) -> None:
+        job = self._flush_jobs.pop(chat_id, None)
+        if job is not None:
+            job.cancel()
+        message_ids = self._batches.pop(chat_id, [])
+        for start in range(0, len(message_ids), self.batch_size):
+            chunk = message_ids[start : start + self.batch_size]
+            self._requests += 1
+            try:
+                await self.bot.delete_messages(chat_id, chunk)
+            except TelegramError as exc:
+                logger.warning("Не удалось убрать %s служебных сообщений в %s: %s", len(chunk), chat_id, exc)
+                continue
+            self._deleted += len(chunk)
+
+    async def flush_all(self) -> None:
+        for chat_id in list(self._batches):
+            await self.flush(chat_id)
+
+    def snapshot(self) -> CleanupSnapshot:
+        return CleanupSnapshot(
+            waiting=sum(len(batch) for batch in self._batches.values()),
+            deleted=self._deleted,
+            requests=self._requests,
+        )
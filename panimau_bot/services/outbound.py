@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import warnings
+from collections import deque
+from collections.abc import Callable, Coroutine
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any
+
+from telegram.error import RetryAfter, TelegramError
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+JSONResult = bool | dict[str, Any] | list[dict[str, Any]]
+
+PRIORITY_POST = 0
+PRIORITY_STATUS = 1
+
+# Служебная возня со статусами: её можно придержать, пока в канал уходят настоящие посты.
+LOW_PRIORITY_ENDPOINTS = frozenset(
+    {
+        "editMessageText",
+        "editMessageCaption",
+        "editMessageReplyMarkup",
+        "deleteMessage",
+        "deleteMessages",
+        "setMessageReaction",
+    }
+)
+
+# Под лимит «20 сообщений в минуту на группу» попадают только новые сообщения.
+# Правки, удаления и реакции идут отдельным, более свободным ведром: иначе прогресс
+# загрузки съедает бюджет, а ответ со статусом на новую ссылку стоит в очереди.
+MESSAGE_ENDPOINT_PREFIXES = ("send", "copyMessage", "forwardMessage")
+NON_MESSAGE_ENDPOINTS = frozenset({"sendChatAction"})
+
+# rate_limit_args=BEST_EFFORT: запрос не ждёт токена чата и не повторяется, а
+# отбрасывается с OutboundDropped. Для правок прогресса, которые через минуту уже не нужны.
+BEST_EFFORT = -1
+
+PRIVATE_CHAT_PER_SECOND = 1.0
+MAX_IDLE_CHAT_BUCKETS = 512
+WAIT_SAMPLES = 100
+
+
+def _retry_after_seconds(exc: RetryAfter) -> float:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        value = exc.retry_after
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return float(value)
+
+
+class OutboundDropped(TelegramError):
+    """Необязательный запрос отброшен: у чата сейчас нет свободного токена."""
+
+
+def _is_message(endpoint: str) -> bool:
+    return endpoint.startswith(MESSAGE_ENDPOINT_PREFIXES) and endpoint not in NON_MESSAGE_ENDPOINTS
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "wakeup")
+
+    def __init__(self, priority: int, seq: int, wakeup: asyncio.Future[None]) -> None:
+        self.priority = priority
+        self.seq = seq
+        self.wakeup = wakeup
+
+    def __lt__(self, other: _Waiter) -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class TokenBucket:
+    """Ведро токенов с очередью по приоритету: меньшее число проходит раньше, внутри — FIFO."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: list[_Waiter] = []
+        self._counter = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def idle(self) -> bool:
+        self._refill(time.monotonic())
+        return not self._waiters and self._tokens >= self.capacity
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        """Сколько секунд ждать до ближайшего токена."""
+        now = time.monotonic()
+        self._refill(now)
+        paused = max(0.0, self._paused_until - now)
+        if self._tokens >= 1:
+            return paused
+        return max(paused, (1 - self._tokens) / self.rate)
+
+    def try_acquire(self) -> bool:
+        """Берёт токен, только если он есть прямо сейчас и никто не стоит в очереди."""
+        if self._waiters or self.delay() > 0:
+            return False
+        self._tokens -= 1
+        return True
+
+    def pause(self, seconds: float) -> None:
+        """Придерживает ведро после RetryAfter: Telegram сам сказал, сколько молчать."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, priority: int = PRIORITY_POST) -> None:
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, next(self._counter), loop.create_future())
+        heapq.heappush(self._waiters, waiter)
+        try:
+            while True:
+                if self._waiters[0] is not waiter:
+                    waiter.wakeup = loop.create_future()
+                    await waiter.wakeup
+                    continue
+                delay = self.delay()
+                if delay <= 0:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep(delay)
+        finally:
+            self._remove(waiter)
+
+    def _remove(self, waiter: _Waiter) -> None:
+        self._waiters.remove(waiter)
+        heapq.heapify(self._waiters)
+        if self._waiters and not self._waiters[0].wakeup.done():
+            self._waiters[0].wakeup.set_result(None)
+
+
+@dataclass(slots=True, frozen=True)
+class OutboundSnapshot:
+    sent: int
+    delayed: int
+    retries: int
+    queued: int
+    avg_wait_seconds: float
+    max_wait_seconds: float
+
+
+class OutboundRateLimiter(BaseRateLimiter[int]):
+    """Общий планировщик исходящих запросов: глобальное ведро, ведро на чат и повтор после RetryAfter.
+
+    У каждого чата два ведра: для новых сообщений и для правок, удалений и реакций.
+    """
+
+    def __init__(
+        self,
+        global_per_second: float = 30,
+        group_per_minute: float = 20,
+        chat_burst: int = 3,
+        max_retries: int = 3,
+        group_edits_per_minute: float = 60,
+    ) -> None:
+        self.group_per_minute = group_per_minute
+        self.group_edits_per_minute = group_edits_per_minute
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_per_second, global_per_second)
+        self._chats: dict[tuple[int | str, bool], TokenBucket] = {}
+        self._sent = 0
+        self._delayed = 0
+        self._retries = 0
+        self._waits: deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+    async def initialize(self) -> None:
+        """Состояние живёт в памяти, готовить нечего."""
+
+    async def shutdown(self) -> None:
+        """Состояние живёт в памяти, закрывать нечего."""
+
+    def _chat_bucket(self, chat_id: int | str, message: bool) -> TokenBucket:
+        key = (chat_id, message)
+        bucket = self._chats.get(key)
+        if bucket is not None:
+            return bucket
+        if len(self._chats) >= MAX_IDLE_CHAT_BUCKETS:
+            for stale, candidate in list(self._chats.items()):
+                if candidate.idle:
+                    del self._chats[stale]
+        # Строковые id бывают только у каналов и супергрупп, отрицательные — у групп.
+        if isinstance(chat_id, str) or chat_id < 0:
+            per_minute = self.group_per_minute if message else self.group_edits_per_minute
+            bucket = TokenBucket(per_minute / 60, self.chat_burst)
+        else:
+            bucket = TokenBucket(PRIVATE_CHAT_PER_SECOND, 1)
+        self._chats[key] = bucket
+        return bucket
+
+    async def _wait_turn(self, chat_bucket: TokenBucket, priority: int, best_effort: bool) -> None:
+        started = time.monotonic()
+        if best_effort:
+            if not chat_bucket.try_acquire():
+                raise OutboundDropped("Chat is throttled, best-effort request dropped")
+        else:
+            await chat_bucket.acquire(priority)
+        await self._global.acquire(priority)
+        waited = time.monotonic() - started
+        self._waits.append(waited)
+        if waited > 0.01:
+            self._delayed += 1
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, JSONResult]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: int | None,
+    ) -> JSONResult:
+        chat_id = data.get("chat_id")
+        if chat_id is None:
+            # getUpdates, answerCallbackQuery и прочее без чата под лимиты сообщений не попадают.
+            return await callback(*args, **kwargs)
+
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            pass
+
+        chat_bucket = self._chat_bucket(chat_id, _is_message(endpoint))
+        priority = PRIORITY_STATUS if endpoint in LOW_PRIORITY_ENDPOINTS else PRIORITY_POST
+        best_effort = rate_limit_args == BEST_EFFORT
+        if best_effort:
+            max_retries = 0
+        else:
+            max_retries = self.max_retries if rate_limit_args is None else rate_limit_args
+
+        attempt = 0
+        while True:
+            await self._wait_turn(chat_bucket, priority, best_effort)
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                delay = _retry_after_seconds(exc) + 0.1
+                # Придерживаем ведро и когда не повторяем: следующий запрос в чат упрётся в то же.
+                chat_bucket.pause(delay)
+                if attempt >= max_retries:
+                    if not best_effort:
+                        logger.warning("Флуд-контроль в чате %s не отпустил после %s повторов", chat_id, attempt)
+                    raise
+                attempt += 1
+                self._retries += 1
+                logger.info("Флуд-контроль на %s в чате %s, ждём %.1fс", endpoint, chat_id, delay)
+                continue
+            self._sent += 1
+            return result
+
+    def snapshot(self) -> OutboundSnapshot:
+        waits = list(self._waits)
+        return OutboundSnapshot(
+            sent=self._sent,
+            delayed=self._delayed,
+            retries=self._retries,
+            queued=self._global.queued + sum(bucket.queued for bucket in self._chats.values()),
+            avg_wait_seconds=sum(waits) / len(waits) if waits else 0.0,
+            max_wait_seconds=max(waits, default=0.0),
+        )
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Protocol
+
+from panimau_bot.models import DownloadRequest, PendingAttachmentPost, PendingDownloadPost, PendingPost
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_posts (
+    post_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+"""
+
+KIND_ATTACHMENT = "attachment"
+KIND_DOWNLOAD = "download"
+
+
+class PendingBackend(Protocol):
+    def save(self, post_id: str, post: PendingPost) -> None: ...
+
+    def delete(self, post_id: str) -> None: ...
+
+    def load(self) -> dict[str, PendingPost]: ...
+
+    def close(self) -> None: ...
+
+
+def encode_post(post: PendingPost) -> tuple[str, str]:
+    payload: dict[str, Any] = {
+        "chat_id": post.chat_id,
+        "source_message_id": post.source_message_id,
+        "status_message_id": post.status_message_id,
+        "publish_at": post.publish_at,
+    }
+    if isinstance(post, PendingAttachmentPost):
+        payload["file_types"] = post.file_types
+        payload["media_group_id"] = post.media_group_id
+        payload["message_ids"] = post.message_ids
+        return KIND_ATTACHMENT, json.dumps(payload)
+    payload["url"] = post.request.url
+    payload["platform"] = post.request.platform
+    return KIND_DOWNLOAD, json.dumps(payload)
+
+
+def decode_post(kind: str, raw_payload: str) -> PendingPost:
+    payload = json.loads(raw_payload)
+    common = {
+        "chat_id": payload["chat_id"],
+        "source_message_id": payload["source_message_id"],
+        "status_message_id": payload["status_message_id"],
+        "publish_at": payload["publish_at"],
+    }
+    if kind == KIND_ATTACHMENT:
+        return PendingAttachmentPost(
+            file_types=[(file_type, file_id) for file_type, file_id in payload["file_types"]],
+            media_group_id=payload["media_group_id"],
+            message_ids=list(payload["message_ids"]),
+            **common,
+        )
+    if kind == KIND_DOWNLOAD:
+        return PendingDownloadPost(
+            request=DownloadRequest(url=payload["url"], platform=payload["platform"]),
+            **common,
+        )
+    raise ValueError(f"Неизвестный тип отложенного поста: {kind}")
+
+
+class SqlitePendingBackend:
+    """Отложенные посты в SQLite (WAL). Запись уходит в отдельный поток и не тормозит хендлеры."""
+
+    def __init__(self, path: Path | str) -> None:
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # В WAL режим NORMAL не теряет целостность, а fsync идёт только на чекпоинтах.
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._ops: queue.SimpleQueue[tuple[str, tuple[str, str] | None] | threading.Event | None] = (
+            queue.SimpleQueue()
+        )
+        self._writer = threading.Thread(target=self._write_loop, name="pending-writer", daemon=True)
+        self._writer.start()
+
+    def save(self, post_id: str, post: PendingPost) -> None:
+        # Сериализуем сразу: запись живёт дальше в event loop и может поменяться до коммита.
+        self._ops.put((post_id, encode_post(post)))
+
+    def delete(self, post_id: str) -> None:
+        self._ops.put((post_id, None))
+
+    def flush(self) -> None:
+        """Ждёт, пока всё поставленное в очередь окажется в базе."""
+        done = threading.Event()
+        self._ops.put(done)
+        done.wait()
+
+    def load(self) -> dict[str, PendingPost]:
+        self.flush()
+        posts: dict[str, PendingPost] = {}
+        for post_id, kind, payload in self._connection.execute(
+            "SELECT post_id, kind, payload FROM pending_posts"
+        ):
+            try:
+                posts[post_id] = decode_post(kind, payload)
+            except (KeyError, TypeError, ValueError) as exc:
+                logger.warning("Отложенный пост %s не читается, пропускаем: %s", post_id, exc)
+        return posts
+
+    def _write_loop(self) -> None:
+        while True:
+            op = self._ops.get()
+            batch = [op]
+            # Всё, что накопилось, пока шёл прошлый коммит, едет одной транзакцией.
+            while True:
+                try:
+                    batch.append(self._ops.get_nowait())
+                except queue.Empty:
+                    break
+            pending: dict[str, tuple[str, str] | None] = {}
+            waiters: list[threading.Event] = []
+            stop = False
+            for item in batch:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    post_id, encoded = item
+                    pending[post_id] = encoded
+            self._commit(pending)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _commit(self, pending: dict[str, tuple[str, str] | None]) -> None:
+        if not pending:
+            return
+        try:
+            with self._connection:
+                for post_id, encoded in pending.items():
+                    if encoded is None:
+                        self._connection.execute("DELETE FROM pending_posts WHERE post_id = ?", (post_id,))
+                    else:
+                        self._connection.execute(
+                            "INSERT OR REPLACE INTO pending_posts (post_id, kind, payload) VALUES (?, ?, ?)",
+                            (post_id, *encoded),
+                        )
+        except sqlite3.Error as exc:
+            logger.error("Не удалось сохранить отложенные посты", exc_info=exc)
+
+    def close(self) -> None:
+        self._ops.put(None)
+        self._writer.join()
+        self._connection.close()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Generic, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Flight(Generic[T]):
+    __slots__ = ("key", "task", "holders", "lock")
+
+    def __init__(self, key: str, task: asyncio.Task[T]) -> None:
+        self.key = key
+        self.task = task
+        self.holders = 0
+        self.lock = asyncio.Lock()
+
+
+class FlightLease(Generic[T]):
+    """Доля участника в общей задаче; результат живёт, пока есть хоть один держатель."""
+
+    def __init__(self, registry: SingleFlight[T], flight: _Flight[T], shared: bool) -> None:
+        self._registry = registry
+        self._flight = flight
+        self._released = False
+        self.shared = shared
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """Общий замок участников, например чтобы залить результат только один раз."""
+        return self._flight.lock
+
+    async def result(self) -> T:
+        # shield: отмена одного ожидающего не должна отменять общую задачу.
+        return await asyncio.shield(self._flight.task)
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._registry._release(self._flight)
+
+    async def __aenter__(self) -> FlightLease[T]:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        self.release()
+
+
+class SingleFlight(Generic[T]):
+    """Схлопывает одновременные запросы с одинаковым ключом в одну общую задачу."""
+
+    def __init__(self, on_release: Callable[[T], None] | None = None) -> None:
+        self._flights: dict[str, _Flight[T]] = {}
+        self._on_release = on_release
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._flights
+
+    def acquire(self, key: str, factory: Callable[[], Awaitable[T]]) -> FlightLease[T]:
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight(key, asyncio.ensure_future(factory()))
+            flight.task.add_done_callback(lambda task, flight=flight: self._on_done(flight))
+            self._flights[key] = flight
+        flight.holders += 1
+        return FlightLease(self, flight, shared)
+
+    def _forget(self, flight: _Flight[T]) -> None:
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    def _on_done(self, flight: _Flight[T]) -> None:
+        task = flight.task
+        if task.cancelled() or task.exception() is not None:
+            # Неудачу не кэшируем: следующий запрос должен попробовать заново.
+            self._forget(flight)
+        elif flight.holders == 0:
+            self._forget(flight)
+            self._dispose(task.result())
+
+    def _release(self, flight: _Flight[T]) -> None:
+        flight.holders -= 1
+        if flight.holders > 0:
+            return
+
+        self._forget(flight)
+        task = flight.task
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled() and task.exception() is None:
+            self._dispose(task.result())
+
+    def _dispose(self, result: T) -> None:
+        if self._on_release is None:
+            return
+        try:
+            self._on_release(result)
+        except Exception as exc:
+            logger.warning("Не удалось освободить результат общей задачи", exc_info=exc)
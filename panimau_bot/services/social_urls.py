@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from panimau_bot.models import DownloadRequest
+
+TRAILING_URL_PUNCTUATION = ".,!?;:)]}"
+
+_SCHEME = r"(?:https?://)?(?:www\.)?"
+
+
+@dataclass(slots=True, frozen=True)
+class PlatformUrls:
+    platform: str
+    # Подстроки, без хотя бы одной из которых регулярку не запускаем. Ищутся как есть,
+    # с учётом регистра, как и в прежнем фильтре сообщений: lower() на длинных
+    # простынях стоил дороже самой проверки.
+    markers: tuple[str, ...]
+    pattern: str
+
+
+# Единственное место, где описано, какие ссылки бот качает: фильтр сообщений,
+# поиск ссылки в тексте и проверка раскрытых коротких ссылок строятся отсюда.
+PLATFORM_URLS: tuple[PlatformUrls, ...] = (
+    PlatformUrls(
+        "youtube",
+        ("youtu",),
+        r"(?:youtube\.com/shorts/|youtu\.be/)[^\s]+",
+    ),
+    PlatformUrls(
+        "instagram",
+        ("instagram",),
+        r"instagram\.com/(?:[^/\s?#]+/)?reels?/(?!audio/)[^\s]+",
+    ),
+    PlatformUrls(
+        "tiktok",
+        ("tiktok",),
+        r"(?:tiktok\.com/@[^/\s?#]+/video/|vm\.tiktok\.com/|vt\.tiktok\.com/)[^\s]+",
+    ),
+)
+
+SUPPORTED_PLATFORMS = tuple(entry.platform for entry in PLATFORM_URLS)
+
+
+@dataclass(slots=True, frozen=True)
+class UrlMatch:
+    platform: str
+    url: str
+    start: int
+    end: int
+
+
+def normalize_url(raw_url: str) -> str:
+    cleaned = raw_url.rstrip(TRAILING_URL_PUNCTUATION)
+    if cleaned.startswith(("http://", "https://")):
+        return cleaned
+    return f"https://{cleaned}"
+
+
+class SocialUrlMatcher:
+    """Все платформы одной регуляркой: текст проходится один раз, а не по разу на платформу.
+
+    Платформу даёт имя сработавшей группы. Прежде чем запускать регулярку, текст
+    проверяется на маркеры вроде «tiktok»: обычная болтовня без них отсекается
+    простым поиском подстроки.
+    """
+
+    def __init__(self, table: tuple[PlatformUrls, ...]) -> None:
+        self.markers = tuple(dict.fromkeys(marker for entry in table for marker in entry.markers))
+        self.pattern = re.compile(
+            _SCHEME + "(?:" + "|".join(f"(?P<{entry.platform}>{entry.pattern})" for entry in table) + ")",
+            re.IGNORECASE,
+        )
+
+    def might_match(self, text: str) -> bool:
+        for marker in self.markers:
+            if marker in text:
+                return True
+        return False
+
+    def search(self, text: str) -> re.Match[str] | None:
+        """Самое раннее совпадение в тексте или None."""
+        if not self.might_match(text):
+            return None
+        return self.pattern.search(text)
+
+    def iter_matches(self, text: str) -> Iterator[UrlMatch]:
+        if not self.might_match(text):
+            return
+        for match in self.pattern.finditer(text):
+            yield self.to_url_match(match)
+
+    def find_all(self, text: str) -> list[UrlMatch]:
+        return list(self.iter_matches(text))
+
+    def fullmatch(self, url: str) -> str | None:
+        """Платформа, если ссылка целиком поддерживается; регистр не важен."""
+        match = self.pattern.fullmatch(normalize_url(url))
+        return match.lastgroup if match else None
+
+    @staticmethod
+    def to_url_match(match: re.Match[str]) -> UrlMatch:
+        platform = match.lastgroup
+        assert platform is not None
+        raw_url = match.group(0).rstrip(TRAILING_URL_PUNCTUATION)
+        return UrlMatch(platform, normalize_url(raw_url), match.start(), match.start() + len(raw_url))
+
+
+SOCIAL_URLS = SocialUrlMatcher(PLATFORM_URLS)
+
+
+def detect_platform(url: str) -> str | None:
+    return SOCIAL_URLS.fullmatch(url)
+
+
+def download_request_from_match(match: re.Match[str]) -> DownloadRequest:
+    url_match = SocialUrlMatcher.to_url_match(match)
+    return DownloadRequest(url=url_match.url, platform=url_match.platform)
+
+
+def extract_download_request(text: str) -> DownloadRequest | None:
+    match = SOCIAL_URLS.search(text)
+    if match is None:
+        return None
+    return download_request_from_match(match)
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+SPOOL_PREFIX = "panimau_"
+ADMISSION_POLL_SECONDS = 1.0
+
+
+class SpoolFull(Exception):
+    """Под новую загрузку нет места: спул упёрся в квоту или на диске мало свободного."""
+
+    def __init__(self, used_bytes: int, max_bytes: int, free_bytes: int, min_free_bytes: int) -> None:
+        super().__init__(
+            f"Нет места под загрузку: занято {used_bytes // 2**20} из {max_bytes // 2**20} МБ, "
+            f"свободно на диске {free_bytes // 2**20} МБ"
+        )
+        self.used_bytes = used_bytes
+        self.max_bytes = max_bytes
+        self.free_bytes = free_bytes
+        self.min_free_bytes = min_free_bytes
+
+
+@dataclass(slots=True, frozen=True)
+class SpoolSnapshot:
+    used_bytes: int
+    max_bytes: int
+    free_bytes: int
+    jobs: int
+    swept: int
+    refused: int
+
+
+def _tree_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(directory, name)).st_size
+            except FileNotFoundError:
+                continue
+    return total
+
+
+def _remove(path: Path) -> None:
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+class MediaSpool:
+    """Каталог под загрузки: у каждой задачи своя папка, общий объём ограничен квотой.
+
+    Потокобезопасен: папки заводятся и удаляются из потоков загрузки и перекодирования.
+    """
+
+    def __init__(
+        self,
+        root: Path | str,
+        max_bytes: int,
+        min_free_bytes: int = 0,
+        admission_wait_seconds: float = 0,
+        legacy_dirs: tuple[Path, ...] = (),
+    ) -> None:
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.min_free_bytes = min_free_bytes
+        self.admission_wait_seconds = admission_wait_seconds
+        # Старые версии бота клали файлы прямо в системный temp: их хвосты тоже подметаем.
+        self.legacy_dirs = legacy_dirs
+        self._lock = threading.Lock()
+        self._jobs: set[Path] = set()
+        self._swept = 0
+        self._refused = 0
+
+    def usage_bytes(self) -> int:
+        return _tree_size(self.root)
+
+    def free_bytes(self) -> int:
+        return shutil.disk_usage(self.root).free
+
+    def has_room(self) -> bool:
+        return self.usage_bytes() < self.max_bytes and self.free_bytes() >= self.min_free_bytes
+
+    def wait_for_room(self, check: Callable[[], None] | None = None) -> None:
+        """Ждёт места до admission_wait_seconds, потом бросает SpoolFull.
+
+        check зовётся на каждом круге ожидания и может сам бросить исключение,
+        например при отмене загрузки.
+        """
+        deadline = time.monotonic() + self.admission_wait_seconds
+        while True:
+            used = self.usage_bytes()
+            free = self.free_bytes()
+            if used < self.max_bytes and free >= self.min_free_bytes:
+                return
+            if time.monotonic() >= deadline:
+                with self._lock:
+                    self._refused += 1
+                raise SpoolFull(used, self.max_bytes, free, self.min_free_bytes)
+            if check is not None:
+                check()
+            time.sleep(min(ADMISSION_POLL_SECONDS, max(0.0, deadline - time.monotonic())))
+
+    def job_dir(self, platform: str) -> Path:
+        path = self.root / f"{SPOOL_PREFIX}{platform}_{uuid4().hex}"
+        path.mkdir()
+        with self._lock:
+            self._jobs.add(path)
+        return path
+
+    def release(self, path: Path) -> None:
+        """Сносит папку задачи целиком: с ней уходят .part, фрагменты форматов и превью."""
+        shutil.rmtree(path, ignore_errors=True)
+        with self._lock:
+            self._jobs.discard(path)
+
+    def sweep(
+        self,
+        max_age_seconds: float,
+        now: float | None = None,
+        legacy_max_age_seconds: float | None = None,
+    ) -> int:
+        """Удаляет осиротевшие panimau_* старше max_age_seconds; живые задачи не трогает.
+
+        Для общих каталогов вроде системного temp можно задать свой, более осторожный возраст.
+        """
+        current = time.time() if now is None else now
+        with self._lock:
+            active = set(self._jobs)
+        legacy_age = max_age_seconds if legacy_max_age_seconds is None else legacy_max_age_seconds
+        removed = 0
+        for directory, max_age in (
+            (self.root, max_age_seconds),
+            *((legacy, legacy_age) for legacy in self.legacy_dirs),
+        ):
+            try:
+                entries = list(directory.iterdir())
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if not entry.name.startswith(SPOOL_PREFIX) or entry in active or entry == self.root:
+                    continue
+                try:
+                    age = current - entry.lstat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if age < max_age:
+                    continue
+                _remove(entry)
+                removed += 1
+        if removed:
+            with self._lock:
+                self._swept += removed
+            logger.info("Из спула выметено %s брошенных файлов и папок", removed)
+        return removed
+
+    def snapshot(self) -> SpoolSnapshot:
+        with self._lock:
+            jobs = len(self._jobs)
+            swept = self._swept
+            refused = self._refused
+        return SpoolSnapshot(
+            used_bytes=self.usage_bytes(),
+            max_bytes=self.max_bytes,
+            free_bytes=self.free_bytes(),
+            jobs=jobs,
+            swept=swept,
+            refused=refused,
+        )
+
+
+def default_spool_root() -> Path:
+    # Дефис, а не подчёркивание: сам каталог не должен попадать под маску подметания.
+    return Path(tempfile.gettempdir()) / "panimau-spool"
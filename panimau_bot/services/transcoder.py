@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+from panimau_bot.models import DownloadResult, MediaInfo
+from panimau_bot.services.formats import MediaTooLarge
+from panimau_bot.services.media_probe import probe_media
+
+logger = logging.getLogger(__name__)
+
+AUDIO_BITRATE_KBPS = 96
+MIN_VIDEO_BITRATE_KBPS = 150
+TARGET_SIZE_RATIO = 0.92
+RETRY_BITRATE_RATIO = 0.8
+MAX_HEIGHT = 720
+POLL_SECONDS = 0.2
+METRIC_SAMPLES = 50
+# Один проход ffmpeg дольше этого - значит, он завис или машина не тянет: убиваем.
+FFMPEG_TIMEOUT_SECONDS = 600
+STDERR_TAIL_BYTES = 2000
+
+
+class TranscodeCancelled(Exception):
+    """Перекодирование остановлено, потому что результат больше никому не нужен."""
+
+
+class TranscodeTimeout(Exception):
+    """ffmpeg не уложился в отведённое время и был остановлен."""
+
+
+@dataclass(slots=True, frozen=True)
+class TranscodeSnapshot:
+    workers: int
+    active: int
+    completed: int
+    failed: int
+    avg_seconds: float
+    avg_ratio: float
+
+
+def default_transcode_workers() -> int:
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def video_bitrate_kbps(target_bytes: int, duration: float) -> int:
+    """Битрейт видео, при котором ролик длиной duration уложится в target_bytes."""
+    total_kbps = target_bytes * TARGET_SIZE_RATIO * 8 / 1000 / duration
+    return int(total_kbps - AUDIO_BITRATE_KBPS)
+
+
+def build_ffmpeg_command(source: Path, target: Path, bitrate_kbps: int, threads: int) -> list[str]:
+    # CRF держит качество, maxrate/bufsize не дают вылезти за бюджет,
+    # +faststart переносит moov в начало, чтобы Telegram мог стримить ролик.
+    return [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-y",
+        "-i",
+        str(source),
+        "-map",
+        "0:v:0",
+        "-map",
+        "0:a:0?",
+        "-vf",
+        f"scale=-2:'min({MAX_HEIGHT},ih)'",
+        "-c:v",
+        "libx264",
+        "-preset",
+        "veryfast",
+        "-crf",
+        "23",
+        "-maxrate",
+        f"{bitrate_kbps}k",
+        "-bufsize",
+        f"{bitrate_kbps * 2}k",
+        "-pix_fmt",
+        "yuv420p",
+        "-threads",
+        str(threads),
+        "-c:a",
+        "aac",
+        "-b:a",
+        f"{AUDIO_BITRATE_KBPS}k",
+        "-movflags",
+        "+faststart",
+        str(target),
+    ]
+
+
+def _tail(path: Path) -> str:
+    with path.open("rb") as log_file:
+        log_file.seek(max(0, path.stat().st_size - STDERR_TAIL_BYTES))
+        return log_file.read().decode(errors="replace").strip()
+
+
+class VideoTranscoder:
+    """Пережимает слишком большие ролики под лимит в отдельном пуле, чтобы не занимать слоты загрузок."""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        workers: int | None = None,
+        ffmpeg_timeout_seconds: float = FFMPEG_TIMEOUT_SECONDS,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.workers = workers or default_transcode_workers()
+        self.ffmpeg_timeout_seconds = ffmpeg_timeout_seconds
+        self._threads_per_job = max(1, (os.cpu_count() or 1) // self.workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="transcode")
+        self._lock = threading.Lock()
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._durations: deque[float] = deque(maxlen=METRIC_SAMPLES)
+        self._ratios: deque[float] = deque(maxlen=METRIC_SAMPLES)
+
+    def needs_transcode(self, result: DownloadResult) -> bool:
+        return result.file_path.stat().st_size > self.max_bytes
+
+    def _run_ffmpeg(self, command: list[str], cancel_event: threading.Event | None) -> None:
+        """Запускает ffmpeg и ждёт его, проверяя отмену и таймаут.
+
+        stderr пишется в файл рядом с результатом, в папке задачи: из неразобранного
+        пайпа ffmpeg встал бы, заполнив буфер. При ошибке в исключение идёт хвост файла.
+        """
+        stop = cancel_event or threading.Event()
+        log_path = Path(command[-1]).with_suffix(".log")
+        deadline = time.monotonic() + self.ffmpeg_timeout_seconds
+        try:
+            with log_path.open("wb") as log_file:
+                process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=log_file)
+            try:
+                while process.poll() is None:
+                    if stop.wait(POLL_SECONDS):
+                        raise TranscodeCancelled("Transcode was cancelled")
+                    if time.monotonic() > deadline:
+                        raise TranscodeTimeout(f"ffmpeg exceeded {self.ffmpeg_timeout_seconds:.0f}s")
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+            if process.returncode != 0:
+                raise RuntimeError(f"ffmpeg failed with code {process.returncode}: {_tail(log_path)[-300:]}")
+        finally:
+            log_path.unlink(missing_ok=True)
+
+    def transcode(
+        self,
+        result: DownloadResult,
+        cancel_event: threading.Event | None = None,
+    ) -> DownloadResult:
+        """Блокирующе пережимает файл результата и возвращает результат с новым файлом."""
+        source = result.file_path
+        source_size = source.stat().st_size
+        probed = probe_media(source) if not result.duration else None
+        duration = result.duration or (probed.duration if probed else None)
+        if not duration:
+            raise MediaTooLarge(source_size, self.max_bytes)
+
+        bitrate = video_bitrate_kbps(self.max_bytes, duration)
+        target = source.with_name(f"{source.stem}.transcoded.mp4")
+        started = time.monotonic()
+        with self._lock:
+            self._active += 1
+
+        try:
+            for _ in range(2):
+                if bitrate < MIN_VIDEO_BITRATE_KBPS:
+                    raise MediaTooLarge(source_size, self.max_bytes)
+                self._run_ffmpeg(
+                    build_ffmpeg_command(source, target, bitrate, self._threads_per_job),
+                    cancel_event,
+                )
+                if target.stat().st_size <= self.max_bytes:
+                    break
+                bitrate = int(bitrate * RETRY_BITRATE_RATIO)
+            else:
+                raise MediaTooLarge(target.stat().st_size, self.max_bytes)
+        except BaseException:
+            target.unlink(missing_ok=True)
+            with self._lock:
+                self._active -= 1
+                self._failed += 1
+            raise
+
+        elapsed = time.monotonic() - started
+        target_size = target.stat().st_size
+        ratio = source_size / target_size if target_size else 0.0
+        with self._lock:
+            self._active -= 1
+            self._completed += 1
+            self._durations.append(elapsed)
+            self._ratios.append(ratio)
+        logger.info(
+            "Перекодировал %s за %.1fs: %d -> %d байт (x%.2f, %dk)",
+            result.url,
+            elapsed,
+            source_size,
+            target_size,
+            ratio,
+            bitrate,
+        )
+        source.unlink(missing_ok=True)
+        # Размеры после масштабирования другие: их заново прочитает подготовка к загрузке.
+        return replace(result, file_path=target, media=MediaInfo(duration=duration))
+
+    async def run(
+        self,
+        result: DownloadResult,
+        cancel_event: threading.Event | None = None,
+    ) -> DownloadResult:
+        """Ставит перекодирование в собственный пул; число одновременных ffmpeg ограничено ядрами."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.transcode, result, cancel_event)
+
+    def snapshot(self) -> TranscodeSnapshot:
+        with self._lock:
+            durations = list(self._durations)
+            ratios = list(self._ratios)
+            return TranscodeSnapshot(
+                workers=self.workers,
+                active=self._active,
+                completed=self._completed,
+                failed=self._failed,
+                avg_seconds=sum(durations) / len(durations) if durations else 0.0,
+                avg_ratio=sum(ratios) / len(ratios) if ratios else 0.0,
+            )
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable
+from typing import Any
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+OrderingKey = tuple[int, int]
+
+
+def ordering_key(update: object) -> OrderingKey | None:
+    """Ключ порядка: чат и автор. Части альбома и клики одного человека идут строго друг за другом."""
+    if not isinstance(update, Update) or update.effective_chat is None:
+        return None
+    user_id = update.effective_user.id if update.effective_user else 0
+    return update.effective_chat.id, user_id
+
+
+class OrderedUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка апдейтов с сохранением порядка внутри пары чат+автор."""
+
+    def __init__(self, max_concurrent_updates: int) -> None:
+        super().__init__(max_concurrent_updates)
+        self._locks: dict[OrderingKey, asyncio.Lock] = {}
+        self._holders: dict[OrderingKey, int] = {}
+
+    async def initialize(self) -> None:
+        """Замки создаются по требованию, готовить нечего."""
+
+    async def shutdown(self) -> None:
+        """Замки живут только пока по ключу есть апдейты, закрывать нечего."""
+
+    @property
+    def tracked_keys(self) -> int:
+        return len(self._locks)
+
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """Сначала очередь своего ключа, потом общий семафор.
+
+        Базовый класс берёт семафор раньше: тогда пачка апдейтов одного автора (альбом,
+        спам) занимала все слоты ожиданием своего замка и останавливала остальные чаты.
+        """
+        key = ordering_key(update)
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._holders[key] = self._holders.get(key, 0) + 1
+        try:
+            async with lock:
+                await super().process_update(update, coroutine)
+        finally:
+            self._holders[key] -= 1
+            if not self._holders[key]:
+                del self._holders[key]
+                del self._locks[key]
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await coroutine
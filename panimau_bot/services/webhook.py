@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import hmac
+import logging
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Встроенный aiohttp-сервер: принимает апдейты от Telegram и кладёт их в update_queue."""
+
+    def __init__(
+        self,
+        application: Application,
+        path: str,
+        secret_token: str = "",
+        listen: str = "0.0.0.0",
+        port: int = 8080,
+    ) -> None:
+        self.application = application
+        self.path = "/" + path.strip("/")
+        self.secret_token = secret_token
+        self.listen = listen
+        self.port = port
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def bound_port(self) -> int:
+        """Фактический порт: с port=0 его выбирает система, это удобно в тестах."""
+        if self._runner is None or not self._runner.addresses:
+            return self.port
+        return int(self._runner.addresses[0][1])
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if self.secret_token and not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, ""), self.secret_token
+        ):
+            return web.Response(status=403)
+
+        try:
+            payload = await request.json()
+            update = Update.de_json(payload, self.application.bot)
+        except (AttributeError, KeyError, TypeError, ValueError) as exc:
+            logger.warning("Вебхук прислал кривой апдейт: %s", exc)
+            return web.Response(status=400)
+
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.listen, self.port).start()
+        logger.info("Вебхук слушает %s:%s%s", self.listen, self.bound_port, self.path)
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections.abc import Callable, Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+import yt_dlp
+
+from panimau_bot.services.cookies import CookieState, CookieStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_USES = 50
+
+ProgressHook = Callable[[dict[str, Any]], None]
+
+
+def set_format(downloader: yt_dlp.YoutubeDL, format_spec: str) -> None:
+    """Меняет формат у готового экземпляра: YoutubeDL разбирает его только в __init__."""
+    downloader.params["format"] = format_spec
+    downloader.format_selector = downloader.build_format_selector(format_spec)
+
+
+class _PooledDownloader:
+    __slots__ = (
+        "downloader",
+        "default_format",
+        "default_selector",
+        "hook",
+        "uses",
+        "cookie_version",
+        "cookie_baseline",
+    )
+
+    def __init__(self, options: Mapping[str, object]) -> None:
+        self.hook: ProgressHook | None = None
+        self.uses = 0
+        # -1: куки из хранилища в этот экземпляр ещё не заливались.
+        self.cookie_version = -1
+        self.cookie_baseline: CookieState = {}
+        # Хук ставится один раз при создании, а конкретный колбэк подменяется на каждую выдачу.
+        self.downloader = yt_dlp.YoutubeDL({**options, "progress_hooks": [self._report]})
+        self.default_format = self.downloader.params.get("format")
+        self.default_selector = self.downloader.format_selector
+
+    def _report(self, status: dict[str, Any]) -> None:
+        if self.hook is not None:
+            self.hook(status)
+
+    def reset(self, output_template: str, hook: ProgressHook | None) -> None:
+        self.downloader.params["outtmpl"]["default"] = output_template
+        self.downloader.params["format"] = self.default_format
+        self.downloader.format_selector = self.default_selector
+        self.hook = hook
+
+    def close(self) -> None:
+        self.hook = None
+        try:
+            self.downloader.close()
+        except Exception as exc:
+            logger.debug("YoutubeDL закрылся с ошибкой: %s", exc)
+
+
+@dataclass(slots=True, frozen=True)
+class YoutubeDLPoolSnapshot:
+    idle: int
+    leased: int
+    created: int
+    reused: int
+    recycled: int
+
+
+class YoutubeDLPool:
+    """Долгоживущие экземпляры YoutubeDL по платформам.
+
+    Экземпляр держит разобранные опции, инстансы экстракторов, куки и HTTP-сессию,
+    поэтому между загрузками меняются только шаблон имени, формат и хук прогресса.
+    Экземпляр выдаётся одному потоку за раз; после max_uses выдач или любой ошибки
+    внутри lease он закрывается, и следующий запрос получит свежий. С CookieStore
+    банка экземпляра перед выдачей догоняет хранилище, а после удачной загрузки
+    отдаёт туда свои изменения.
+    """
+
+    def __init__(
+        self,
+        options: Mapping[str, object],
+        max_uses: int = DEFAULT_MAX_USES,
+        max_idle: Mapping[str, int] | None = None,
+        default_max_idle: int = 2,
+        cookies: CookieStore | None = None,
+    ) -> None:
+        self.options = dict(options)
+        self.cookies = cookies
+        self.max_uses = max(1, max_uses)
+        self.max_idle = dict(max_idle or {})
+        self.default_max_idle = default_max_idle
+        self._lock = threading.Lock()
+        self._idle: dict[str, list[_PooledDownloader]] = {}
+        self._leased = 0
+        self._created = 0
+        self._reused = 0
+        self._recycled = 0
+        self._closed = False
+
+    def _idle_limit(self, platform: str) -> int:
+        return self.max_idle.get(platform, self.default_max_idle)
+
+    def _create(self) -> _PooledDownloader:
+        entry = _PooledDownloader(self.options)
+        with self._lock:
+            self._created += 1
+        return entry
+
+    def prewarm(self, platforms: Mapping[str, int] | None = None) -> int:
+        """Заранее создаёт экземпляры, чтобы первая загрузка не платила за сборку."""
+        targets = dict(platforms) if platforms is not None else dict(self.max_idle)
+        created = 0
+        for platform, count in targets.items():
+            with self._lock:
+                missing = min(count, self._idle_limit(platform)) - len(self._idle.get(platform, []))
+            for _ in range(max(0, missing)):
+                self._give_back(platform, self._create())
+                created += 1
+        return created
+
+    def _take(self, platform: str) -> _PooledDownloader:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("YoutubeDL pool is closed")
+            idle = self._idle.get(platform)
+            entry = idle.pop() if idle else None
+            self._leased += 1
+            if entry is not None:
+                self._reused += 1
+        return entry if entry is not None else self._create()
+
+    def _give_back(self, platform: str, entry: _PooledDownloader) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(platform, [])
+            if not self._closed and entry.uses < self.max_uses and len(idle) < self._idle_limit(platform):
+                entry.hook = None
+                idle.append(entry)
+                return
+            self._recycled += 1
+        entry.close()
+
+    def _discard(self, entry: _PooledDownloader) -> None:
+        with self._lock:
+            self._recycled += 1
+        entry.close()
+
+    @contextmanager
+    def lease(
+        self,
+        platform: str,
+        output_template: str,
+        progress_hook: ProgressHook | None = None,
+    ) -> Iterator[yt_dlp.YoutubeDL]:
+        """Выдаёт экземпляр под одну загрузку; формат по умолчанию восстанавливается."""
+        entry = self._take(platform)
+        try:
+            entry.reset(output_template, progress_hook)
+            if self.cookies is not None:
+                entry.cookie_version, entry.cookie_baseline = self.cookies.sync(
+                    platform, entry.downloader.cookiejar, entry.cookie_version
+                )
+            yield entry.downloader
+        except BaseException:
+            # После ошибки внутреннему состоянию экземпляра верить нельзя.
+            self._discard(entry)
+            raise
+        else:
+            entry.uses += 1
+            if self.cookies is not None:
+                synced = self.cookies.absorb(
+                    platform, entry.downloader.cookiejar, entry.cookie_baseline, entry.cookie_version
+                )
+                entry.cookie_version = -1 if synced is None else synced
+            self._give_back(platform, entry)
+        finally:
+            with self._lock:
+                self._leased -= 1
+
+    def snapshot(self) -> YoutubeDLPoolSnapshot:
+        with self._lock:
+            return YoutubeDLPoolSnapshot(
+                idle=sum(len(entries) for entries in self._idle.values()),
+                leased=self._leased,
+                created=self._created,
+                reused=self._reused,
+                recycled=self._recycled,
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            entries = [entry for idle in self._idle.values() for entry in idle]
+            self._idle.clear()
+        for entry in entries:
+            entry.close()
@@ -1,13 +1,21 @@
 from __future__ import annotations
 
+import statistics
+import time
+from collections import deque
 from datetime import datetime
 
+LATENCY_SAMPLES = 200
+
 
 class BotStats:
     def __init__(self) -> None:
         self.total_forwarded = 0
         self.cancelled = 0
         self.by_type: dict[str, int] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.download_seconds: dict[str, deque[float]] = {}
         self.start_time = datetime.now()
 
     @property
@@ -18,8 +26,29 @@ class BotStats:
         self.total_forwarded += 1
         self.by_type[file_type] = self.by_type.get(file_type, 0) + 1
 
-    def add_cancel(self) -> None:
-        self.cancelled += 1
+    def add_cancel(self, count: int = 1) -> None:
+        self.cancelled += count
+
+    def add_cache_hit(self) -> None:
+        self.cache_hits += 1
+
+    def add_cache_miss(self) -> None:
+        self.cache_misses += 1
+
+    def add_download_time(self, platform: str, seconds: float) -> None:
+        samples = self.download_seconds.setdefault(platform, deque(maxlen=LATENCY_SAMPLES))
+        samples.append(seconds)
+
+    def download_latency(self) -> dict[str, tuple[int, float, float]]:
+        """Медиана и p95 последних загрузок по платформам: (число замеров, медиана, p95)."""
+        latency: dict[str, tuple[int, float, float]] = {}
+        for platform, samples in self.download_seconds.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            latency[platform] = (len(ordered), statistics.median(ordered), p95)
+        return latency
 
     def get_uptime(self) -> str:
         delta = datetime.now() - self.start_time
@@ -27,3 +56,27 @@ class BotStats:
         hours = delta.seconds // 3600
         minutes = (delta.seconds % 3600) // 60
         return f"{days}д {hours}ч {minutes}м"
+
+
+class StageTimer:
+    """Замеряет длительность последовательных этапов одной задачи."""
+
+    def __init__(self) -> None:
+        self._mark = time.perf_counter()
+        self.stages: dict[str, float] = {}
+
+    def mark(self, stage: str) -> float:
+        now = time.perf_counter()
+        elapsed = now - self._mark
+        self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+        self._mark = now
+        return elapsed
+
+    @property
+    def total(self) -> float:
+        return sum(self.stages.values())
+
+    def render(self) -> str:
+        parts = [f"{stage}={seconds:.2f}s" for stage, seconds in self.stages.items()]
+        parts.append(f"total={self.total:.2f}s")
+        return " ".join(parts)
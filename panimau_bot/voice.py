@@ -1,11 +1,20 @@
 from __future__ import annotations
 
 import random
+from collections.abc import Mapping, Sequence
 from typing import TYPE_CHECKING
 
 from panimau_bot.constants import FILE_EMOJIS
 
 if TYPE_CHECKING:
+    from panimau_bot.services.circuit_breaker import BreakerSnapshot
+    from panimau_bot.services.delay_queue import DelayQueueSnapshot
+    from panimau_bot.services.download_scheduler import DownloadQueueSnapshot
+    from panimau_bot.services.message_cleanup import CleanupSnapshot
+    from panimau_bot.services.outbound import OutboundSnapshot
+    from panimau_bot.services.spool import SpoolSnapshot
+    from panimau_bot.services.transcoder import TranscodeSnapshot
+    from panimau_bot.services.ydl_pool import YoutubeDLPoolSnapshot
     from panimau_bot.stats import BotStats
 
 HEALTH_RESPONSES = (
@@ -69,6 +78,24 @@ SOCIAL_PROGRESS_TEMPLATES = (
     "Достаю {label}. Сейчас станет ясно, это контент или закрытая дверь с красивой ручкой.",
 )
 
+SOCIAL_DOWNLOAD_PROGRESS_TEMPLATES = (
+    "{label} качается: {percent}%. Сайт сдаёт позиции куплет за куплетом.",
+    "Уже {percent}% от {label}. Прогресс-бар нервничает, но держит ритм.",
+    "{label}: {percent}% на борту. Остальное дотащим без пресс-релиза.",
+)
+
+SOCIAL_TRANSCODING_TEMPLATES = (
+    "{label} толще лимита Telegram. Ужимаю через ffmpeg, как куплет под хронометраж.",
+    "{label} не пролезает в дверь. ffmpeg снимает с него лишние килобайты.",
+    "Пережимаю {label}: Telegram не любит тяжеловесов без справки.",
+)
+
+SOCIAL_WAITING_TEMPLATES = (
+    "{label} ждёт своей очереди: {position}-й у микрофона. Качалка занята чужими куплетами.",
+    "Очередь на скачивание: {label} {position}-й. Терпение тоже часть флоу.",
+    "{label} в очереди, место {position}. Сначала отработаем тех, кто пришел раньше.",
+)
+
 SOCIAL_SUCCESS_TEMPLATES = (
     "{label} уже в канале. Оверхайп не понадобился, хватило холодной техники.",
     "Готово: {label} в канале, ссылка пристегнута, публика может делать серьезные лица.",
@@ -115,7 +142,8 @@ def render_welcome() -> str:
         "• /joke - получить короткий панч\n"
         "• /help - показать это сообщение\n\n"
         "Админское:\n"
-        "• /broadcast <текст> - отправить текст в канал"
+        "• /broadcast <текст> - отправить текст в канал\n"
+        "• /cookies <платформа> - ответом на cookies.txt, в личке"
     )
 
 
@@ -128,6 +156,7 @@ def render_health(
     total_forwarded: int,
     cancelled: int,
     joke: str | None = None,
+    details: Sequence[str] = (),
 ) -> str:
     text = (
         f"{_pick(HEALTH_RESPONSES)}\n\n"
@@ -135,11 +164,80 @@ def render_health(
         f"В канал долетело: {total_forwarded}\n"
         f"Отменено по дороге: {cancelled}"
     )
+    if details:
+        text += "\n\nПод капотом:\n" + "\n".join(details)
     if joke:
         text += f"\n\nПанч:\n{joke}"
     return text
 
 
+def render_download_queue_health(snapshot: "DownloadQueueSnapshot") -> str:
+    text = (
+        f"Качалка: {snapshot.active}/{snapshot.workers} в работе, "
+        f"{snapshot.queued} в очереди, ожидание ~{snapshot.avg_wait_seconds:.1f}с "
+        f"(макс {snapshot.max_wait_seconds:.1f}с)"
+    )
+    if snapshot.queued_by_platform:
+        breakdown = ", ".join(
+            f"{platform}: {count}" for platform, count in sorted(snapshot.queued_by_platform.items())
+        )
+        text += f"; в очереди по платформам: {breakdown}"
+    return text
+
+
+def render_transcode_health(snapshot: "TranscodeSnapshot") -> str:
+    return (
+        f"ffmpeg: {snapshot.active}/{snapshot.workers} в работе, "
+        f"готово {snapshot.completed}, упало {snapshot.failed}, "
+        f"в среднем {snapshot.avg_seconds:.1f}с и сжатие x{snapshot.avg_ratio:.2f}"
+    )
+
+
+def render_delay_queue_health(snapshot: "DelayQueueSnapshot") -> str:
+    return (
+        f"Таймеры: {snapshot.pending} ждут, {snapshot.running} выполняются, "
+        f"сработало {snapshot.fired}, отменено {snapshot.cancelled}"
+    )
+
+
+def render_cleanup_health(snapshot: "CleanupSnapshot") -> str:
+    return (
+        f"Уборка: {snapshot.deleted} сообщений снесено за {snapshot.requests} запросов, "
+        f"{snapshot.waiting} ждут пачки"
+    )
+
+
+def render_pending_store_health(size: int, memory_bytes: int) -> str:
+    return f"Отложенные посты: {size} шт., ~{memory_bytes / 1024:.1f} КБ"
+
+
+def render_ytdl_pool_health(snapshot: "YoutubeDLPoolSnapshot") -> str:
+    return (
+        f"yt-dlp: {snapshot.leased} в деле, {snapshot.idle} наготове, "
+        f"собрано {snapshot.created}, переиспользовано {snapshot.reused}, списано {snapshot.recycled}"
+    )
+
+
+def render_breakers_health(snapshots: Sequence["BreakerSnapshot"]) -> str:
+    broken = [snapshot for snapshot in snapshots if snapshot.state != "closed"]
+    if not broken:
+        return "Платформы: все отвечают"
+    parts = []
+    for snapshot in broken:
+        state = "проверяю" if snapshot.state == "probing" else f"отдыхает ещё {snapshot.retry_in:.0f}с"
+        parts.append(f"{snapshot.platform} {state} ({snapshot.failures} ошибок, {snapshot.last_error})")
+    return "Платформы: " + "; ".join(parts)
+
+
+def render_spool_health(snapshot: "SpoolSnapshot") -> str:
+    mib = 1024 * 1024
+    return (
+        f"Спул: {snapshot.used_bytes / mib:.0f}/{snapshot.max_bytes / mib:.0f} МБ, "
+        f"{snapshot.jobs} задач, на диске свободно {snapshot.free_bytes / mib:.0f} МБ, "
+        f"выметено {snapshot.swept}, отказов {snapshot.refused}"
+    )
+
+
 def render_tell_joke(joke: str | None = None) -> str:
     actual_joke = joke or pick_joke()
     return f"Панч на выдаче:\n{actual_joke}"
@@ -156,7 +254,7 @@ def render_empty_stats() -> str:
     )
 
 
-def render_stats(stats: "BotStats") -> str:
+def render_stats(stats: "BotStats", outbound: "OutboundSnapshot | None" = None) -> str:
     text = (
         "*Статы без оверхайпа:*\n\n"
         f"Аптайм: {stats.get_uptime()}\n"
@@ -168,9 +266,26 @@ def render_stats(stats: "BotStats") -> str:
     for file_type, count in stats.by_type.items():
         emoji = FILE_EMOJIS.get(file_type, "•")
         text += f"\n{emoji} {file_type}: {count}"
+    cache_lookups = stats.cache_hits + stats.cache_misses
+    if cache_lookups:
+        hit_rate = (stats.cache_hits / cache_lookups) * 100
+        text += (
+            f"\n\nКэш роликов: {stats.cache_hits} попаданий, "
+            f"{stats.cache_misses} промахов ({hit_rate:.1f}%)"
+        )
     if stats.total_attempts:
         cancel_rate = (stats.cancelled / stats.total_attempts) * 100
         text += f"\n\nПроцент отмен: {cancel_rate:.1f}%"
+    latency = stats.download_latency()
+    if latency:
+        text += "\n\nЗагрузки по платформам:"
+        for platform, (count, median, p95) in sorted(latency.items()):
+            text += f"\n• {platform}: медиана {median:.1f}с, p95 {p95:.1f}с ({count} шт.)"
+    if outbound is not None:
+        text += (
+            f"\n\nИсходящие: {outbound.sent} запросов, {outbound.delayed} ждали очереди, "
+            f"{outbound.retries} повторов после флуд-контроля, сейчас в очереди {outbound.queued}"
+        )
     text += (
         "\n\n"
         f"{_pick(('Цифры сухие, как судья после слабого панча.', 'Вот такая бухгалтерия подпольного канала.', 'Статистика сказала свое, дальше только шум.'))}"
@@ -198,6 +313,48 @@ def render_post_cancelled() -> str:
     return _pick(POST_CANCELLED_TEMPLATES)
 
 
+def render_cancel_too_late() -> str:
+    return _pick(
+        (
+            "Поздно: пост уже летит в канал.",
+            "Не успел, публикация уже на сцене.",
+        )
+    )
+
+
+def render_post_deferred_by_restart() -> str:
+    return _pick(
+        (
+            "Бот уходит на перезапуск. Пост сохранён и уйдёт сразу после старта.",
+            "Перезапуск. Очередь не сгорела: опубликую, как только вернусь.",
+        )
+    )
+
+
+def render_post_interrupted_by_restart() -> str:
+    return _pick(
+        (
+            "Перезапуск оборвал публикацию. Кинь это ещё раз через минуту.",
+            "Не успел до перезапуска, пост не ушёл. Повтори чуть позже.",
+        )
+    )
+
+
+def render_social_restarting() -> str:
+    return "Ухожу на перезапуск, ссылку сейчас не возьму. Кинь её ещё раз через минуту."
+
+
+def render_social_platform_down(label: str, retry_in: float) -> str:
+    minutes = max(1, round(retry_in / 60))
+    return _pick(
+        (
+            f"{label} сейчас не отдаёт ролики, даже пробовать не буду. "
+            f"Загляну туда через ~{minutes} мин.",
+            f"Платформа, где живёт {label}, прилегла. Кинь ссылку ещё раз минут через {minutes}.",
+        )
+    )
+
+
 def render_attachment_publish_error(error: object) -> str:
     return _pick(
         (
@@ -216,6 +373,18 @@ def render_social_progress(label: str) -> str:
     return _render(SOCIAL_PROGRESS_TEMPLATES, label=label)
 
 
+def render_social_download_progress(label: str, percent: int) -> str:
+    return _render(SOCIAL_DOWNLOAD_PROGRESS_TEMPLATES, label=label, percent=percent)
+
+
+def render_social_transcoding(label: str) -> str:
+    return _render(SOCIAL_TRANSCODING_TEMPLATES, label=label)
+
+
+def render_social_waiting(label: str, position: int) -> str:
+    return _render(SOCIAL_WAITING_TEMPLATES, label=label, position=position)
+
+
 def render_social_success(label: str) -> str:
     return _render(SOCIAL_SUCCESS_TEMPLATES, label=label)
 
@@ -289,5 +458,34 @@ def render_admin_error(error: object) -> str:
     )
 
 
+def render_cookies_status(counts: Mapping[str, int]) -> str:
+    lines = [f"• {platform}: {count} шт." for platform, count in counts.items()]
+    return (
+        "Куки по платформам:\n"
+        + "\n".join(lines)
+        + "\n\nЧтобы заменить, ответь на cookies.txt командой /cookies <платформа>."
+    )
+
+
+def render_cookies_usage(platforms: Sequence[str]) -> str:
+    return (
+        "Ответь на файл cookies.txt (формат Netscape) командой /cookies <платформа>. "
+        f"Платформы: {', '.join(platforms)}"
+    )
+
+
+def render_cookies_saved(platform: str, count: int) -> str:
+    return _pick(
+        (
+            f"Куки {platform} на месте: {count} шт. Следующие загрузки пойдут уже с ними.",
+            f"Принял {count} кук для {platform}. Теперь платформа узнаёт нас в лицо.",
+        )
+    )
+
+
+def render_cookies_error(error: object) -> str:
+    return f"Куки не принял. ({error})"
+
+
 def render_general_error() -> str:
     return _pick(GENERAL_ERROR_TEMPLATES)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import AsyncMock, Mock
+
+from telegram.error import BadRequest
+
+from panimau_bot.handlers.attachments import _publish_items, _send_album
+from panimau_bot.models import PendingAttachmentPost
+
+
+class AlbumPublishingTests(unittest.IsolatedAsyncioTestCase):
+    def _context(self) -> Mock:
+        context = Mock()
+        context.bot = AsyncMock()
+        return context
+
+    async def test_chunks_album_at_telegram_limit(self) -> None:
+        context = self._context()
+        items = [("photo", f"photo-{index}") for index in range(12)]
+
+        await _send_album(context, "@channel", items)
+
+        calls = context.bot.send_media_group.await_args_list
+        self.assertEqual([len(call.args[1]) for call in calls], [10, 2])
+        context.bot.send_photo.assert_not_awaited()
+
+    async def test_sends_leftover_single_item_and_non_album_types_separately(self) -> None:
+        context = self._context()
+        items = [("video", f"video-{index}") for index in range(11)] + [("animation", "gif")]
+
+        await _send_album(context, "@channel", items)
+
+        self.assertEqual(context.bot.send_media_group.await_count, 1)
+        context.bot.send_video.assert_awaited_once_with("@channel", "video-10")
+        context.bot.send_animation.assert_awaited_once_with("@channel", "gif")
+
+
+class CopyPublishingTests(unittest.IsolatedAsyncioTestCase):
+    def _setup(
+        self,
+        message_ids: list[int],
+        mode: str = "copy",
+        media_group_id: str | None = None,
+    ) -> tuple[Mock, Mock, PendingAttachmentPost]:
+        context = Mock()
+        context.bot = AsyncMock()
+        services = Mock()
+        services.settings.channel_id = "@channel"
+        services.settings.attachment_publish_mode = mode
+        post = PendingAttachmentPost(
+            chat_id=-100,
+            source_message_id=message_ids[0],
+            status_message_id=99,
+            file_types=[("photo", f"photo-{index}") for index in range(len(message_ids))],
+            media_group_id=media_group_id,
+            message_ids=message_ids,
+        )
+        return context, services, post
+
+    async def test_single_message_is_copied(self) -> None:
+        context, services, post = self._setup([7])
+
+        await _publish_items(context, services, post)
+
+        context.bot.copy_message.assert_awaited_once_with("@channel", -100, 7)
+        context.bot.send_photo.assert_not_awaited()
+
+    async def test_album_is_copied_in_one_call_in_message_order(self) -> None:
+        context, services, post = self._setup([12, 10, 11], media_group_id="album")
+
+        await _publish_items(context, services, post)
+
+        context.bot.copy_messages.assert_awaited_once_with("@channel", -100, [10, 11, 12])
+        context.bot.send_media_group.assert_not_awaited()
+
+    async def test_falls_back_to_senders_when_copy_fails(self) -> None:
+        context, services, post = self._setup([10, 11], media_group_id="album")
+        context.bot.copy_messages.side_effect = BadRequest("Message can't be copied")
+
+        await _publish_items(context, services, post)
+
+        context.bot.send_media_group.assert_awaited_once()
+
+    async def test_send_mode_skips_copy(self) -> None:
+        context, services, post = self._setup([7], mode="send")
+
+        await _publish_items(context, services, post)
+
+        context.bot.copy_message.assert_not_awaited()
+        context.bot.send_photo.assert_awaited_once_with("@channel", "photo-0")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from panimau_bot.models import DownloadRequest
+from panimau_bot.services.canonicalizer import UrlCanonicalizer, canonicalize_url
+
+
+class _ShortLinkHandler(BaseHTTPRequestHandler):
+    # Отвечает как vm.tiktok.com: /ok - редирект на ролик, /hop - через ещё одну короткую ссылку.
+    def do_GET(self) -> None:  # noqa: N802
+        self.server.hits.append(self.path)  # type: ignore[attr-defined]
+        if self.path == "/ok":
+            location = "https://www.tiktok.com/@user/video/123?_r=1&_t=abc"
+        elif self.path == "/hop":
+            location = "/ok"
+        elif self.path == "/home":
+            location = "https://www.tiktok.com/"
+        elif self.path == "/slow":
+            # Каждый ответ укладывается в таймаут запроса, а вся цепочка - нет.
+            time.sleep(0.3)
+            location = "/slow"
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(301)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+class CanonicalizeUrlTests(unittest.TestCase):
+    def test_same_video_gets_one_url(self) -> None:
+        cases = {
+            "https://youtu.be/dQw4w9WgXcQ?si=xyz": "https://www.youtube.com/shorts/dQw4w9WgXcQ",
+            "https://youtube.com/shorts/dQw4w9WgXcQ?feature=share": "https://www.youtube.com/shorts/dQw4w9WgXcQ",
+            "https://www.instagram.com/reels/Cxyz/?igsh=abc": "https://www.instagram.com/reel/Cxyz/",
+            "https://instagram.com/someone/reel/Cxyz?utm_source=ig_web": "https://www.instagram.com/reel/Cxyz/",
+            "https://www.tiktok.com/@user/video/123?is_from_webapp=1&sender_device=pc": (
+                "https://www.tiktok.com/@user/video/123"
+            ),
+            "https://vm.tiktok.com/ZMabc/?utm_medium=share&lang=ru": "https://vm.tiktok.com/ZMabc/?lang=ru",
+        }
+        for url, expected in cases.items():
+            with self.subTest(url=url):
+                self.assertEqual(canonicalize_url(url), expected)
+
+
+class UrlCanonicalizerTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _ShortLinkHandler)
+        self.server.hits = []  # type: ignore[attr-defined]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.canonicalizer = UrlCanonicalizer(short_link_hosts=frozenset({"127.0.0.1"}), timeout_seconds=2)
+
+    async def asyncTearDown(self) -> None:
+        await self.canonicalizer.aclose()
+        self.server.shutdown()
+        self.server.server_close()
+
+    async def test_short_link_is_resolved_once_and_cached(self) -> None:
+        request = DownloadRequest(url=f"{self.base}/hop", platform="tiktok")
+
+        first, second = await asyncio.gather(
+            self.canonicalizer.canonicalize(request),
+            self.canonicalizer.canonicalize(request),
+        )
+        third = await self.canonicalizer.canonicalize(request)
+
+        for resolved in (first, second, third):
+            self.assertEqual(resolved.url, "https://www.tiktok.com/@user/video/123")
+            self.assertEqual(resolved.platform, "tiktok")
+        self.assertEqual(self.server.hits, ["/hop", "/ok"])  # type: ignore[attr-defined]
+
+    async def test_short_link_is_kept_when_it_does_not_resolve(self) -> None:
+        for path in ("/missing", "/home"):
+            with self.subTest(path=path):
+                request = DownloadRequest(url=f"{self.base}{path}", platform="tiktok")
+
+                self.assertIs(await self.canonicalizer.canonicalize(request), request)
+        self.assertEqual(len(self.canonicalizer.resolutions), 0)
+
+    async def test_unreachable_host_falls_back_to_short_link(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        request = DownloadRequest(url=f"{self.base}/ok", platform="tiktok")
+
+        self.assertIs(await self.canonicalizer.canonicalize(request), request)
+
+    async def test_redirect_chain_is_cut_by_one_overall_timeout(self) -> None:
+        canonicalizer = UrlCanonicalizer(short_link_hosts=frozenset({"127.0.0.1"}), timeout_seconds=0.5)
+        self.addAsyncCleanup(canonicalizer.aclose)
+        request = DownloadRequest(url=f"{self.base}/slow", platform="tiktok")
+
+        started = time.monotonic()
+        self.assertIs(await canonicalizer.canonicalize(request), request)
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertLess(len(self.server.hits), 3)  # type: ignore[attr-defined]
+
+    async def test_normalize_uses_only_cached_resolutions(self) -> None:
+        request = DownloadRequest(url=f"{self.base}/ok", platform="tiktok")
+
+        self.assertIs(self.canonicalizer.normalize(request), request)
+        await self.canonicalizer.canonicalize(request)
+
+        self.assertEqual(self.canonicalizer.normalize(request).url, "https://www.tiktok.com/@user/video/123")
+        self.assertEqual(self.server.hits, ["/ok"])  # type: ignore[attr-defined]
+
+    async def test_full_links_do_not_touch_network(self) -> None:
+        request = DownloadRequest(url="https://youtu.be/dQw4w9WgXcQ?si=1", platform="youtube")
+
+        resolved = await self.canonicalizer.canonicalize(request)
+
+        self.assertEqual(resolved.url, "https://www.youtube.com/shorts/dQw4w9WgXcQ")
+        self.assertEqual(self.server.hits, [])  # type: ignore[attr-defined]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import yt_dlp
+
+from panimau_bot.services import download_errors
+from panimau_bot.services.circuit_breaker import CLOSED, OPEN, PlatformGuard, PlatformUnavailable
+from panimau_bot.services.delay_queue import DelayQueue
+from panimau_bot.services.download_errors import classify_download_error
+from panimau_bot.services.downloader import DownloadCancelled, DownloadTimeout
+from panimau_bot.services.formats import MediaTooLarge
+
+
+def _ytdlp_error(message: str) -> yt_dlp.utils.DownloadError:
+    return yt_dlp.utils.DownloadError(f"ERROR: {message}")
+
+
+class ClassifyDownloadErrorTests(unittest.TestCase):
+    def test_classifies_typical_ytdlp_messages(self) -> None:
+        cases = {
+            "[Instagram] abc: HTTP Error 429: Too Many Requests": download_errors.RATE_LIMITED,
+            "[youtube] x: Sign in to confirm you're not a bot": download_errors.RATE_LIMITED,
+            "[Instagram] abc: This content is private": download_errors.UNAVAILABLE,
+            (
+                "[Instagram] DZ-ec0ixTgg: Requested content is not available, "
+                "rate-limit reached or login required"
+            ): download_errors.UNAVAILABLE,
+            "[TikTok] 1: Video not available, status code 10204": download_errors.UNAVAILABLE,
+            "[youtube] x: Video unavailable. This video has been removed": download_errors.UNAVAILABLE,
+            "Unsupported URL: https://example.com/clip": download_errors.UNSUPPORTED,
+            "[Instagram] abc: Unable to extract shared data": download_errors.UNSUPPORTED,
+            "Unable to download webpage: <urlopen error timed out>": download_errors.TRANSIENT,
+            "[TikTok] 1: HTTP Error 503: Service Unavailable": download_errors.TRANSIENT,
+            "TransportError: Connection reset by peer": download_errors.TRANSIENT,
+            "something odd": download_errors.UNKNOWN,
+        }
+        for message, kind in cases.items():
+            with self.subTest(message=message):
+                self.assertEqual(classify_download_error(_ytdlp_error(message)), kind)
+
+    def test_bot_side_errors_are_local(self) -> None:
+        self.assertEqual(classify_download_error(MediaTooLarge(10, 5)), download_errors.LOCAL)
+        self.assertEqual(classify_download_error(DownloadCancelled("x")), download_errors.LOCAL)
+        self.assertEqual(classify_download_error(DownloadTimeout("x")), download_errors.TIMED_OUT)
+        self.assertEqual(
+            classify_download_error(_ytdlp_error("Postprocessing: Conversion failed! Stream not available")),
+            download_errors.LOCAL,
+        )
+        self.assertEqual(
+            classify_download_error(OSError(28, "No space left on device")),
+            download_errors.LOCAL,
+        )
+        self.assertEqual(classify_download_error(ConnectionResetError()), download_errors.TRANSIENT)
+
+    def test_uses_wrapped_exception_when_message_is_vague(self) -> None:
+        error = yt_dlp.utils.DownloadError("ERROR: oops", exc_info=(ConnectionError, ConnectionError(), None))
+
+        self.assertEqual(classify_download_error(error), download_errors.TRANSIENT)
+
+
+class PlatformGuardTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.queue = DelayQueue()
+        self.probes: list[tuple[str, str]] = []
+        self.probe_error: Exception | None = None
+
+    async def asyncTearDown(self) -> None:
+        await self.queue.stop()
+
+    async def _probe(self, platform: str, url: str) -> None:
+        self.probes.append((platform, url))
+        if self.probe_error is not None:
+            raise self.probe_error
+
+    def _guard(self, **kwargs: float) -> PlatformGuard:
+        options: dict[str, float] = {"retry_base_seconds": 0.001, "recovery_seconds": 0.05}
+        options.update(kwargs)
+        return PlatformGuard(self.queue, self._probe, **options)  # type: ignore[arg-type]
+
+    async def test_transient_errors_are_retried_until_success(self) -> None:
+        guard = self._guard(retry_attempts=2)
+        outcomes: list[Exception | str] = [_ytdlp_error("timed out"), _ytdlp_error("timed out"), "video"]
+
+        async def attempt() -> str:
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        self.assertEqual(await guard.call("tiktok", "u", attempt), "video")
+        self.assertEqual(guard.snapshot()[0].failures, 0)
+
+    async def test_timeout_counts_against_platform_but_is_not_retried(self) -> None:
+        guard = self._guard(failure_threshold=1, retry_attempts=3)
+        calls = 0
+
+        async def attempt() -> None:
+            nonlocal calls
+            calls += 1
+            raise DownloadTimeout("180s")
+
+        with self.assertRaises(DownloadTimeout):
+            await guard.call("tiktok", "u", attempt)
+
+        self.assertEqual(calls, 1)
+        self.assertIsNotNone(guard.retry_in("tiktok"))
+
+    async def test_unavailable_video_is_not_retried_and_does_not_trip_breaker(self) -> None:
+        guard = self._guard(failure_threshold=1)
+        calls = 0
+
+        async def attempt() -> None:
+            nonlocal calls
+            calls += 1
+            raise _ytdlp_error("This content is private")
+
+        with self.assertRaises(yt_dlp.utils.DownloadError):
+            await guard.call("instagram", "u", attempt)
+
+        self.assertEqual(calls, 1)
+        self.assertIsNone(guard.retry_in("instagram"))
+
+    async def test_unclassified_and_local_errors_do_not_trip_breaker(self) -> None:
+        guard = self._guard(failure_threshold=1)
+        errors = [
+            _ytdlp_error("something odd"),
+            _ytdlp_error("Postprocessing: ffmpeg exited with code 1"),
+            PermissionError(13, "Permission denied"),
+        ]
+
+        async def attempt() -> None:
+            raise errors.pop(0)
+
+        for _ in range(3):
+            with self.assertRaises(Exception):
+                await guard.call("tiktok", "u", attempt)
+
+        self.assertIsNone(guard.retry_in("tiktok"))
+        self.assertEqual(guard.snapshot(), [])
+
+    async def test_repeated_failures_open_breaker_and_fail_fast(self) -> None:
+        guard = self._guard(failure_threshold=2, retry_attempts=0, recovery_seconds=30)
+        calls = 0
+
+        async def attempt() -> None:
+            nonlocal calls
+            calls += 1
+            raise _ytdlp_error("Unable to extract shared data")
+
+        for _ in range(2):
+            with self.assertRaises(yt_dlp.utils.DownloadError):
+                await guard.call("instagram", "https://instagram.com/reel/1", attempt)
+        with self.assertRaises(PlatformUnavailable) as raised:
+            await guard.call("instagram", "https://instagram.com/reel/2", attempt)
+
+        self.assertEqual(calls, 2)
+        self.assertGreater(raised.exception.retry_in, 25)
+        self.assertEqual(guard.snapshot()[0].state, OPEN)
+
+    async def test_rate_limit_opens_breaker_right_away(self) -> None:
+        guard = self._guard(failure_threshold=5, retry_attempts=3)
+
+        async def attempt() -> None:
+            raise _ytdlp_error("HTTP Error 429: Too Many Requests")
+
+        with self.assertRaises(yt_dlp.utils.DownloadError):
+            await guard.call("instagram", "u", attempt)
+
+        self.assertIsNotNone(guard.retry_in("instagram"))
+
+    async def test_background_probe_closes_breaker_when_platform_recovers(self) -> None:
+        guard = self._guard(failure_threshold=1, recovery_seconds=0.02)
+        guard.record_failure("tiktok", "https://vm.tiktok.com/1", download_errors.UNSUPPORTED, Exception("x"))
+
+        await asyncio.sleep(0.1)
+
+        self.assertEqual(self.probes, [("tiktok", "https://vm.tiktok.com/1")])
+        self.assertEqual(guard.snapshot()[0].state, CLOSED)
+        self.assertIsNone(guard.retry_in("tiktok"))
+
+    async def test_failed_probe_backs_off_longer(self) -> None:
+        guard = self._guard(failure_threshold=1, recovery_seconds=0.02, max_recovery_seconds=0.03)
+        self.probe_error = _ytdlp_error("HTTP Error 503")
+        guard.record_failure("tiktok", "u", download_errors.TRANSIENT, Exception("x"))
+
+        await asyncio.sleep(0.04)
+        self.assertEqual(len(self.probes), 1)
+        self.assertEqual(guard.snapshot()[0].state, OPEN)
+
+        self.probe_error = None
+        await asyncio.sleep(0.1)
+        self.assertEqual(guard.snapshot()[0].state, CLOSED)
+
+    def test_backoff_uses_full_jitter_under_cap(self) -> None:
+        guard = PlatformGuard(DelayQueue(), self._probe, retry_base_seconds=1, retry_max_seconds=5)
+
+        with patch("panimau_bot.services.circuit_breaker.random.uniform", side_effect=lambda a, b: b):
+            self.assertEqual([guard.backoff(attempt) for attempt in range(4)], [1, 2, 4, 5])
+
+
+if __name__ == "__main__":
+    unittest.main()
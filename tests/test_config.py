@@ -37,6 +37,22 @@ class ConfigTests(unittest.TestCase):
             settings = Settings.from_env()
 
         self.assertEqual(settings.download_delay_seconds, 5)
+        self.assertFalse(settings.speculative_downloads)
+
+    def test_parses_download_platform_limits(self) -> None:
+        with patch.dict(
+            os.environ,
+            {
+                "BOT_TOKEN": "token",
+                "GROUP_ID": "-100123",
+                "CHANNEL_ID": "@channel",
+                "DOWNLOAD_PLATFORM_LIMITS": "TikTok:1, youtube:3",
+            },
+            clear=True,
+        ):
+            settings = Settings.from_env()
+
+        self.assertEqual(settings.download_platform_limits, {"tiktok": 1, "youtube": 3})
 
     def test_prefers_single_file_format_without_ffmpeg(self) -> None:
         downloader = SocialVideoDownloader(ffmpeg_available=False)
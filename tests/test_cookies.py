@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import http.cookiejar
+import stat
+import tempfile
+import unittest
+from pathlib import Path
+
+from yt_dlp.cookies import YoutubeDLCookieJar
+
+from panimau_bot.services.cookies import CookieStore
+from panimau_bot.services.ydl_pool import YoutubeDLPool
+
+COOKIES_TXT = (
+    "# Netscape HTTP Cookie File\n"
+    ".instagram.com\tTRUE\t/\tTRUE\t2000000000\tsessionid\tabc\n"
+    ".instagram.com\tTRUE\t/\tTRUE\t2000000000\tcsrftoken\tdef\n"
+)
+
+
+def _cookie(name: str, value: str, domain: str = ".instagram.com") -> http.cookiejar.Cookie:
+    return http.cookiejar.Cookie(
+        0, name, value, None, False, domain, True, True, "/", True, True, 2000000000, False, None, None, {}
+    )
+
+
+def _values(jar: http.cookiejar.CookieJar) -> dict[str, str | None]:
+    return {cookie.name: cookie.value for cookie in jar}
+
+
+class CookieStoreTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.directory = Path(self._tmp.name)
+        self.store = CookieStore(self.directory)
+
+    def test_uploaded_file_is_stored_privately_and_survives_restart(self) -> None:
+        self.assertEqual(self.store.replace("instagram", COOKIES_TXT.encode()), 2)
+
+        path = self.store.path("instagram")
+        self.assertEqual(stat.S_IMODE(path.stat().st_mode), 0o600)
+        self.assertEqual(CookieStore(self.directory).count("instagram"), 2)
+        self.assertEqual(self.store.version("instagram"), 1)
+
+    def test_garbage_upload_is_rejected(self) -> None:
+        for data in (b'{"cookies": []}', b"# Netscape HTTP Cookie File\n", b"\xff\xfe"):
+            with self.subTest(data=data):
+                with self.assertRaises(ValueError):
+                    self.store.replace("instagram", data)
+
+        self.assertFalse(self.store.path("instagram").exists())
+
+    def test_concurrent_refreshes_keep_each_others_changes(self) -> None:
+        self.store.replace("instagram", COOKIES_TXT.encode())
+        first, second = YoutubeDLCookieJar(), YoutubeDLCookieJar()
+        first_version, first_baseline = self.store.sync("instagram", first, -1)
+        second_version, second_baseline = self.store.sync("instagram", second, -1)
+
+        first.set_cookie(_cookie("sessionid", "fresh"))
+        second.set_cookie(_cookie("rur", "ldc"))
+        self.assertEqual(self.store.absorb("instagram", first, first_baseline, first_version), 2)
+        # Второй отдал изменения поверх чужой версии: его банку надо подтянуть заново.
+        self.assertIsNone(self.store.absorb("instagram", second, second_baseline, second_version))
+
+        saved = YoutubeDLCookieJar()
+        saved.load(str(self.store.path("instagram")))
+        self.assertEqual(_values(saved), {"sessionid": "fresh", "csrftoken": "def", "rur": "ldc"})
+
+        self.store.sync("instagram", second, -1)
+        self.assertEqual(_values(second)["sessionid"], "fresh")
+
+    def test_cookie_dropped_by_site_is_dropped_from_store(self) -> None:
+        self.store.replace("instagram", COOKIES_TXT.encode())
+        jar = YoutubeDLCookieJar()
+        version, baseline = self.store.sync("instagram", jar, -1)
+
+        jar.clear(".instagram.com", "/", "csrftoken")
+        self.store.absorb("instagram", jar, baseline, version)
+
+        self.assertEqual(CookieStore(self.directory).count("instagram"), 1)
+
+    def test_child_process_copy_is_merged_back(self) -> None:
+        self.store.replace("instagram", COOKIES_TXT.encode())
+        copy_path = self.directory / "job" / ".cookies.txt"
+        copy_path.parent.mkdir()
+        baseline = self.store.export("instagram", copy_path)
+
+        child_jar = YoutubeDLCookieJar()
+        child_jar.load(str(copy_path))
+        child_jar.set_cookie(_cookie("mid", "xyz"))
+        child_jar.save(str(copy_path))
+        self.store.absorb_file("instagram", copy_path, baseline)
+
+        self.assertEqual(self.store.count("instagram"), 3)
+
+
+class PooledCookieTests(unittest.TestCase):
+    def test_pooled_instances_start_with_stored_cookies_and_save_new_ones(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        store = CookieStore(tmp.name)
+        store.replace("instagram", COOKIES_TXT.encode())
+        pool = YoutubeDLPool({"format": "b", "outtmpl": "x.%(ext)s", "quiet": True}, cookies=store)
+        self.addCleanup(pool.close)
+
+        with pool.lease("instagram", "a.%(ext)s") as downloader:
+            self.assertEqual(_values(downloader.cookiejar)["sessionid"], "abc")
+            downloader.cookiejar.set_cookie(_cookie("mid", "xyz"))
+        store.replace("instagram", COOKIES_TXT.replace("abc", "admin").encode())
+        with pool.lease("instagram", "b.%(ext)s") as downloader:
+            refreshed = _values(downloader.cookiejar)
+
+        self.assertEqual(refreshed["sessionid"], "admin")
+        self.assertNotIn("mid", refreshed)
+        self.assertEqual(pool.snapshot().reused, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+
+from panimau_bot.services.delay_queue import DelayQueue
+
+
+class DelayQueueTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.queue = DelayQueue()
+
+    async def asyncTearDown(self) -> None:
+        await self.queue.stop()
+
+    async def test_fires_in_deadline_order_not_schedule_order(self) -> None:
+        fired: list[str] = []
+        done = asyncio.Event()
+
+        async def record(name: str) -> None:
+            fired.append(name)
+            if len(fired) == 3:
+                done.set()
+
+        self.queue.schedule(0.06, record, "late")
+        self.queue.schedule(0.02, record, "early")
+        self.queue.schedule(0.04, record, "middle")
+        self.assertEqual(len(self.queue), 3)
+
+        await asyncio.wait_for(done.wait(), timeout=1)
+
+        self.assertEqual(fired, ["early", "middle", "late"])
+        self.assertEqual(len(self.queue), 0)
+
+    async def test_cancelled_action_never_runs(self) -> None:
+        fired: list[str] = []
+
+        async def record(name: str) -> None:
+            fired.append(name)
+
+        handle = self.queue.schedule(0.01, record, "cancelled")
+        self.queue.schedule(0.03, record, "kept")
+
+        self.assertTrue(handle.cancel())
+        self.assertFalse(handle.cancel())
+        self.assertEqual(len(self.queue), 1)
+        await asyncio.sleep(0.08)
+
+        self.assertEqual(fired, ["kept"])
+        snapshot = self.queue.snapshot()
+        self.assertEqual((snapshot.fired, snapshot.cancelled), (1, 1))
+
+    async def test_failing_action_does_not_stop_the_queue(self) -> None:
+        fired: list[str] = []
+
+        async def fail() -> None:
+            raise RuntimeError("boom")
+
+        async def record() -> None:
+            fired.append("ok")
+
+        self.queue.schedule(0, fail)
+        self.queue.schedule(0.01, record)
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(fired, ["ok"])
+
+    async def test_cancel_after_firing_is_a_noop(self) -> None:
+        async def noop() -> None:
+            return None
+
+        handle = self.queue.schedule(0, noop)
+        await asyncio.sleep(0.02)
+
+        self.assertFalse(handle.cancel())
+        self.assertEqual(len(self.queue), 0)
+
+    async def test_expedite_runs_action_before_its_deadline(self) -> None:
+        fired = asyncio.Event()
+
+        async def record() -> None:
+            fired.set()
+
+        handle = self.queue.schedule(60, record)
+        started = self.queue.expedite(handle)
+
+        self.assertIsNotNone(started)
+        await asyncio.wait_for(fired.wait(), timeout=1)
+        self.assertEqual(len(self.queue), 0)
+        self.assertIsNone(self.queue.expedite(handle))
+
+    async def test_drain_waits_for_quick_actions_and_cancels_slow_ones(self) -> None:
+        finished: list[str] = []
+
+        async def work(name: str, seconds: float) -> None:
+            await asyncio.sleep(seconds)
+            finished.append(name)
+
+        self.queue.schedule(0, work, "quick", 0.01)
+        self.queue.schedule(0, work, "slow", 10)
+        await asyncio.sleep(0.005)
+
+        interrupted = await self.queue.drain(0.1)
+
+        self.assertEqual(interrupted, 1)
+        self.assertEqual(finished, ["quick"])
+
+
+if __name__ == "__main__":
+    unittest.main()
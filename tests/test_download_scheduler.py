@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import unittest
+
+from panimau_bot.services.download_scheduler import DownloadScheduler
+
+
+class DownloadSchedulerTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.release = threading.Event()
+        self.scheduler = DownloadScheduler(workers=2, platform_limits={"tiktok": 1})
+
+    async def asyncTearDown(self) -> None:
+        self.release.set()
+        self.scheduler.shutdown(wait=True)
+
+    def _blocking(self, value: str) -> str:
+        self.release.wait(timeout=5)
+        return value
+
+    async def test_platform_cap_does_not_block_other_platforms(self) -> None:
+        positions: list[int] = []
+        first = asyncio.create_task(self.scheduler.run("tiktok", self._blocking, "t1"))
+        second = asyncio.create_task(
+            self.scheduler.run("tiktok", self._blocking, "t2", on_position=positions.append)
+        )
+        third = asyncio.create_task(self.scheduler.run("youtube", self._blocking, "y1"))
+        await asyncio.sleep(0.05)
+
+        snapshot = self.scheduler.snapshot()
+        self.assertEqual(snapshot.active_by_platform, {"tiktok": 1, "youtube": 1})
+        self.assertEqual(snapshot.queued_by_platform, {"tiktok": 1})
+        self.assertEqual(positions, [1])
+
+        self.release.set()
+        self.assertEqual(await asyncio.gather(first, second, third), ["t1", "t2", "y1"])
+        self.assertEqual(positions, [1, 0])
+        self.assertEqual(self.scheduler.snapshot().completed, 3)
+
+    async def test_cancelling_queued_job_removes_it_from_queue(self) -> None:
+        running = asyncio.create_task(self.scheduler.run("tiktok", self._blocking, "t1"))
+        queued = asyncio.create_task(self.scheduler.run("tiktok", self._blocking, "t2"))
+        await asyncio.sleep(0.05)
+
+        queued.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await queued
+
+        self.assertEqual(self.scheduler.snapshot().queued, 0)
+        self.release.set()
+        self.assertEqual(await running, "t1")
+
+    async def test_cancel_racing_with_release_does_not_leak_slot(self) -> None:
+        scheduler = DownloadScheduler(workers=1)
+        self.addCleanup(scheduler.shutdown)
+        await scheduler._acquire("tiktok", None)
+        waiting = asyncio.create_task(scheduler._acquire("tiktok", None))
+        await asyncio.sleep(0)
+
+        # Отмена и освобождение слота в одном тике: except ожидающего ещё не отработал.
+        waiting.cancel()
+        scheduler._release("tiktok")
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+
+        snapshot = scheduler.snapshot()
+        self.assertEqual((snapshot.active, snapshot.queued), (0, 0))
+        self.assertEqual(await scheduler.run("tiktok", str, "next"), "next")
+
+    async def test_abandoned_result_is_handed_to_callback(self) -> None:
+        abandoned: list[str] = []
+        job = asyncio.create_task(
+            self.scheduler.run("youtube", self._blocking, "y1", on_abandoned=abandoned.append)
+        )
+        await asyncio.sleep(0.05)
+
+        job.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await job
+        self.release.set()
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(abandoned, ["y1"])
+        self.assertEqual(self.scheduler.snapshot().active, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import http.server
+import socketserver
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from typing import Any
+from unittest.mock import Mock
+
+from panimau_bot.models import DownloadRequest
+from panimau_bot.services.downloader import (
+    DownloadCancelled,
+    DownloadTimeout,
+    SocialVideoDownloader,
+    _fetch_video,
+    _portable_info,
+)
+from panimau_bot.services.spool import MediaSpool
+
+
+class _SlowVideoHandler(http.server.BaseHTTPRequestHandler):
+    size = 5_000_000
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(self.size))
+        self.end_headers()
+        try:
+            for _ in range(self.size // 10_000):
+                self.wfile.write(b"\0" * 10_000)
+                time.sleep(0.01)
+        except OSError:
+            pass
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+class DownloaderInterruptTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SlowVideoHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.request = DownloadRequest(
+            url=f"http://127.0.0.1:{cls.server.server_address[1]}/clip.mp4",
+            platform="fixture",
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.spool = MediaSpool(Path(self._tmp.name), max_bytes=100_000_000)
+
+    def _leftovers(self) -> list[Path]:
+        return list(self.spool.root.iterdir())
+
+    def test_cancel_stops_download_and_removes_partial_files(self) -> None:
+        for mode in ("thread", "process"):
+            with self.subTest(mode=mode):
+                downloader = SocialVideoDownloader(
+                    ffmpeg_available=True,
+                    execution_mode=mode,
+                    spool=self.spool,
+                )
+                cancel_event = threading.Event()
+                progress = []
+
+                def on_progress(update: object) -> None:
+                    progress.append(update)
+                    cancel_event.set()
+
+                started = time.monotonic()
+                with self.assertRaises(DownloadCancelled):
+                    downloader.download(self.request, cancel_event, on_progress)
+
+                self.assertLess(time.monotonic() - started, 10)
+                self.assertTrue(progress)
+                self.assertEqual(self._leftovers(), [])
+
+    def test_platform_timeout_kills_worker_process(self) -> None:
+        downloader = SocialVideoDownloader(
+            ffmpeg_available=True,
+            execution_mode="process",
+            timeouts={"fixture": 1},
+            spool=self.spool,
+        )
+
+        with self.assertRaises(DownloadTimeout):
+            downloader.download(self.request)
+
+        self.assertEqual(self._leftovers(), [])
+
+
+class PreflightReuseTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.post_extractor = lambda: {"subtitles": {}}
+        self.info: dict[str, Any] = {
+            "id": "v1",
+            "_type": "video",
+            "__post_extractor": self.post_extractor,
+            "formats": [{"format_id": "18", "ext": "mp4", "vcodec": "avc1", "acodec": "mp4a", "filesize": 1000}],
+        }
+        self.downloader = Mock()
+        self.downloader.params = {}
+        self.downloader.extract_info.return_value = self.info
+        self.downloader.process_ie_result.side_effect = lambda info, download: info
+        self.downloader.prepare_filename.return_value = "video.mp4"
+        self.events: list[tuple[str, object]] = []
+
+    def _emit(self, kind: str, payload: object) -> None:
+        self.events.append((kind, payload))
+
+    def test_raw_preflight_keeps_non_primitive_fields(self) -> None:
+        _fetch_video(self.downloader, "https://example.com/v1", None, 10_000, None, True, self._emit)
+
+        self.assertEqual(self.events[0], ("preflight", self.info))
+        processed = self.downloader.process_ie_result.call_args.args[0]
+        self.assertIs(processed["__post_extractor"], self.post_extractor)
+        self.assertIsNot(processed, self.info)
+        self.assertIsNot(processed["formats"][0], self.info["formats"][0])
+        self.downloader.extract_info.assert_called_once()
+
+    def test_portable_preflight_is_only_used_to_pick_format(self) -> None:
+        portable = _portable_info(self.info)
+        self.assertIsInstance(portable["__post_extractor"], str)
+
+        _fetch_video(
+            self.downloader,
+            "https://example.com/v1",
+            portable,
+            10_000,
+            None,
+            True,
+            self._emit,
+            preflight_is_raw=False,
+        )
+
+        self.downloader.process_ie_result.assert_not_called()
+        self.downloader.extract_info.assert_called_once_with("https://example.com/v1", download=True)
+        self.assertEqual(self.downloader.params["format"], "18")
+
+
+if __name__ == "__main__":
+    unittest.main()
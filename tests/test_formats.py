@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import unittest
+
+from panimau_bot.services.formats import MediaTooLarge, estimate_size, select_format
+
+MB = 1024 * 1024
+
+
+class FormatSelectionTests(unittest.TestCase):
+    def test_estimates_size_from_bitrate_when_filesize_missing(self) -> None:
+        self.assertEqual(estimate_size({"filesize": 10}, 60), 10)
+        self.assertEqual(estimate_size({"filesize_approx": 20}, 60), 20)
+        self.assertEqual(estimate_size({"tbr": 800}, 10), 1_000_000)
+        self.assertIsNone(estimate_size({"tbr": 800}, None))
+
+    def test_picks_best_progressive_format_under_budget(self) -> None:
+        info = {
+            "duration": 30,
+            "formats": [
+                {"format_id": "18", "height": 360, "ext": "mp4", "filesize": 5 * MB},
+                {"format_id": "22", "height": 720, "ext": "mp4", "filesize": 40 * MB},
+                {"format_id": "37", "height": 1080, "ext": "mp4", "filesize": 90 * MB},
+            ],
+        }
+
+        choice = select_format(info, 50 * MB, ffmpeg_available=False)
+
+        assert choice is not None
+        self.assertEqual(choice.format_spec, "22")
+        self.assertEqual(choice.height, 720)
+
+    def test_merges_video_with_best_audio_when_ffmpeg_available(self) -> None:
+        info = {
+            "duration": 60,
+            "formats": [
+                {"format_id": "140", "vcodec": "none", "ext": "m4a", "abr": 128, "filesize": 1 * MB},
+                {"format_id": "251", "vcodec": "none", "ext": "webm", "abr": 160, "filesize": 1 * MB},
+                {"format_id": "136", "acodec": "none", "height": 720, "ext": "mp4", "filesize": 48 * MB},
+                {"format_id": "135", "acodec": "none", "height": 480, "ext": "mp4", "filesize": 20 * MB},
+            ],
+        }
+
+        choice = select_format(info, 45 * MB, ffmpeg_available=True)
+
+        assert choice is not None
+        self.assertEqual(choice.format_spec, "135+140")
+        self.assertEqual(choice.estimated_bytes, 21 * MB)
+        self.assertIsNone(select_format({"formats": []}, 45 * MB, ffmpeg_available=True))
+
+    def test_rejects_when_every_known_format_is_too_large(self) -> None:
+        info = {
+            "duration": 600,
+            "formats": [
+                {"format_id": "22", "height": 720, "ext": "mp4", "filesize": 300 * MB},
+                {"format_id": "18", "height": 360, "ext": "mp4", "tbr": 1000},
+            ],
+        }
+
+        with self.assertRaises(MediaTooLarge) as raised:
+            select_format(info, 50 * MB, ffmpeg_available=False)
+
+        self.assertEqual(raised.exception.estimated_bytes, 75_000_000)
+
+
+if __name__ == "__main__":
+    unittest.main()
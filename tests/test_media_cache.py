@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from panimau_bot.models import MediaInfo
+from panimau_bot.services.media_cache import MediaCache
+
+
+class MediaCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = MediaCache(":memory:", max_entries=2, ttl_seconds=100)
+
+    def tearDown(self) -> None:
+        self.cache.close()
+
+    def test_finds_entry_by_url_and_by_video_id(self) -> None:
+        self.cache.put("https://youtu.be/abc", "youtube", "abc", "file-1")
+
+        by_url = self.cache.get_by_url("https://youtu.be/abc")
+        by_video = self.cache.get_by_video("youtube", "abc")
+
+        assert by_url is not None and by_video is not None
+        self.assertEqual(by_url.file_id, "file-1")
+        self.assertEqual(by_video.file_id, "file-1")
+        self.assertIsNone(self.cache.get_by_video("tiktok", "abc"))
+        self.assertIsNone(self.cache.get_by_video("youtube", None))
+
+    def test_keeps_probed_metadata_next_to_file_id(self) -> None:
+        self.cache.put(
+            "https://youtu.be/abc",
+            "youtube",
+            "abc",
+            "file-1",
+            MediaInfo(width=720, height=1280, duration=15.0),
+        )
+
+        cached = self.cache.get_by_url("https://youtu.be/abc")
+
+        assert cached is not None
+        self.assertEqual(cached.media, MediaInfo(width=720, height=1280, duration=15.0))
+
+    def test_expires_entries_after_ttl(self) -> None:
+        with patch("panimau_bot.services.media_cache.time.time", return_value=1000.0):
+            self.cache.put("https://youtu.be/abc", "youtube", "abc", "file-1")
+
+        with patch("panimau_bot.services.media_cache.time.time", return_value=1101.0):
+            self.assertIsNone(self.cache.get_by_url("https://youtu.be/abc"))
+
+    def test_evicts_least_recently_used_when_full(self) -> None:
+        with patch("panimau_bot.services.media_cache.time.time", side_effect=[1.0, 2.0, 3.0, 4.0, 5.0, 6.0]):
+            self.cache.put("https://a", "youtube", "a", "file-a")
+            self.cache.put("https://b", "youtube", "b", "file-b")
+            self.cache.get_by_url("https://a")
+            self.cache.put("https://c", "youtube", "c", "file-c")
+
+            self.assertEqual(len(self.cache), 2)
+            self.assertIsNone(self.cache.get_by_url("https://b"))
+            self.assertIsNotNone(self.cache.get_by_url("https://a"))
+
+    def test_lookups_do_not_write_until_next_put(self) -> None:
+        self.cache.put("https://a", "youtube", "a", "file-a")
+        changes = self.cache._connection.total_changes
+
+        self.cache.get_by_url("https://a")
+        self.cache.get_by_video("youtube", "a")
+        self.cache.get_by_url("https://missing")
+
+        self.assertEqual(self.cache._connection.total_changes, changes)
+        self.assertFalse(self.cache._connection.in_transaction)
+
+    def test_usage_marks_are_saved_on_close(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "cache.sqlite3"
+            cache = MediaCache(path)
+            with patch("panimau_bot.services.media_cache.time.time", side_effect=[1.0, 50.0]):
+                cache.put("https://a", "youtube", "a", "file-a")
+                cache.get_by_url("https://a")
+            cache.close()
+
+            reopened = MediaCache(path)
+            self.addCleanup(reopened.close)
+            row = reopened._connection.execute("SELECT last_used_at FROM media_cache").fetchone()
+            self.assertEqual(row[0], 50.0)
+
+    def test_discard_forgets_file_id_and_data_survives_reopen(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "cache.sqlite3"
+            cache = MediaCache(path)
+            cache.put("https://a", "youtube", "a", "file-a")
+            cache.put("https://b", "youtube", "b", "file-b")
+            cache.discard("file-b")
+            cache.close()
+
+            reopened = MediaCache(path)
+            self.assertIsNotNone(reopened.get_by_url("https://a"))
+            self.assertIsNone(reopened.get_by_url("https://b"))
+            reopened.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
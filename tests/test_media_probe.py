@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import json
+import struct
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from panimau_bot.models import DownloadResult, MediaInfo
+from panimau_bot.services.media_probe import is_faststart, prepare_for_upload, probe_media
+
+
+def _box(kind: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+class MediaProbeTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name) / "clip.mp4"
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_detects_moov_position(self) -> None:
+        self.path.write_bytes(_box(b"ftyp", b"isom") + _box(b"moov", b"x" * 16) + _box(b"mdat", b"y" * 32))
+        self.assertTrue(is_faststart(self.path))
+
+        self.path.write_bytes(_box(b"ftyp", b"isom") + _box(b"mdat", b"y" * 32) + _box(b"moov", b"x" * 16))
+        self.assertFalse(is_faststart(self.path))
+
+        self.path.write_bytes(b"\x1aE\xdf\xa3 webm header")
+        self.assertIsNone(is_faststart(self.path))
+
+    def test_falls_back_to_extractor_metadata_without_ffmpeg(self) -> None:
+        self.path.write_bytes(_box(b"ftyp", b"isom") + _box(b"moov") + _box(b"mdat"))
+        result = DownloadResult(
+            file_path=self.path,
+            url="https://youtu.be/abc",
+            platform="youtube",
+            duration=12.5,
+            media=MediaInfo(width=720, height=1280, duration=12.5),
+        )
+
+        with patch("panimau_bot.services.media_probe.shutil.which", return_value=None):
+            prepared = prepare_for_upload(result)
+
+        self.assertEqual(prepared.file_path, self.path)
+        self.assertEqual(prepared.media, MediaInfo(width=720, height=1280, duration=12.5))
+
+
+class ProbeMediaTests(unittest.TestCase):
+    def _probe(self, stream: dict[str, object]) -> MediaInfo | None:
+        completed = subprocess.CompletedProcess([], 0, stdout=json.dumps({"streams": [stream]}), stderr="")
+        with (
+            patch("panimau_bot.services.media_probe.shutil.which", return_value="/usr/bin/ffprobe"),
+            patch("panimau_bot.services.media_probe.subprocess.run", return_value=completed) as run,
+        ):
+            info = probe_media(Path("clip.mp4"))
+        self.assertIsNotNone(run.call_args.kwargs["timeout"])
+        return info
+
+    def test_portrait_phone_video_gets_display_dimensions(self) -> None:
+        cases = (
+            {"side_data_list": [{"side_data_type": "Display Matrix", "rotation": -90}]},
+            {"side_data_list": [{"rotation": 90}]},
+            {"tags": {"rotate": "270"}},
+        )
+        for extra in cases:
+            with self.subTest(extra=extra):
+                info = self._probe({"width": 1920, "height": 1080, "duration": "3.5", **extra})
+                self.assertEqual(info, MediaInfo(width=1080, height=1920, duration=3.5))
+
+    def test_upside_down_video_keeps_dimensions(self) -> None:
+        info = self._probe({"width": 1080, "height": 1920, "side_data_list": [{"rotation": 180}]})
+
+        self.assertEqual(info, MediaInfo(width=1080, height=1920))
+
+    def test_stuck_ffprobe_is_given_up(self) -> None:
+        with (
+            patch("panimau_bot.services.media_probe.shutil.which", return_value="/usr/bin/ffprobe"),
+            patch(
+                "panimau_bot.services.media_probe.subprocess.run",
+                side_effect=subprocess.TimeoutExpired("ffprobe", 30),
+            ),
+        ):
+            self.assertIsNone(probe_media(Path("clip.mp4")))
+
+
+if __name__ == "__main__":
+    unittest.main()
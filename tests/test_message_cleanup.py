@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+from unittest.mock import AsyncMock
+
+from telegram.error import BadRequest
+
+from panimau_bot.services.delay_queue import DelayQueue
+from panimau_bot.services.message_cleanup import MessageCleaner
+
+
+class MessageCleanerTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.queue = DelayQueue()
+        self.bot = AsyncMock()
+
+    async def asyncTearDown(self) -> None:
+        await self.queue.stop()
+
+    async def test_due_messages_are_deleted_in_one_call_per_chat(self) -> None:
+        cleaner = MessageCleaner(self.bot, self.queue, max_linger_seconds=0.05)
+
+        cleaner.delete_later(-1, 10, 0)
+        cleaner.delete_later(-1, 11, 0.01)
+        cleaner.delete_later(-2, 20, 0)
+        await asyncio.sleep(0.15)
+
+        calls = sorted(call.args for call in self.bot.delete_messages.await_args_list)
+        self.assertEqual(calls, [(-2, [20]), (-1, [10, 11])])
+        snapshot = cleaner.snapshot()
+        self.assertEqual((snapshot.deleted, snapshot.requests, snapshot.waiting), (3, 2, 0))
+
+    async def test_full_batch_is_flushed_without_waiting_for_linger(self) -> None:
+        cleaner = MessageCleaner(self.bot, self.queue, max_linger_seconds=10, batch_size=2)
+
+        cleaner.delete_later(-1, 10, 0)
+        cleaner.delete_later(-1, 11, 0)
+        await asyncio.sleep(0.03)
+
+        self.bot.delete_messages.assert_awaited_once_with(-1, [10, 11])
+        self.assertEqual(len(self.queue), 0)
+
+    async def test_flush_all_sends_pending_batches_and_survives_errors(self) -> None:
+        cleaner = MessageCleaner(self.bot, self.queue, max_linger_seconds=10)
+        self.bot.delete_messages.side_effect = BadRequest("message can't be deleted")
+
+        cleaner.delete_later(-1, 10, 0)
+        await asyncio.sleep(0.02)
+        await cleaner.flush_all()
+
+        self.bot.delete_messages.assert_awaited_once_with(-1, [10])
+        self.assertEqual(cleaner.snapshot().deleted, 0)
+
+    async def test_batch_size_is_capped_at_telegram_limit(self) -> None:
+        cleaner = MessageCleaner(self.bot, self.queue, batch_size=500)
+
+        self.assertEqual(cleaner.batch_size, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from telegram.error import RetryAfter
+
+from panimau_bot.services.outbound import (
+    BEST_EFFORT,
+    PRIORITY_POST,
+    PRIORITY_STATUS,
+    OutboundDropped,
+    OutboundRateLimiter,
+    TokenBucket,
+)
+
+
+class TokenBucketTests(unittest.IsolatedAsyncioTestCase):
+    async def test_higher_priority_waiter_goes_first(self) -> None:
+        bucket = TokenBucket(rate=50, capacity=1)
+        await bucket.acquire()
+        order: list[str] = []
+
+        async def take(name: str, priority: int) -> None:
+            await bucket.acquire(priority)
+            order.append(name)
+
+        status = asyncio.create_task(take("status", PRIORITY_STATUS))
+        await asyncio.sleep(0)
+        post = asyncio.create_task(take("post", PRIORITY_POST))
+        await asyncio.gather(status, post)
+
+        self.assertEqual(order, ["post", "status"])
+        self.assertEqual(bucket.queued, 0)
+
+    async def test_cancelled_waiter_leaves_queue(self) -> None:
+        bucket = TokenBucket(rate=50, capacity=1)
+        await bucket.acquire()
+
+        first = asyncio.create_task(bucket.acquire())
+        second = asyncio.create_task(bucket.acquire())
+        await asyncio.sleep(0)
+        self.assertEqual(bucket.queued, 2)
+
+        first.cancel()
+        await asyncio.wait_for(second, timeout=1)
+
+        self.assertEqual(bucket.queued, 0)
+
+
+class OutboundRateLimiterTests(unittest.IsolatedAsyncioTestCase):
+    async def test_retries_after_flood_control(self) -> None:
+        limiter = OutboundRateLimiter(chat_burst=5)
+        callback = AsyncMock(side_effect=[RetryAfter(0), {"ok": True}])
+
+        result = await limiter.process_request(
+            callback, (), {}, "sendVideo", {"chat_id": "@channel"}, None
+        )
+
+        self.assertEqual(result, {"ok": True})
+        self.assertEqual(callback.await_count, 2)
+        snapshot = limiter.snapshot()
+        self.assertEqual(snapshot.sent, 1)
+        self.assertEqual(snapshot.retries, 1)
+
+    async def test_gives_up_after_max_retries(self) -> None:
+        limiter = OutboundRateLimiter(chat_burst=5, max_retries=1)
+        callback = AsyncMock(side_effect=RetryAfter(0))
+
+        with self.assertRaises(RetryAfter):
+            await limiter.process_request(callback, (), {}, "sendMessage", {"chat_id": -100}, None)
+
+        self.assertEqual(callback.await_count, 2)
+
+    async def test_requests_without_chat_bypass_buckets(self) -> None:
+        limiter = OutboundRateLimiter(global_per_second=1, chat_burst=1)
+        callback = AsyncMock(return_value=[])
+
+        with patch.object(TokenBucket, "acquire") as acquire:
+            await limiter.process_request(callback, (), {}, "getUpdates", {"timeout": 10}, None)
+
+        acquire.assert_not_called()
+        callback.assert_awaited_once()
+
+    async def test_group_burst_is_spread_over_the_minute(self) -> None:
+        limiter = OutboundRateLimiter(group_per_minute=60, chat_burst=2)
+        callback = AsyncMock(return_value=True)
+
+        for _ in range(2):
+            await limiter.process_request(callback, (), {}, "sendMessage", {"chat_id": -100}, None)
+        third = asyncio.create_task(
+            limiter.process_request(callback, (), {}, "sendVideo", {"chat_id": -100}, None)
+        )
+        await asyncio.sleep(0.05)
+
+        self.assertFalse(third.done())
+        self.assertEqual(limiter.snapshot().queued, 1)
+        await asyncio.wait_for(third, timeout=2)
+        self.assertEqual(limiter.snapshot().delayed, 1)
+
+    async def test_edits_do_not_spend_the_message_budget(self) -> None:
+        limiter = OutboundRateLimiter(group_per_minute=60, group_edits_per_minute=60, chat_burst=2)
+        callback = AsyncMock(return_value=True)
+
+        async def request(endpoint: str, rate_limit_args: int | None = None) -> object:
+            return await limiter.process_request(callback, (), {}, endpoint, {"chat_id": -100}, rate_limit_args)
+
+        # Прогресс прошлой загрузки успел выбрать ведро правок до дна.
+        for endpoint in ("editMessageText", "setMessageReaction"):
+            await request(endpoint)
+        with self.assertRaises(OutboundDropped):
+            await request("editMessageText", BEST_EFFORT)
+
+        # Статус новой ссылки и пост уходят сразу: у сообщений своё ведро.
+        await asyncio.wait_for(asyncio.gather(request("sendMessage"), request("sendVideo")), timeout=0.05)
+        self.assertEqual(callback.await_count, 4)
+        self.assertEqual(limiter.snapshot().delayed, 0)
+
+        # Обязательная правка не выкидывается, а ждёт своего токена.
+        await asyncio.wait_for(request("deleteMessage"), timeout=2)
+        self.assertEqual(callback.await_count, 5)
+        self.assertEqual(limiter.snapshot().delayed, 1)
+
+    async def test_best_effort_request_is_not_retried(self) -> None:
+        limiter = OutboundRateLimiter(chat_burst=5)
+        callback = AsyncMock(side_effect=RetryAfter(1))
+
+        with self.assertRaises(RetryAfter):
+            await limiter.process_request(
+                callback, (), {}, "editMessageText", {"chat_id": -100}, BEST_EFFORT
+            )
+
+        callback.assert_awaited_once()
+        with self.assertRaises(OutboundDropped):
+            await limiter.process_request(
+                callback, (), {}, "editMessageText", {"chat_id": -100}, BEST_EFFORT
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from panimau_bot.models import DownloadRequest, PendingAttachmentPost, PendingDownloadPost, PendingStore
+from panimau_bot.services.pending_backend import SqlitePendingBackend
+
+
+def _attachment(message_id: int, media_group_id: str | None = None) -> PendingAttachmentPost:
+    return PendingAttachmentPost(
+        chat_id=-100,
+        source_message_id=message_id,
+        status_message_id=message_id + 1,
+        file_types=[("photo", f"file-{message_id}")],
+        media_group_id=media_group_id,
+        message_ids=[message_id],
+        publish_at=1_700_000_000.0,
+    )
+
+
+class SqlitePendingBackendTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / "pending.sqlite3"
+
+    def _reopen(self) -> PendingStore:
+        store = PendingStore(SqlitePendingBackend(self.path))
+        self.addCleanup(store.close)
+        store.restore()
+        return store
+
+    def test_posts_survive_restart_with_their_fields(self) -> None:
+        store = PendingStore(SqlitePendingBackend(self.path))
+        store.set("10", _attachment(10, media_group_id="album"))
+        store.set(
+            "20",
+            PendingDownloadPost(
+                chat_id=-100,
+                source_message_id=20,
+                status_message_id=21,
+                request=DownloadRequest(url="https://youtube.com/shorts/abc", platform="youtube"),
+                publish_at=1_700_000_005.0,
+            ),
+        )
+        album = store.get_media_group("album")
+        assert album is not None
+        album.message_ids.append(11)
+        album.file_types.append(("video", "file-11"))
+        store.update("10")
+        store.close()
+
+        restored = self._reopen()
+
+        self.assertEqual(len(restored), 2)
+        restored_album = restored.get_media_group("album")
+        assert restored_album is not None
+        self.assertEqual(restored_album.message_ids, [10, 11])
+        self.assertEqual(restored_album.file_types, [("photo", "file-10"), ("video", "file-11")])
+        restored_video = restored.get("20")
+        assert isinstance(restored_video, PendingDownloadPost)
+        self.assertEqual(restored_video.request.platform, "youtube")
+        self.assertEqual(restored_video.publish_at, 1_700_000_005.0)
+
+    def test_claimed_and_popped_posts_are_not_restored(self) -> None:
+        store = PendingStore(SqlitePendingBackend(self.path))
+        for message_id in (10, 20, 30):
+            store.set(str(message_id), _attachment(message_id))
+        store.claim_publish("10")
+        store.claim_cancel("20")
+        store.close()
+
+        restored = self._reopen()
+
+        self.assertEqual([post_id for post_id, _ in restored.items()], ["30"])
+
+    def test_database_runs_in_wal_mode(self) -> None:
+        SqlitePendingBackend(self.path).close()
+
+        with sqlite3.connect(self.path) as connection:
+            mode = connection.execute("PRAGMA journal_mode").fetchone()[0]
+
+        self.assertEqual(mode, "wal")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 import unittest
+from unittest.mock import Mock
 
-from panimau_bot.models import PendingStore
+from panimau_bot.models import DownloadRequest, PendingAttachmentPost, PendingDownloadPost, PendingStore
 
 
 class PendingStoreTests(unittest.TestCase):
@@ -22,6 +23,102 @@ class PendingStoreTests(unittest.TestCase):
         self.assertIs(store.pop("42", None), post)
         self.assertIsNone(store.get("42"))
 
+    def test_indexes_album_posts_by_media_group(self) -> None:
+        store = PendingStore()
+        post = PendingAttachmentPost(
+            chat_id=-100,
+            source_message_id=42,
+            status_message_id=43,
+            file_types=[("photo", "a")],
+            media_group_id="album-1",
+        )
+
+        store.set("42", post)
+
+        self.assertIs(store.get_media_group("album-1"), post)
+        store.pop("42")
+        self.assertIsNone(store.get_media_group("album-1"))
+        self.assertEqual(len(store), 0)
+
+    def test_claimed_post_cannot_be_cancelled(self) -> None:
+        store = PendingStore()
+        post = object()
+        store.set("42", post)
+
+        self.assertIs(store.claim_publish("42"), post)
+
+        self.assertIsNone(store.claim_cancel("42"))
+        self.assertIsNone(store.claim_publish("42"))
+        self.assertIs(store.get("42"), post)
+
+    def test_cancelled_post_cannot_be_published(self) -> None:
+        store = PendingStore()
+        post = object()
+        store.set("42", post)
+
+        self.assertIs(store.claim_cancel("42"), post)
+
+        self.assertIsNone(store.claim_publish("42"))
+        self.assertEqual(len(store), 0)
+
+    def test_claimed_album_stops_collecting_parts(self) -> None:
+        store = PendingStore()
+        post = PendingAttachmentPost(
+            chat_id=-100,
+            source_message_id=42,
+            status_message_id=43,
+            file_types=[("photo", "a")],
+            media_group_id="album-1",
+        )
+        store.set("42", post)
+
+        store.claim_publish("42")
+
+        self.assertIsNone(store.get_media_group("album-1"))
+
+    def test_sweep_evicts_only_stale_posts_and_cancels_their_timers(self) -> None:
+        store = PendingStore()
+        stale = PendingDownloadPost(
+            chat_id=-100,
+            source_message_id=1,
+            status_message_id=2,
+            request=DownloadRequest(url="https://youtube.com/shorts/abc", platform="youtube"),
+            publish_job=Mock(),
+            created_at=100.0,
+        )
+        fresh = PendingAttachmentPost(
+            chat_id=-100,
+            source_message_id=3,
+            status_message_id=4,
+            file_types=[("photo", "a")],
+            created_at=190.0,
+        )
+        store.set("1", stale)
+        store.set("3", fresh)
+
+        evicted = store.sweep(60, now=200.0)
+
+        self.assertEqual(evicted, [stale])
+        stale.publish_job.cancel.assert_called_once_with()
+        self.assertIsNone(store.get("1"))
+        self.assertIs(store.get("3"), fresh)
+
+    def test_memory_estimate_grows_with_posts(self) -> None:
+        store = PendingStore()
+        empty = store.memory_bytes()
+
+        store.set(
+            "1",
+            PendingAttachmentPost(
+                chat_id=-100,
+                source_message_id=1,
+                status_message_id=2,
+                file_types=[("photo", "a" * 80)],
+            ),
+        )
+
+        self.assertGreater(store.memory_bytes(), empty)
+
 
 if __name__ == "__main__":
     unittest.main()
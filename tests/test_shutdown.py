@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import asyncio
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, Mock
+
+from panimau_bot.app import _drain, _rearm_pending_posts
+from panimau_bot.handlers.social import publish_social_video
+from panimau_bot.models import (
+    DownloadRequest,
+    DownloadResult,
+    PendingAttachmentPost,
+    PendingDownloadPost,
+    PendingStore,
+)
+from panimau_bot.services.delay_queue import DelayQueue
+from panimau_bot.services.pending_backend import SqlitePendingBackend
+from panimau_bot.services.singleflight import SingleFlight
+
+
+def _post(message_id: int) -> PendingAttachmentPost:
+    return PendingAttachmentPost(
+        chat_id=-100,
+        source_message_id=message_id,
+        status_message_id=message_id + 1,
+        file_types=[("photo", "a")],
+    )
+
+
+class DrainTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.queue = DelayQueue()
+        self.application = Mock()
+        self.application.bot = AsyncMock()
+        self.services = Mock()
+        self.services.settings.shutdown_grace_seconds = 0.2
+        self.services.delay_queue = self.queue
+        self.services.message_cleaner = AsyncMock()
+
+    async def asyncTearDown(self) -> None:
+        await self.queue.stop()
+
+    async def test_memory_store_publishes_open_windows_right_away(self) -> None:
+        store = PendingStore()
+        self.services.pending_store = store
+        published: list[str] = []
+
+        async def publish(post_id: str) -> None:
+            published.append(post_id)
+
+        post = _post(10)
+        post.publish_job = self.queue.schedule(60, publish, "10")
+        store.set("10", post)
+
+        await _drain(self.application, self.services)
+
+        self.assertEqual(published, ["10"])
+        self.services.message_cleaner.flush_all.assert_awaited_once()
+
+    async def test_durable_store_keeps_open_windows_for_next_start(self) -> None:
+        backend = Mock()
+        store = PendingStore(backend)
+        self.services.pending_store = store
+        publish = AsyncMock()
+        post = _post(10)
+        post.publish_job = self.queue.schedule(60, publish, "10")
+        store.set("10", post)
+
+        await _drain(self.application, self.services)
+
+        publish.assert_not_awaited()
+        self.assertTrue(post.publish_job.cancelled)
+        backend.delete.assert_not_called()
+        self.application.bot.edit_message_text.assert_awaited_once()
+        self.assertEqual(self.application.bot.edit_message_text.await_args.kwargs["message_id"], 11)
+
+    async def test_slow_publication_is_cut_off_after_grace_period(self) -> None:
+        self.services.pending_store = PendingStore()
+        cancelled = asyncio.Event()
+
+        async def stuck_upload() -> None:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        self.queue.schedule(0, stuck_upload)
+        await asyncio.sleep(0.01)
+
+        await asyncio.wait_for(_drain(self.application, self.services), timeout=2)
+
+        self.assertTrue(cancelled.is_set())
+
+
+class InterruptedDownloadTests(unittest.IsolatedAsyncioTestCase):
+    """Публикация, прерванная остановкой посреди загрузки, переживает рестарт."""
+
+    async def asyncSetUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "pending.sqlite3"
+        self.queue = DelayQueue()
+        self.store = PendingStore(SqlitePendingBackend(self.path))
+        self.services = Mock()
+        self.services.settings.shutdown_grace_seconds = 0.05
+        self.services.pending_store = self.store
+        self.services.delay_queue = self.queue
+        self.services.message_cleaner = AsyncMock()
+        self.services.media_cache.get_by_url.return_value = None
+        self.services.canonicalizer.canonicalize = AsyncMock(side_effect=lambda request: request)
+        self.services.inflight_downloads = SingleFlight()
+        self.context = Mock()
+        self.context.application.bot_data = {"services": self.services}
+        self.context.bot = AsyncMock()
+        self.download_started = asyncio.Event()
+
+    async def asyncTearDown(self) -> None:
+        await self.queue.stop()
+
+    async def _stuck_download(self) -> DownloadResult:
+        self.download_started.set()
+        await asyncio.sleep(10)
+        raise AssertionError("загрузка должна была прерваться")
+
+    async def _start_publication(self) -> None:
+        request = DownloadRequest(url="https://vm.tiktok.com/ZTR45GpSF/", platform="tiktok")
+        post = PendingDownloadPost(
+            chat_id=-100,
+            source_message_id=20,
+            status_message_id=21,
+            request=request,
+            prefetch=self.services.inflight_downloads.acquire(request.url, self._stuck_download),
+            publish_at=time.time(),
+        )
+        self.store.set("20", post)
+        post.publish_job = self.queue.schedule(0, publish_social_video, self.context, "20")
+        await asyncio.wait_for(self.download_started.wait(), timeout=1)
+        await asyncio.sleep(0.01)
+
+    def _restart(self) -> PendingStore:
+        self.store.close()
+        restored = PendingStore(SqlitePendingBackend(self.path))
+        self.addCleanup(restored.close)
+        self.assertEqual(restored.restore(), 1)
+        return restored
+
+    async def _assert_rearmed(self, restored: PendingStore) -> None:
+        queue = DelayQueue()
+        self.addAsyncCleanup(queue.stop)
+        services = Mock()
+        services.pending_store = restored
+        services.delay_queue = queue
+
+        _rearm_pending_posts(Mock(), services)
+
+        post = restored.get("20")
+        assert isinstance(post, PendingDownloadPost)
+        self.assertIsNotNone(post.publish_job)
+        self.assertEqual(post.request.url, "https://vm.tiktok.com/ZTR45GpSF/")
+
+    async def test_stopping_queue_mid_download_keeps_post_for_restart(self) -> None:
+        await self._start_publication()
+
+        await self.queue.stop()
+
+        self.assertEqual(len(self.store), 0)
+        self.assertEqual(len(self.services.inflight_downloads), 0)
+        await self._assert_rearmed(self._restart())
+
+    async def test_drain_cut_off_keeps_post_for_restart(self) -> None:
+        await self._start_publication()
+
+        interrupted = await self.queue.drain(self.services.settings.shutdown_grace_seconds)
+
+        self.assertEqual(interrupted, 1)
+        await self._assert_rearmed(self._restart())
+
+    async def test_user_cancel_still_deletes_persisted_post(self) -> None:
+        await self._start_publication()
+
+        post = self.store.claim_cancel("20")
+        assert post is not None
+        post.prefetch.release()  # type: ignore[union-attr]
+        await asyncio.sleep(0.01)
+        self.store.close()
+
+        restored = PendingStore(SqlitePendingBackend(self.path))
+        self.addCleanup(restored.close)
+        self.assertEqual(restored.restore(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
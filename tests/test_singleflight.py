@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+
+from panimau_bot.services.singleflight import SingleFlight
+
+
+class SingleFlightTests(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_waiters_share_one_call(self) -> None:
+        released: list[str] = []
+        flight: SingleFlight[str] = SingleFlight(on_release=released.append)
+        calls = 0
+        gate = asyncio.Event()
+
+        async def factory() -> str:
+            nonlocal calls
+            calls += 1
+            await gate.wait()
+            return "video.mp4"
+
+        first = flight.acquire("https://youtu.be/abc", factory)
+        second = flight.acquire("https://youtu.be/abc", factory)
+        gate.set()
+
+        self.assertEqual(await asyncio.gather(first.result(), second.result()), ["video.mp4", "video.mp4"])
+        self.assertEqual(calls, 1)
+        self.assertFalse(first.shared)
+        self.assertTrue(second.shared)
+
+        first.release()
+        self.assertEqual(released, [])
+        second.release()
+        self.assertEqual(released, ["video.mp4"])
+        self.assertEqual(len(flight), 0)
+
+    async def test_cancelled_waiter_does_not_abort_shared_call(self) -> None:
+        flight: SingleFlight[str] = SingleFlight()
+        gate = asyncio.Event()
+
+        async def factory() -> str:
+            await gate.wait()
+            return "done"
+
+        first = flight.acquire("key", factory)
+        second = flight.acquire("key", factory)
+
+        async def wait_and_release() -> str:
+            try:
+                return await first.result()
+            finally:
+                first.release()
+
+        waiter = asyncio.create_task(wait_and_release())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+
+        gate.set()
+        self.assertEqual(await second.result(), "done")
+        second.release()
+
+    async def test_last_release_cancels_unfinished_call(self) -> None:
+        flight: SingleFlight[str] = SingleFlight()
+        started = asyncio.Event()
+
+        async def factory() -> str:
+            started.set()
+            await asyncio.Event().wait()
+            return "never"
+
+        lease = flight.acquire("key", factory)
+        await started.wait()
+        lease.release()
+        await asyncio.sleep(0)
+
+        self.assertNotIn("key", flight)
+
+    async def test_failed_call_is_not_reused(self) -> None:
+        flight: SingleFlight[str] = SingleFlight()
+        calls = 0
+
+        async def factory() -> str:
+            nonlocal calls
+            calls += 1
+            raise RuntimeError("boom")
+
+        lease = flight.acquire("key", factory)
+        with self.assertRaises(RuntimeError):
+            await lease.result()
+        lease.release()
+
+        retry = flight.acquire("key", factory)
+        with self.assertRaises(RuntimeError):
+            await retry.result()
+        retry.release()
+        self.assertEqual(calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
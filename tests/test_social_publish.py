@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, Mock, patch
+
+from telegram.error import Forbidden
+
+from panimau_bot.handlers.callbacks import handle_cancel
+from panimau_bot.handlers.social import handle_social_link, publish_social_video
+from panimau_bot.models import DownloadRequest, DownloadResult, PendingStore
+from panimau_bot.services.singleflight import SingleFlight
+
+URL = "https://vm.tiktok.com/ZTR45GpSF/"
+
+
+class SocialPublishTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.video_path = Path(tmp.name) / "video.mp4"
+        self.video_path.write_bytes(b"\0" * 16)
+
+        self.services = Mock()
+        self.services.settings.group_id = -100
+        self.services.settings.channel_id = "@channel"
+        self.services.settings.download_delay_seconds = 5
+        self.services.settings.speculative_downloads = False
+        self.services.canonicalizer.normalize.side_effect = lambda request: request
+        self.services.canonicalizer.canonicalize = AsyncMock(side_effect=lambda request: request)
+        self.services.platform_guard.retry_in.return_value = None
+        self.services.media_cache.get_by_url.return_value = None
+        self.services.media_cache.get_by_video.return_value = None
+        self.services.inflight_downloads = SingleFlight()
+        self.services.pending_store = PendingStore()
+
+        self.context = Mock()
+        self.context.application.running = True
+        self.context.application.bot_data = {"services": self.services}
+        self.context.bot = AsyncMock()
+        self.context.match = None
+
+        self.downloads = 0
+        self.download_cancelled = asyncio.Event()
+        self.release_download = asyncio.Event()
+        self.release_download.set()
+        patcher = patch("panimau_bot.handlers.social._download_video", self._fake_download)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _fake_download(
+        self,
+        context: object,
+        services: object,
+        request: DownloadRequest,
+        status_post: object,
+        label: str,
+    ) -> DownloadResult:
+        self.downloads += 1
+        try:
+            await self.release_download.wait()
+        except asyncio.CancelledError:
+            self.download_cancelled.set()
+            raise
+        return DownloadResult(file_path=self.video_path, url=request.url, platform=request.platform, video_id="v1")
+
+    def _link_update(self, message_id: int = 10) -> Mock:
+        update = Mock()
+        update.message.text = f"глянь {URL}"
+        update.message.chat_id = -100
+        update.message.message_id = message_id
+        update.message.reply_text = AsyncMock(return_value=Mock(message_id=message_id + 1))
+        return update
+
+    def _cancel_update(self, message_id: int = 10) -> Mock:
+        update = Mock()
+        update.callback_query.data = f"cancel_{message_id}"
+        update.callback_query.answer = AsyncMock()
+        update.callback_query.message.edit_text = AsyncMock()
+        return update
+
+
+class FileIdReuseTests(SocialPublishTestCase):
+    async def test_group_reply_reuses_channel_file_id(self) -> None:
+        channel_msg = Mock(link="https://t.me/channel/5", animation=None, document=None)
+        channel_msg.video.file_id = "file-1"
+        self.context.bot.send_video.side_effect = [channel_msg, Mock()]
+        await handle_social_link(self._link_update(), self.context)
+
+        await publish_social_video(self.context, "10")
+
+        channel_call, group_call = self.context.bot.send_video.await_args_list
+        self.assertEqual(channel_call.args[0], "@channel")
+        self.assertNotIsInstance(channel_call.kwargs["video"], str)
+        self.assertEqual(group_call.args[0], -100)
+        self.assertEqual(group_call.kwargs["video"], "file-1")
+        self.assertNotIn("thumbnail", group_call.kwargs)
+        self.services.media_cache.put.assert_called_once_with(URL, "tiktok", "v1", "file-1", None)
+
+
+class ShortLinkTests(SocialPublishTestCase):
+    async def test_status_reply_does_not_wait_for_short_link(self) -> None:
+        resolved = DownloadRequest(url="https://www.tiktok.com/@user/video/123", platform="tiktok")
+        resolving = asyncio.Event()
+
+        async def slow_resolve(request: DownloadRequest) -> DownloadRequest:
+            await resolving.wait()
+            return resolved
+
+        self.services.canonicalizer.canonicalize.side_effect = slow_resolve
+        update = self._link_update()
+
+        await asyncio.wait_for(handle_social_link(update, self.context), timeout=1)
+        update.message.reply_text.assert_awaited_once()
+        self.services.canonicalizer.canonicalize.assert_not_awaited()
+
+        publish = asyncio.create_task(publish_social_video(self.context, "10"))
+        await asyncio.sleep(0)
+        resolving.set()
+        await publish
+
+        self.services.media_cache.get_by_url.assert_called_with(resolved.url)
+        self.assertEqual(self.context.bot.send_video.await_count, 2)
+
+
+class SpeculativeDownloadTests(SocialPublishTestCase):
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.services.settings.speculative_downloads = True
+
+    async def test_publish_reuses_prefetched_download(self) -> None:
+        await handle_social_link(self._link_update(), self.context)
+        await asyncio.sleep(0)
+        self.assertEqual(self.downloads, 1)
+
+        await publish_social_video(self.context, "10")
+
+        self.assertEqual(self.downloads, 1)
+        self.assertEqual(len(self.services.inflight_downloads), 0)
+        self.assertEqual(self.context.bot.send_video.await_count, 2)
+
+    async def test_cancel_releases_prefetch_and_stops_download(self) -> None:
+        self.release_download.clear()
+        await handle_social_link(self._link_update(), self.context)
+        await asyncio.sleep(0)
+
+        await handle_cancel(self._cancel_update(), self.context)
+        await asyncio.wait_for(self.download_cancelled.wait(), timeout=1)
+
+        self.assertEqual(len(self.services.inflight_downloads), 0)
+        self.assertIsNone(self.services.pending_store.get("10"))
+
+    async def test_failed_status_reply_releases_prefetch(self) -> None:
+        self.release_download.clear()
+        update = self._link_update()
+
+        async def kicked(*args: object, **kwargs: object) -> None:
+            await asyncio.sleep(0)
+            raise Forbidden("bot was kicked")
+
+        update.message.reply_text.side_effect = kicked
+
+        with self.assertRaises(Forbidden):
+            await handle_social_link(update, self.context)
+        await asyncio.wait_for(self.download_cancelled.wait(), timeout=1)
+
+        self.assertEqual(len(self.services.inflight_downloads), 0)
+        self.assertEqual(len(self.services.pending_store), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
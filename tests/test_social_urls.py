@@ -2,7 +2,12 @@ from __future__ import annotations
 
 import unittest
 
-from panimau_bot.services.downloader import detect_platform, extract_download_request
+from panimau_bot.services.social_urls import (
+    SOCIAL_URLS,
+    UrlMatch,
+    detect_platform,
+    extract_download_request,
+)
 
 
 class SocialUrlTests(unittest.TestCase):
@@ -58,6 +63,26 @@ class SocialUrlTests(unittest.TestCase):
             "https://www.instagram.com/reel/DZ-ec0ixTgg/?igsh=MXNvaWdoYXU1dzduNQ==",
         )
 
+    def test_finds_all_links_with_platform_and_span(self) -> None:
+        text = "раз youtu.be/dQw4w9WgXcQ, два https://vm.tiktok.com/ZTR45GpSF/ и reels/audio мимо"
+
+        matches = SOCIAL_URLS.find_all(text)
+
+        self.assertEqual(
+            matches,
+            [
+                UrlMatch("youtube", "https://youtu.be/dQw4w9WgXcQ", 4, 24),
+                UrlMatch("tiktok", "https://vm.tiktok.com/ZTR45GpSF/", 30, 62),
+            ],
+        )
+        self.assertEqual(text[matches[0].start : matches[0].end], "youtu.be/dQw4w9WgXcQ")
+
+    def test_prefilter_skips_text_without_platform_names(self) -> None:
+        self.assertFalse(SOCIAL_URLS.might_match("просто болтовня https://example.com/video/123 " * 50))
+        self.assertTrue(SOCIAL_URLS.might_match("HTTPS://WWW.tiktok.com/@a/video/1"))
+        self.assertEqual(detect_platform("https://WWW.TikTok.com/@A/video/1"), "tiktok")
+        self.assertIsNone(extract_download_request("ссылка на tiktok, но без ролика: tiktok.com/@user"))
+
 
 if __name__ == "__main__":
     unittest.main()
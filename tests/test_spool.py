@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from panimau_bot.models import DownloadResult
+from panimau_bot.services.downloader import SocialVideoDownloader
+from panimau_bot.services.spool import MediaSpool, SpoolFull
+
+
+class MediaSpoolTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.root = Path(self._tmp.name) / "spool"
+        self.legacy = Path(self._tmp.name) / "legacy"
+        self.legacy.mkdir()
+
+    def _spool(self, **kwargs: object) -> MediaSpool:
+        options: dict[str, object] = {"max_bytes": 1_000_000, "legacy_dirs": (self.legacy,)}
+        options.update(kwargs)
+        return MediaSpool(self.root, **options)  # type: ignore[arg-type]
+
+    def test_job_dirs_are_separate_and_released_whole(self) -> None:
+        spool = self._spool()
+        first = spool.job_dir("youtube")
+        second = spool.job_dir("youtube")
+        (first / "video.f137.mp4.part").write_bytes(b"x" * 10)
+        (first / "video.thumb.jpg").write_bytes(b"x" * 5)
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(spool.usage_bytes(), 15)
+        self.assertEqual(spool.snapshot().jobs, 2)
+
+        spool.release(first)
+
+        self.assertFalse(first.exists())
+        self.assertTrue(second.exists())
+        self.assertEqual(spool.snapshot().jobs, 1)
+
+    def test_sweep_removes_stale_orphans_but_keeps_live_jobs(self) -> None:
+        spool = self._spool()
+        live = spool.job_dir("tiktok")
+        orphan = self.root / "panimau_tiktok_dead"
+        orphan.mkdir()
+        (orphan / "video.mp4.part").write_bytes(b"x")
+        legacy_file = self.legacy / "panimau_youtube_old.f248.webm"
+        legacy_file.write_bytes(b"x")
+        unrelated = self.legacy / "someone_else.mp4"
+        unrelated.write_bytes(b"x")
+
+        removed = spool.sweep(60, now=time.time() + 120)
+
+        self.assertEqual(removed, 2)
+        self.assertTrue(live.exists())
+        self.assertFalse(orphan.exists())
+        self.assertFalse(legacy_file.exists())
+        self.assertTrue(unrelated.exists())
+        self.assertEqual(spool.snapshot().swept, 2)
+
+    def test_sweep_can_be_more_careful_in_shared_dirs(self) -> None:
+        spool = self._spool()
+        orphan = self.root / "panimau_youtube_dead"
+        orphan.mkdir()
+        legacy_file = self.legacy / "panimau_youtube_fresh.mp4"
+        legacy_file.write_bytes(b"x")
+
+        spool.sweep(0, legacy_max_age_seconds=3600)
+
+        self.assertFalse(orphan.exists())
+        self.assertTrue(legacy_file.exists())
+
+    def test_sweep_never_removes_spool_root_inside_legacy_dir(self) -> None:
+        spool = MediaSpool(self.legacy / "panimau_spool", max_bytes=100, legacy_dirs=(self.legacy,))
+
+        spool.sweep(0)
+
+        self.assertTrue(spool.root.exists())
+
+    def test_full_spool_refuses_new_jobs(self) -> None:
+        spool = self._spool(max_bytes=10)
+        job = spool.job_dir("youtube")
+        (job / "video.mp4").write_bytes(b"x" * 10)
+
+        with self.assertRaises(SpoolFull):
+            spool.wait_for_room()
+
+        self.assertEqual(spool.snapshot().refused, 1)
+
+    def test_low_free_space_refuses_new_jobs(self) -> None:
+        spool = self._spool(min_free_bytes=2**62)
+
+        self.assertFalse(spool.has_room())
+        with self.assertRaises(SpoolFull):
+            spool.wait_for_room()
+
+    def test_waiting_job_is_admitted_once_room_frees_up(self) -> None:
+        spool = self._spool(max_bytes=10, admission_wait_seconds=5)
+        job = spool.job_dir("youtube")
+        (job / "video.mp4").write_bytes(b"x" * 10)
+        timer = threading.Timer(0.2, spool.release, (job,))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        started = time.monotonic()
+        spool.wait_for_room()
+
+        self.assertLess(time.monotonic() - started, 4)
+
+    def test_wait_stops_when_check_raises(self) -> None:
+        spool = self._spool(max_bytes=0, admission_wait_seconds=30)
+
+        def check() -> None:
+            raise TimeoutError
+
+        with self.assertRaises(TimeoutError):
+            spool.wait_for_room(check)
+
+
+class DownloaderSpoolTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.spool = MediaSpool(Path(self._tmp.name), max_bytes=1_000_000)
+        self.downloader = SocialVideoDownloader(ffmpeg_available=True, spool=self.spool)
+
+    def test_resolves_merged_file_without_scanning_other_jobs(self) -> None:
+        job = self.spool.job_dir("youtube")
+        other = self.spool.job_dir("youtube")
+        (other / "video.mp4").write_bytes(b"other")
+        (job / "video.mp4").write_bytes(b"mine")
+
+        resolved = self.downloader._resolve_downloaded_file(job, job / "video.webm")
+
+        self.assertEqual(resolved, job / "video.mp4")
+
+    def test_resolves_single_finished_file_and_ignores_partials(self) -> None:
+        job = self.spool.job_dir("instagram")
+        (job / "video.f1.mp4.part").write_bytes(b"x")
+        (job / "video.mkv").write_bytes(b"x")
+
+        resolved = self.downloader._resolve_downloaded_file(job, job / "video.NA")
+
+        self.assertEqual(resolved, job / "video.mkv")
+
+    def test_cleanup_removes_whole_job_dir(self) -> None:
+        job = self.spool.job_dir("tiktok")
+        file_path = job / "video.transcoded.mp4"
+        file_path.write_bytes(b"x")
+        (job / "video.transcoded.thumb.jpg").write_bytes(b"x")
+
+        self.downloader.cleanup(DownloadResult(file_path=file_path, url="u", platform="tiktok"))
+
+        self.assertEqual(os.listdir(self.spool.root), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import patch
+
+from panimau_bot.stats import BotStats, StageTimer
+
+
+class StageTimerTests(unittest.TestCase):
+    def test_marks_consecutive_stages_and_renders_total(self) -> None:
+        with patch("panimau_bot.stats.time.perf_counter", side_effect=[10.0, 12.5, 13.0]):
+            timer = StageTimer()
+            self.assertEqual(timer.mark("download"), 2.5)
+            self.assertEqual(timer.mark("upload"), 0.5)
+
+        self.assertEqual(timer.stages, {"download": 2.5, "upload": 0.5})
+        self.assertEqual(timer.render(), "download=2.50s upload=0.50s total=3.00s")
+
+
+class DownloadLatencyTests(unittest.TestCase):
+    def test_reports_median_and_p95_per_platform(self) -> None:
+        stats = BotStats()
+        for seconds in range(1, 21):
+            stats.add_download_time("tiktok", float(seconds))
+        stats.add_download_time("youtube", 3.0)
+
+        latency = stats.download_latency()
+
+        self.assertEqual(latency["tiktok"], (20, 10.5, 20.0))
+        self.assertEqual(latency["youtube"], (1, 3.0, 3.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from panimau_bot.models import DownloadResult
+from panimau_bot.services.formats import MediaTooLarge
+from panimau_bot.services.transcoder import (
+    TranscodeTimeout,
+    VideoTranscoder,
+    build_ffmpeg_command,
+    video_bitrate_kbps,
+)
+
+
+class TranscoderTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.source = Path(self.tmp_dir.name) / "panimau_youtube_abc.mp4"
+        self.source.write_bytes(b"\0" * 4000)
+        self.transcoder = VideoTranscoder(max_bytes=1000, workers=1)
+
+    def tearDown(self) -> None:
+        self.transcoder.shutdown(wait=True)
+        self.tmp_dir.cleanup()
+
+    def _result(self, duration: float | None = 10.0) -> DownloadResult:
+        return DownloadResult(
+            file_path=self.source,
+            url="https://youtu.be/abc",
+            platform="youtube",
+            duration=duration,
+        )
+
+    def test_bitrate_targets_byte_budget_minus_audio(self) -> None:
+        bitrate = video_bitrate_kbps(50 * 1024 * 1024, 60)
+
+        self.assertEqual(bitrate, 6335)
+
+    def test_command_caps_bitrate_and_moves_moov_atom_first(self) -> None:
+        command = build_ffmpeg_command(Path("in.mp4"), Path("out.mp4"), 1200, threads=2)
+
+        self.assertIn("1200k", command)
+        self.assertIn("2400k", command)
+        self.assertIn("+faststart", command)
+        self.assertEqual(command[-1], "out.mp4")
+
+    def test_transcode_replaces_file_and_records_ratio(self) -> None:
+        def fake_ffmpeg(command: list[str], cancel_event: threading.Event | None) -> None:
+            Path(command[-1]).write_bytes(b"\0" * 800)
+
+        with patch.object(self.transcoder, "_run_ffmpeg", side_effect=fake_ffmpeg), patch(
+            "panimau_bot.services.transcoder.video_bitrate_kbps", return_value=500
+        ):
+            result = self.transcoder.transcode(self._result())
+
+        self.assertTrue(result.file_path.name.endswith(".transcoded.mp4"))
+        self.assertFalse(self.source.exists())
+        snapshot = self.transcoder.snapshot()
+        self.assertEqual(snapshot.completed, 1)
+        self.assertAlmostEqual(snapshot.avg_ratio, 5.0)
+
+    def test_rejects_when_budget_leaves_too_little_bitrate(self) -> None:
+        with self.assertRaises(MediaTooLarge):
+            self.transcoder.transcode(self._result(duration=600.0))
+
+        self.assertTrue(self.transcoder.needs_transcode(self._result()))
+        self.assertEqual(self.transcoder.snapshot().failed, 1)
+
+    def _fake_ffmpeg(self, script: str) -> list[str]:
+        # Вместо ffmpeg - python с тем же последним аргументом: путём результата.
+        return [sys.executable, "-c", script, str(self.source.with_name("video.transcoded.mp4"))]
+
+    def test_loud_ffmpeg_does_not_block_on_stderr(self) -> None:
+        command = self._fake_ffmpeg(
+            "import sys; sys.stderr.write('x' * 1_000_000 + 'Conversion failed!'); sys.exit(1)"
+        )
+
+        started = time.monotonic()
+        with self.assertRaisesRegex(RuntimeError, "code 1: x+Conversion failed!$"):
+            self.transcoder._run_ffmpeg(command, None)
+
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertEqual(sorted(path.name for path in self.source.parent.iterdir()), [self.source.name])
+
+    def test_hung_ffmpeg_is_killed_after_timeout(self) -> None:
+        transcoder = VideoTranscoder(max_bytes=1000, workers=1, ffmpeg_timeout_seconds=0.5)
+        self.addCleanup(transcoder.shutdown, True)
+
+        started = time.monotonic()
+        with self.assertRaises(TranscodeTimeout):
+            transcoder._run_ffmpeg(self._fake_ffmpeg("import time; time.sleep(30)"), None)
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(sorted(path.name for path in self.source.parent.iterdir()), [self.source.name])
+
+
+if __name__ == "__main__":
+    unittest.main()
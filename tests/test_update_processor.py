@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+from datetime import datetime, timezone
+
+from telegram import Chat, Message, Update, User
+
+from panimau_bot.services.update_processor import OrderedUpdateProcessor
+
+
+def _update(update_id: int, user_id: int) -> Update:
+    message = Message(
+        message_id=update_id,
+        date=datetime.now(timezone.utc),
+        chat=Chat(id=-100, type=Chat.SUPERGROUP),
+        from_user=User(id=user_id, first_name="Тест", is_bot=False),
+        text="x",
+    )
+    return Update(update_id=update_id, message=message)
+
+
+class OrderedUpdateProcessorTests(unittest.IsolatedAsyncioTestCase):
+    async def test_same_sender_is_serialized_other_senders_run_alongside(self) -> None:
+        processor = OrderedUpdateProcessor(8)
+        events: list[str] = []
+        release_first = asyncio.Event()
+
+        async def slow() -> None:
+            events.append("first:start")
+            await release_first.wait()
+            events.append("first:end")
+
+        async def record(name: str) -> None:
+            events.append(name)
+
+        first = asyncio.create_task(processor.process_update(_update(1, 1), slow()))
+        await asyncio.sleep(0)
+        same_sender = asyncio.create_task(processor.process_update(_update(2, 1), record("same")))
+        other_sender = asyncio.create_task(processor.process_update(_update(3, 2), record("other")))
+        await other_sender
+
+        self.assertEqual(events, ["first:start", "other"])
+        release_first.set()
+        await asyncio.gather(first, same_sender)
+
+        self.assertEqual(events, ["first:start", "other", "first:end", "same"])
+        self.assertEqual(processor.tracked_keys, 0)
+
+    async def test_flooding_sender_does_not_take_slots_from_other_chats(self) -> None:
+        processor = OrderedUpdateProcessor(2)
+        release_flood = asyncio.Event()
+        other_done = asyncio.Event()
+
+        async def flood() -> None:
+            await release_flood.wait()
+
+        async def other() -> None:
+            other_done.set()
+
+        flood_tasks = [
+            asyncio.create_task(processor.process_update(_update(update_id, 1), flood()))
+            for update_id in range(1, 11)
+        ]
+        await asyncio.sleep(0)
+        other_task = asyncio.create_task(processor.process_update(_update(100, 2), other()))
+
+        await asyncio.wait_for(other_done.wait(), timeout=1)
+        # Из пачки одного автора слот держит только тот апдейт, что реально выполняется.
+        self.assertEqual(processor.current_concurrent_updates, 1)
+
+        release_flood.set()
+        await asyncio.gather(other_task, *flood_tasks)
+        self.assertEqual(processor.tracked_keys, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,9 @@ import re
 import unittest
 
 from panimau_bot import voice
+from panimau_bot.services.delay_queue import DelayQueueSnapshot
+from panimau_bot.services.download_scheduler import DownloadQueueSnapshot
+from panimau_bot.services.spool import SpoolSnapshot
 from panimau_bot.stats import BotStats
 
 
@@ -22,6 +25,56 @@ class VoiceTests(unittest.TestCase):
         self.assertIn("тестовый панч", text)
         self.assertIsNone(re.search(r"\{[a-z_]+\}", text))
 
+    def test_render_health_appends_details(self) -> None:
+        text = voice.render_health(
+            uptime="1м",
+            total_forwarded=0,
+            cancelled=0,
+            details=["Качалка: 1/4 в работе"],
+        )
+
+        self.assertIn("Качалка: 1/4 в работе", text)
+
+    def test_render_download_queue_health_includes_depth_and_wait(self) -> None:
+        text = voice.render_download_queue_health(
+            DownloadQueueSnapshot(
+                workers=4,
+                active=2,
+                queued=3,
+                queued_by_platform={"tiktok": 3},
+                active_by_platform={"tiktok": 2},
+                completed=10,
+                avg_wait_seconds=1.25,
+                max_wait_seconds=4.0,
+            )
+        )
+
+        self.assertIn("2/4", text)
+        self.assertIn("3 в очереди", text)
+        self.assertIn("1.2", text)
+        self.assertIn("tiktok: 3", text)
+
+    def test_render_delay_queue_health_reports_queue_size(self) -> None:
+        text = voice.render_delay_queue_health(DelayQueueSnapshot(pending=5, running=1, fired=9, cancelled=2))
+
+        self.assertIn("5 ждут", text)
+        self.assertIn("отменено 2", text)
+
+    def test_render_spool_health_reports_usage_in_megabytes(self) -> None:
+        text = voice.render_spool_health(
+            SpoolSnapshot(
+                used_bytes=300 * 1024 * 1024,
+                max_bytes=2048 * 1024 * 1024,
+                free_bytes=10 * 1024 * 1024 * 1024,
+                jobs=2,
+                swept=4,
+                refused=1,
+            )
+        )
+
+        self.assertIn("300/2048 МБ", text)
+        self.assertIn("отказов 1", text)
+
     def test_render_stats_includes_counts_and_type_breakdown(self) -> None:
         stats = BotStats()
         stats.add_forward("youtube")
@@ -37,9 +90,21 @@ class VoiceTests(unittest.TestCase):
         self.assertIn("photo: 1", text)
         self.assertIsNone(re.search(r"\{[a-z_]+\}", text))
 
+    def test_render_stats_includes_download_latency_per_platform(self) -> None:
+        stats = BotStats()
+        stats.add_forward("instagram")
+        stats.add_download_time("instagram", 4.0)
+        stats.add_download_time("instagram", 6.0)
+
+        text = voice.render_stats(stats)
+
+        self.assertIn("instagram: медиана 5.0с, p95 6.0с (2 шт.)", text)
+
     def test_render_social_templates_include_label_url_error_and_delay(self) -> None:
         queue_text = voice.render_social_queue("рилс", 5)
         progress_text = voice.render_social_progress("рилс")
+        waiting_text = voice.render_social_waiting("рилс", 3)
+        download_text = voice.render_social_download_progress("рилс", 75)
         success_text = voice.render_social_success("рилс")
         caption_text = voice.render_social_reply_caption(
             label="рилс",
@@ -51,12 +116,14 @@ class VoiceTests(unittest.TestCase):
         self.assertIn("рилс", queue_text)
         self.assertIn("5", queue_text)
         self.assertIn("рилс", progress_text)
+        self.assertIn("3", waiting_text)
+        self.assertIn("75%", download_text)
         self.assertIn("рилс", success_text)
         self.assertIn("https://example.com/reel", caption_text)
         self.assertIn("https://t.me/channel/1", caption_text)
         self.assertIn("boom", error_text)
 
-        for text in (queue_text, progress_text, success_text, caption_text, error_text):
+        for text in (queue_text, progress_text, waiting_text, download_text, success_text, caption_text, error_text):
             self.assertIsNone(re.search(r"\{[a-z_]+\}", text))
 
     def test_render_admin_templates_include_values(self) -> None:
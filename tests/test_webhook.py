@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import shutil
+import tempfile
+import unittest
+
+import aiohttp
+from telegram import Bot, Update
+
+from panimau_bot.app import allowed_updates_for, build_application
+from panimau_bot.config import Settings
+from panimau_bot.models import AppServices
+from panimau_bot.services.webhook import SECRET_HEADER, WebhookServer
+
+RECORDED_UPDATE = {
+    "update_id": 1001,
+    "message": {
+        "message_id": 7,
+        "date": 1760000000,
+        "chat": {"id": -100123, "type": "supergroup", "title": "Панимау"},
+        "from": {"id": 42, "is_bot": False, "first_name": "Тест"},
+        "text": "https://youtube.com/shorts/abcdefghijk",
+    },
+}
+
+
+class _FakeApplication:
+    def __init__(self) -> None:
+        self.bot = Bot("123:TEST")
+        self.update_queue: asyncio.Queue[object] = asyncio.Queue()
+
+
+class WebhookServerTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.application = _FakeApplication()
+        self.server = WebhookServer(
+            self.application,  # type: ignore[arg-type]
+            path="telegram",
+            secret_token="s3cret",
+            listen="127.0.0.1",
+            port=0,
+        )
+        await self.server.start()
+        self.url = f"http://127.0.0.1:{self.server.bound_port}/telegram"
+        self.session = aiohttp.ClientSession()
+
+    async def asyncTearDown(self) -> None:
+        await self.session.close()
+        await self.server.stop()
+
+    async def test_recorded_update_reaches_update_queue(self) -> None:
+        async with self.session.post(
+            self.url, json=RECORDED_UPDATE, headers={SECRET_HEADER: "s3cret"}
+        ) as response:
+            self.assertEqual(response.status, 200)
+
+        update = await asyncio.wait_for(self.application.update_queue.get(), timeout=1)
+        self.assertIsInstance(update, Update)
+        self.assertEqual(update.update_id, 1001)
+        self.assertEqual(update.message.chat_id, -100123)
+
+    async def test_rejects_wrong_secret_token(self) -> None:
+        async with self.session.post(
+            self.url, json=RECORDED_UPDATE, headers={SECRET_HEADER: "nope"}
+        ) as response:
+            self.assertEqual(response.status, 403)
+
+        self.assertTrue(self.application.update_queue.empty())
+
+    async def test_rejects_malformed_payload(self) -> None:
+        async with self.session.post(
+            self.url, data=b"not json", headers={SECRET_HEADER: "s3cret"}
+        ) as response:
+            self.assertEqual(response.status, 400)
+
+
+class AllowedUpdatesTests(unittest.TestCase):
+    def test_derived_from_registered_handlers(self) -> None:
+        data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_dir, True)
+        application = build_application(
+            Settings(bot_token="123:TEST", group_id=-100123, channel_id="@channel", admin_ids=(), data_dir=data_dir)
+        )
+        services = application.bot_data["services"]
+        assert isinstance(services, AppServices)
+        self.addCleanup(services.media_cache.close)
+        self.addCleanup(services.pending_store.close)
+        self.addCleanup(services.download_scheduler.shutdown)
+        self.addCleanup(services.transcoder.shutdown)
+
+        self.assertEqual(allowed_updates_for(application), [Update.CALLBACK_QUERY, Update.MESSAGE])
+
+
+if __name__ == "__main__":
+    unittest.main()
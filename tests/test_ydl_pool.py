@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import http.server
+import socketserver
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from panimau_bot.models import DownloadRequest
+from panimau_bot.services.downloader import SocialVideoDownloader
+from panimau_bot.services.spool import MediaSpool
+from panimau_bot.services.ydl_pool import YoutubeDLPool, set_format
+
+OPTIONS = {"format": "b", "outtmpl": "/tmp/unused.%(ext)s", "quiet": True, "noprogress": True}
+
+
+class _SmallVideoHandler(http.server.BaseHTTPRequestHandler):
+    body = b"\0" * 64_000
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+class YoutubeDLPoolTests(unittest.TestCase):
+    def test_instances_are_reused_per_platform(self) -> None:
+        pool = YoutubeDLPool(OPTIONS)
+        self.addCleanup(pool.close)
+
+        with pool.lease("youtube", "/tmp/a.%(ext)s") as first:
+            pass
+        with pool.lease("youtube", "/tmp/b.%(ext)s") as second:
+            self.assertEqual(second.params["outtmpl"]["default"], "/tmp/b.%(ext)s")
+        with pool.lease("tiktok", "/tmp/c.%(ext)s") as other:
+            pass
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        snapshot = pool.snapshot()
+        self.assertEqual((snapshot.created, snapshot.reused, snapshot.leased), (2, 1, 0))
+
+    def test_instance_is_recycled_after_max_uses(self) -> None:
+        pool = YoutubeDLPool(OPTIONS, max_uses=2)
+        self.addCleanup(pool.close)
+
+        seen = []
+        for _ in range(3):
+            with pool.lease("youtube", "/tmp/x.%(ext)s") as downloader:
+                seen.append(downloader)
+
+        self.assertIs(seen[0], seen[1])
+        self.assertIsNot(seen[1], seen[2])
+        self.assertEqual(pool.snapshot().recycled, 1)
+
+    def test_instance_is_dropped_after_error(self) -> None:
+        pool = YoutubeDLPool(OPTIONS)
+        self.addCleanup(pool.close)
+
+        with self.assertRaises(RuntimeError):
+            with pool.lease("youtube", "/tmp/x.%(ext)s") as broken:
+                raise RuntimeError("boom")
+        with pool.lease("youtube", "/tmp/x.%(ext)s") as fresh:
+            pass
+
+        self.assertIsNot(broken, fresh)
+        self.assertEqual(pool.snapshot().recycled, 1)
+
+    def test_lease_restores_default_format_and_hook(self) -> None:
+        pool = YoutubeDLPool(OPTIONS)
+        self.addCleanup(pool.close)
+        calls: list[str] = []
+
+        with pool.lease("youtube", "/tmp/x.%(ext)s", lambda status: calls.append("first")) as downloader:
+            default_selector = downloader.format_selector
+            set_format(downloader, "worst")
+            self.assertNotEqual(downloader.format_selector, default_selector)
+        with pool.lease("youtube", "/tmp/x.%(ext)s") as downloader:
+            self.assertEqual(downloader.params["format"], "b")
+            self.assertIs(downloader.format_selector, default_selector)
+            for hook in downloader._progress_hooks:
+                hook({"status": "downloading"})
+
+        self.assertEqual(calls, [])
+
+    def test_prewarm_fills_idle_slots_up_to_limit(self) -> None:
+        pool = YoutubeDLPool(OPTIONS, max_idle={"youtube": 2, "tiktok": 1})
+        self.addCleanup(pool.close)
+
+        self.assertEqual(pool.prewarm(), 3)
+        self.assertEqual(pool.prewarm(), 0)
+        self.assertEqual(pool.snapshot().idle, 3)
+
+
+class PooledDownloadTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SmallVideoHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_consecutive_downloads_share_instance_but_not_files(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        downloader = SocialVideoDownloader(
+            ffmpeg_available=False,
+            spool=MediaSpool(Path(tmp.name), max_bytes=10_000_000),
+        )
+        self.addCleanup(downloader.close)
+        port = self.server.server_address[1]
+
+        results = [
+            downloader.download(DownloadRequest(url=f"http://127.0.0.1:{port}/{name}.mp4", platform="fixture"))
+            for name in ("first", "second")
+        ]
+
+        self.assertNotEqual(results[0].file_path.parent, results[1].file_path.parent)
+        for result in results:
+            self.assertEqual(result.file_path.stat().st_size, len(_SmallVideoHandler.body))
+        self.assertEqual(downloader.pool.snapshot().reused, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()